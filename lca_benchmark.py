@@ -0,0 +1,366 @@
+"""Benchmark of the hot paths of the impact calculations, on synthetic data
+
+The synthetic database and products are much larger than the microwave of the dashboard (hundreds
+of materials, dozens of countries, many indicators), to measure how the calculations scale.
+
+Examples:
+    python -m lca_benchmark -o benchmark_baseline.json
+    python -m lca_benchmark --compare benchmark_baseline.json
+"""
+
+import argparse
+import contextlib
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import lca_calculations
+import lca_use_phase
+
+
+def build_synthetic_data(
+    n_materials=300,
+    n_countries=30,
+    n_indicators=20,
+    n_materials_per_product=200,
+    n_scenarios=200,
+    seed=0,
+):
+    """Build a synthetic database, distance table and customer records
+
+    Returns:
+        dict: with the keys "df_database", "distance_trips", "electricity_links",
+            "conversion_to_micropoints" and "list_dict_data_customers"
+    """
+    rng = np.random.default_rng(seed)
+    list_countries = [f"Country {i}" for i in range(n_countries)]
+    list_materials = [f"Material {i}" for i in range(n_materials)]
+    list_indicators = [f"Indicator {i}" for i in range(n_indicators)]
+    dict_electricity_links = {
+        country: f"Mix électrique réseau, {country}" for country in list_countries
+    }
+
+    list_activities = (
+        list_materials
+        + lca_calculations.list_transportation_means
+        + list(dict_electricity_links.values())
+    )
+    df_database = pd.DataFrame(
+        rng.lognormal(0, 1, (len(list_activities), n_indicators)),
+        index=list_activities,
+        columns=list_indicators,
+    )
+    df_database["Unit"] = "kg"
+
+    distance_trips = {}
+    for i, country_a in enumerate(list_countries):
+        distance_trips[f"{country_a} - {country_a}"] = float(rng.uniform(200, 2000))
+        for country_b in list_countries[i + 1 :]:
+            distance_trips[f"{country_a} - {country_b}"] = float(
+                rng.uniform(500, 20000)
+            )
+
+    list_dict_data_customers = []
+    for _ in range(n_scenarios):
+        masses = rng.uniform(0.01, 10, n_materials_per_product)
+        list_dict_data_customers.append(
+            {
+                "Usage": {
+                    "Duree de vie (annees)": int(rng.integers(1, 31)),
+                    "Nombre de cycles par an": 1200,
+                    "Duree de cycle (min)": 3,
+                    "Puisance (W)": int(rng.integers(400, 1001)),
+                    "Lieu d'utilisation": str(rng.choice(list_countries)),
+                },
+                "Materiaux": [
+                    {
+                        "Nom": str(name),
+                        "Masse produit fini (kg)": float(mass * 0.9),
+                        "Lieu de production": str(rng.choice(list_countries)),
+                        "Masse utile (kg)": float(mass),
+                    }
+                    for name, mass in zip(
+                        rng.choice(list_materials, n_materials_per_product), masses
+                    )
+                ],
+                "Processing": {
+                    "Lieu d'assemblage": str(rng.choice(list_countries)),
+                    "Pertes (%)": 10,
+                    "Consommation d'energie (kWh)": float(rng.uniform(0.5, 5)),
+                },
+                "Moyen de transport": {
+                    trip: str(rng.choice(["truck", "train", "boat", "plane"]))
+                    for trip in distance_trips.keys()
+                    if trip.split(" - ")[0] != trip.split(" - ")[1]
+                },
+            }
+        )
+
+    return {
+        "df_database": df_database,
+        "distance_trips": distance_trips,
+        "electricity_links": dict_electricity_links,
+        "conversion_to_micropoints": {
+            indicator: float(rng.uniform(1, 100)) for indicator in list_indicators
+        },
+        "list_dict_data_customers": list_dict_data_customers,
+    }
+
+
+@contextlib.contextmanager
+def use_synthetic_data(dict_synthetic_data):
+    """Temporarily replace the distances, electricity links and conversions of lca_calculations"""
+    dict_saved = {
+        "dict_country_codes": lca_calculations.dict_country_codes,
+        "array_distances": lca_calculations.array_distances,
+        "array_trip_distances": lca_calculations.array_trip_distances,
+        "dict_link_electricity_country_to_database": lca_calculations.dict_link_electricity_country_to_database,
+        "conversion_to_micropoints": lca_calculations.conversion_to_micropoints,
+    }
+    (
+        lca_calculations.dict_country_codes,
+        lca_calculations.array_distances,
+        lca_calculations.array_trip_distances,
+    ) = lca_calculations.compile_distance_trips(dict_synthetic_data["distance_trips"])
+    lca_calculations.dict_link_electricity_country_to_database = dict_synthetic_data[
+        "electricity_links"
+    ]
+    lca_calculations.conversion_to_micropoints = dict_synthetic_data[
+        "conversion_to_micropoints"
+    ]
+    try:
+        yield
+    finally:
+        for name, value in dict_saved.items():
+            setattr(lca_calculations, name, value)
+
+
+def measure(function, n_scenarios, repeat):
+    """Measure the median time, the peak memory and the throughput of a function
+
+    Returns:
+        dict: {"seconds": ..., "peak_memory_mb": ..., "scenarios_per_second": ...}
+    """
+    list_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        list_times.append(time.perf_counter() - start)
+
+    # the memory is measured in a separate run, as tracemalloc slows down the execution
+    tracemalloc.start()
+    function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = statistics.median(list_times)
+    return {
+        "seconds": seconds,
+        "peak_memory_mb": peak_memory / 1e6,
+        "scenarios_per_second": n_scenarios / seconds,
+    }
+
+
+def run_benchmarks(dict_synthetic_data, repeat=5):
+    """Time each hot path of the calculations on the synthetic data
+
+    Returns:
+        dict: {benchmark_name: measures (see measure)}
+    """
+    df_database = dict_synthetic_data["df_database"]
+    list_dict_data_customers = dict_synthetic_data["list_dict_data_customers"]
+    n_scenarios = len(list_dict_data_customers)
+    factor_matrix = lca_calculations.build_factor_matrix(df_database)
+    list_df_phase_impacts = [
+        lca_calculations.compute_phase_impacts(dict_data_customers, factor_matrix)
+        for dict_data_customers in list_dict_data_customers
+    ]
+
+    # same scenarios, with the materials as arrays
+    list_dict_data_customers_arrays = [
+        {
+            **dict_data_customers,
+            "Materiaux": lca_calculations.build_bill_of_materials(
+                dict_data_customers["Materiaux"]
+            ),
+        }
+        for dict_data_customers in list_dict_data_customers
+    ]
+
+    # hourly trajectories of the electricity mixes over 30 years
+    rng = np.random.default_rng(0)
+    electricity_trajectories = lca_use_phase.ElectricityTrajectories(
+        {
+            country: rng.uniform(0.5, 1.5, 30 * 8760)
+            for country in dict_synthetic_data["electricity_links"]
+        },
+        8760,
+        None,
+    )
+
+    def run_for_each_scenario(function):
+        return lambda: [function(i) for i in list_dict_data_customers]
+
+    dict_benchmarks = {
+        "build_factor_matrix": (
+            lambda: lca_calculations.build_factor_matrix(df_database),
+            1,
+        ),
+        "compute_material_impact": (
+            run_for_each_scenario(
+                lambda i: lca_calculations.compute_material_impact(i, factor_matrix)
+            ),
+            n_scenarios,
+        ),
+        "compute_tkm_transportation": (
+            run_for_each_scenario(lca_calculations.compute_tkm_transportation),
+            n_scenarios,
+        ),
+        "compute_impact_transportation": (
+            run_for_each_scenario(
+                lambda i: lca_calculations.compute_impact_transportation(
+                    i, factor_matrix
+                )
+            ),
+            n_scenarios,
+        ),
+        "compute_phase_impacts": (
+            run_for_each_scenario(
+                lambda i: lca_calculations.compute_phase_impacts(i, factor_matrix)
+            ),
+            n_scenarios,
+        ),
+        "compute_phase_impacts (bill of materials)": (
+            lambda: [
+                lca_calculations.compute_phase_impacts(i, factor_matrix)
+                for i in list_dict_data_customers_arrays
+            ],
+            n_scenarios,
+        ),
+        # assembly of df_impact of the dashboard (totals, micropoints, distributions)
+        "build_impact_table": (
+            lambda: [
+                lca_calculations.build_impact_table(i) for i in list_df_phase_impacts
+            ],
+            n_scenarios,
+        ),
+        "compute_impact_tables_batch": (
+            lambda: lca_calculations.compute_impact_tables_batch(
+                list_dict_data_customers, factor_matrix
+            ),
+            n_scenarios,
+        ),
+        "compute_use_phase_impacts (hourly, 30 years)": (
+            lambda: lca_use_phase.compute_use_phase_impacts(
+                list_dict_data_customers,
+                lca_use_phase.compile_trajectories(
+                    electricity_trajectories, factor_matrix
+                ),
+            ),
+            n_scenarios,
+        ),
+    }
+
+    return {
+        name: measure(function, n, repeat)
+        for name, (function, n) in dict_benchmarks.items()
+    }
+
+
+def compare_to_baseline(dict_results, dict_baseline_results, tolerance):
+    """List the benchmarks slower (or using more memory) than the baseline by more than tolerance
+
+    Returns:
+        list: messages describing the regressions
+    """
+    list_regressions = []
+    for name, dict_measures in dict_results.items():
+        if name not in dict_baseline_results:
+            continue
+        for measure_name in ["seconds", "peak_memory_mb"]:
+            baseline = dict_baseline_results[name][measure_name]
+            if dict_measures[measure_name] > baseline * (1 + tolerance):
+                list_regressions.append(
+                    f"{name}: {measure_name} {dict_measures[measure_name]:.4g} > "
+                    f"baseline {baseline:.4g} (+{tolerance:.0%})"
+                )
+
+    return list_regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the impact calculations on synthetic data"
+    )
+    parser.add_argument("-o", "--output", help="write the results to this json file")
+    parser.add_argument(
+        "--compare", help="json file of a baseline, exit with 1 on regressions"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="relative slowdown tolerated before reporting a regression (default: %(default)s)",
+    )
+    parser.add_argument("--materials", type=int, default=300)
+    parser.add_argument("--countries", type=int, default=30)
+    parser.add_argument("--indicators", type=int, default=20)
+    parser.add_argument("--materials-per-product", type=int, default=200)
+    parser.add_argument("--scenarios", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    dict_config = {
+        "n_materials": args.materials,
+        "n_countries": args.countries,
+        "n_indicators": args.indicators,
+        "n_materials_per_product": args.materials_per_product,
+        "n_scenarios": args.scenarios,
+    }
+    dict_synthetic_data = build_synthetic_data(**dict_config)
+    with use_synthetic_data(dict_synthetic_data):
+        dict_results = run_benchmarks(dict_synthetic_data, args.repeat)
+
+    for name, dict_measures in dict_results.items():
+        print(
+            f"{name:<46} {dict_measures['seconds'] * 1000:10.2f} ms "
+            f"{dict_measures['peak_memory_mb']:10.2f} MB "
+            f"{dict_measures['scenarios_per_second']:12.1f} scenarios/s"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "config": dict_config,
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "pandas": pd.__version__,
+                    "results": dict_results,
+                },
+                f,
+                indent=2,
+            )
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            dict_baseline = json.load(f)
+        if dict_baseline["config"] != dict_config:
+            print("Warning: the baseline was measured with a different configuration")
+        list_regressions = compare_to_baseline(
+            dict_results, dict_baseline["results"], args.tolerance
+        )
+        for regression in list_regressions:
+            print(f"Regression: {regression}")
+        if list_regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,336 @@
-def compute_material_impact(dict_data_customers, df_database):
-    """Compute the impact of the materials
+import collections
+import warnings
+
+import numpy as np
+
+# pandas is only imported by the functions returning dataframes: importing the calculations (e.g.
+# at the start of the dashboard or of the service) only loads numpy
+
+# phases of the life cycle, in the order of the rows of the impact matrices
+list_phases = ["Material", "Processing", "Use phase", "Transportation"]
+
+# link between the country names in the customer data and the electricity mix in the database
+# (default aliases of the factor matrices, more countries can be added with an alias table, see
+# lca_database.read_alias_table)
+dict_link_electricity_country_to_database = {
+    "France": "Mix électrique réseau, FR",
+    "Chine": "Mix électrique réseau, CN",
+}
+
+# dense version of the database: one row per activity (material, transport, electricity...),
+# one column per impact indicator
+FactorMatrix = collections.namedtuple(
+    "FactorMatrix", ["matrix", "activities", "indicators"]
+)
+
+
+def get_electricity_alias(country):
+    """Alias of the electricity mix of a country in the factor matrices"""
+    return f"Electricity, {country}"
+
+
+def add_aliases(dict_activities, dict_aliases):
+    """Add aliases to an index of the activities, so that they are found with a single dict lookup
 
     Args:
-        dict_data_customers (dict): dict with the data from the customers
-        df_database (pandas.DataFrame): dataframe with the impact of the materials
+        dict_activities (dict): {activity name or alias: row in the factor matrix}
+        dict_aliases (dict): {alias: activity name (or alias) it refers to}, the aliases referring
+            to another alias of dict_aliases are followed until an activity of dict_activities
+
+    Raises:
+        KeyError: listing all the aliases referring to an unknown activity, or to themselves
+            through other aliases, or whose name is already the one of another activity
 
     Returns:
-        dict: dict with the impact of the materials in the format:
-            {material_name_1: {impact_name_1: impact_value, impact_name_2: impact_value, ...}}
+        dict: new index, with the activities and the aliases
     """
-    dict_impact_material = {}
+    dict_index = dict(dict_activities)
+    list_errors = []
+    for alias, name in dict_aliases.items():
+        # follow the chained aliases
+        set_visited = {alias}
+        while name not in dict_activities and name in dict_aliases:
+            if name in set_visited:
+                break
+            set_visited.add(name)
+            name = dict_aliases[name]
+        row = dict_activities.get(name)
+        if row is None and name in set_visited:
+            list_errors.append(f"{alias} -> {dict_aliases[alias]} (cyclic aliases)")
+        elif row is None:
+            list_errors.append(f"{alias} -> {dict_aliases[alias]} (unknown activity)")
+        elif dict_activities.get(alias, row) != row:
+            list_errors.append(
+                f"{alias} -> {dict_aliases[alias]} (already another activity)"
+            )
+        else:
+            dict_index[alias] = row
 
-    for i in range(len(dict_data_customers["Materiaux"])):
-        material_name = dict_data_customers["Materiaux"][i]["Nom"]
-        dict_impact_material[material_name] = {}
+    if list_errors:
+        raise KeyError(
+            f"Invalid aliases of the factor database: {'; '.join(list_errors)}"
+        )
 
-        for col in df_database.columns:
-            if col != "Unit":
-                try:
-                    dict_impact_material[material_name][col] = (
-                        df_database.loc[material_name, col]
-                        * dict_data_customers["Materiaux"][i]["Masse utile (kg)"]
-                    )
+    return dict_index
 
-                except KeyError:
-                    print(
-                        f"Warning: {col} emissions fo material {material_name} not found in the database (defaulted to 0)"
-                    )
-                    dict_impact_material[material_name][col] = 0
 
-    return dict_impact_material
+def build_activity_index(list_activity_names, dict_aliases=None):
+    """Build the index {activity name or alias: row} of the activities of a factor matrix
 
+    The electricity mixes of dict_link_electricity_country_to_database that are in the database
+    are always aliased (see get_electricity_alias).
 
-def compute_impact_processing(dict_data_customers, df_database):
-    dict_link_electricity_country_to_database = {
-        "France": "Mix électrique réseau, FR",
-        "Chine": "Mix électrique réseau, CN",
+    Args:
+        list_activity_names (list): name of the activity of each row of the factor matrix
+        dict_aliases (dict, optional): {alias: activity name}, e.g. the names of the materials
+            used by the customers. Defaults to None.
+
+    Raises:
+        KeyError: listing the activity names found on several rows (only one of them could be
+            used), or the invalid aliases (see add_aliases)
+
+    Returns:
+        dict: {activity name or alias: row in the factor matrix}
+    """
+    dict_activities = {name: i for i, name in enumerate(list_activity_names)}
+    if len(dict_activities) != len(list_activity_names):
+        list_duplicates = [
+            str(name)
+            for name, count in collections.Counter(list_activity_names).items()
+            if count > 1
+        ]
+        raise KeyError(
+            f"Duplicated activities in the factor database: {', '.join(list_duplicates)}"
+        )
+    dict_default_aliases = {
+        get_electricity_alias(country): name
+        for country, name in dict_link_electricity_country_to_database.items()
+        if name in dict_activities
     }
 
-    dict_impact_processing = {}
-    processing_electricity = dict_data_customers["Processing"][
-        "Consommation d'energie (kWh)"
+    return add_aliases(
+        dict_activities, {**dict_default_aliases, **(dict_aliases or {})}
+    )
+
+
+def get_activity_names(factor_matrix):
+    """Name of the activity of each row of a factor matrix (without the aliases)"""
+    list_activity_names = [None] * len(factor_matrix.matrix)
+    # the names are indexed before their aliases, so the first name of each row is kept
+    for name, row in reversed(list(factor_matrix.activities.items())):
+        list_activity_names[row] = name
+
+    return list_activity_names
+
+
+def build_factor_matrix(df_database):
+    """Convert the database to a dense factor matrix (activity x indicator)
+
+    Args:
+        df_database (pandas.DataFrame): dataframe with the impact of the materials (a FactorMatrix
+            is returned as is, so all the functions taking df_database also accept one)
+
+    Returns:
+        FactorMatrix: namedtuple with:
+            - matrix (numpy.ndarray): impact factors, of shape (n_activities, n_indicators)
+            - activities (dict): {activity name or alias: row index in the matrix}, see
+              build_activity_index
+            - indicators (list): name of the indicators (columns of the matrix)
+    """
+    if isinstance(df_database, FactorMatrix):
+        return df_database
+
+    list_indicators = [col for col in df_database.columns if col != "Unit"]
+    matrix = df_database[list_indicators].to_numpy(dtype=float)
+
+    return FactorMatrix(
+        matrix, build_activity_index(df_database.index), list_indicators
+    )
+
+
+# array version of the bill of materials (dict_data_customers["Materiaux"]): one value per material
+# in each array, the names of the materials and of the countries being stored once
+BillOfMaterials = collections.namedtuple(
+    "BillOfMaterials",
+    [
+        "names",
+        "name_ids",
+        "useful_masses",
+        "finished_masses",
+        "countries",
+        "country_ids",
+    ],
+)
+
+
+def build_bill_of_materials(list_materials):
+    """Convert the list of materials of the customer data to a BillOfMaterials
+
+    Args:
+        list_materials (list): list of dicts with the keys "Nom", "Masse produit fini (kg)",
+            "Lieu de production" and "Masse utile (kg)" (a BillOfMaterials is returned as is, so
+            dict_data_customers["Materiaux"] can be either of them in all the functions)
+
+    Returns:
+        BillOfMaterials: namedtuple with:
+            - names (list): name of the distinct materials
+            - name_ids (numpy.ndarray): index in names of the name of each material
+            - useful_masses (numpy.ndarray): mass of each material before the processing losses,
+              in kg
+            - finished_masses (numpy.ndarray): mass of each material in the end product, in kg
+            - countries (list): name of the distinct production countries
+            - country_ids (numpy.ndarray): index in countries of the production country of each
+              material
+    """
+    if isinstance(list_materials, BillOfMaterials):
+        return list_materials
+
+    dict_name_ids = {}
+    dict_country_ids = {}
+    name_ids = [
+        dict_name_ids.setdefault(material["Nom"], len(dict_name_ids))
+        for material in list_materials
     ]
-    processing_country = dict_data_customers["Processing"]["Lieu d'assemblage"]
+    country_ids = [
+        dict_country_ids.setdefault(
+            material["Lieu de production"], len(dict_country_ids)
+        )
+        for material in list_materials
+    ]
+
+    return BillOfMaterials(
+        list(dict_name_ids),
+        np.array(name_ids, dtype=np.int32),
+        np.array([i["Masse utile (kg)"] for i in list_materials], dtype=float),
+        np.array([i["Masse produit fini (kg)"] for i in list_materials], dtype=float),
+        list(dict_country_ids),
+        np.array(country_ids, dtype=np.int32),
+    )
+
+
+def bill_of_materials_to_records(bill_of_materials):
+    """Convert a BillOfMaterials back to the list of materials of the customer data (json format)"""
+    return [
+        {
+            "Nom": bill_of_materials.names[name_id],
+            "Masse produit fini (kg)": float(finished_mass),
+            "Lieu de production": bill_of_materials.countries[country_id],
+            "Masse utile (kg)": float(useful_mass),
+        }
+        for name_id, finished_mass, country_id, useful_mass in zip(
+            bill_of_materials.name_ids,
+            bill_of_materials.finished_masses,
+            bill_of_materials.country_ids,
+            bill_of_materials.useful_masses,
+        )
+    ]
+
+
+def get_bill_of_materials(dict_data_customers):
+    return build_bill_of_materials(dict_data_customers["Materiaux"])
+
+
+def get_material_names(bill_of_materials):
+    """Name of each material of a BillOfMaterials"""
+    return [bill_of_materials.names[i] for i in bill_of_materials.name_ids]
+
+
+def get_material_activity_rows(bill_of_materials, factor_matrix):
+    """Get the row of each material in the factor matrix, -1 when it is not in the database
+
+    The missing materials count as 0 without a warning: the batch paths report them once for all the
+    products (see find_missing_activities), the single product functions with warn_missing_materials.
+    """
+    name_rows = np.array(
+        [factor_matrix.activities.get(name, -1) for name in bill_of_materials.names],
+        dtype=int,
+    )
+
+    return name_rows[bill_of_materials.name_ids]
 
-    for col in df_database.columns:
-        if col != "Unit":
-            dict_impact_processing[col] = (
-                df_database.loc[
-                    dict_link_electricity_country_to_database[processing_country], col
-                ]
-                * processing_electricity
+
+def warn_missing_materials(bill_of_materials, factor_matrix):
+    """Warn (once per material, with the warnings module) about the materials not in the database"""
+    for material_name in bill_of_materials.names:
+        if material_name not in factor_matrix.activities:
+            warnings.warn(
+                f"emissions fo material {material_name} not found in the database (defaulted to 0)",
+                stacklevel=3,
             )
 
-    return dict_impact_processing
 
+def find_missing_activities(list_dict_data_customers, factor_matrix):
+    """Find, for many products at once, the activities they use that are not in the factor matrix
 
-def compute_impact_use_phase(dict_data_customers, df_database):
-    dict_link_electricity_country_to_database = {
-        "France": "Mix électrique réseau, FR",
-        "Chine": "Mix électrique réseau, CN",
+    The missing materials otherwise count as 0 (with a warning in the single product functions, see
+    warn_missing_materials), and the missing electricity mixes, transportation means and distances
+    raise a KeyError. The indicators without a conversion to micropoints are a property of the
+    factor database rather than of the products: see find_unconverted_indicators.
+
+    Args:
+        list_dict_data_customers (list): dicts with the data from the customers
+        factor_matrix (FactorMatrix): factor matrix built with build_factor_matrix
+
+    Returns:
+        dict: {"Material": names of the materials, "Electricity": countries, "Transportation":
+            transportation means} not in the factor matrix and {"Distance": countries} not in the
+            distance table, with empty lists when all are there
+    """
+    set_materials = set()
+    set_countries = set()
+    set_production_countries = set()
+    for dict_data_customers in list_dict_data_customers:
+        materials = dict_data_customers["Materiaux"]
+        if isinstance(materials, BillOfMaterials):
+            set_materials.update(materials.names)
+            set_production_countries.update(materials.countries)
+        else:
+            set_materials.update(material["Nom"] for material in materials)
+            set_production_countries.update(
+                material["Lieu de production"] for material in materials
+            )
+        set_countries.add(dict_data_customers["Processing"]["Lieu d'assemblage"])
+        set_countries.add(dict_data_customers["Usage"]["Lieu d'utilisation"])
+
+    activities = factor_matrix.activities
+    return {
+        "Material": sorted(name for name in set_materials if name not in activities),
+        "Electricity": sorted(
+            country
+            for country in set_countries
+            if get_electricity_alias(country) not in activities
+        ),
+        "Transportation": [
+            mean for mean in list_transportation_means if mean not in activities
+        ],
+        "Distance": sorted(
+            country
+            for country in set_countries | set_production_countries
+            if country not in dict_country_codes
+        ),
     }
 
-    dict_impact_use_phase = {}
-    use_phase_electricity_kw = (
+
+def check_missing_activities(list_dict_data_customers, factor_matrix):
+    """Raise a KeyError listing all the activities (distances, conversions) missing for the products
+
+    See find_missing_activities.
+    """
+    dict_missing = find_missing_activities(list_dict_data_customers, factor_matrix)
+    if any(dict_missing.values()):
+        raise KeyError(
+            "Missing from the databases: "
+            + "; ".join(
+                f"{kind}: {', '.join(list_missing)}"
+                for kind, list_missing in dict_missing.items()
+                if list_missing
+            )
+        )
+
+
+def compute_use_phase_electricity(dict_data_customers):
+    """Compute the electricity consumed during the whole use phase, in kWh"""
+    return (
         dict_data_customers["Usage"]["Duree de vie (annees)"]
         * dict_data_customers["Usage"]["Nombre de cycles par an"]
         * dict_data_customers["Usage"]["Puisance (W)"]
@@ -71,18 +338,175 @@ def compute_impact_use_phase(dict_data_customers, df_database):
         / 60  # convert minutes to hours
         / 1000  # convert W to kW
     )
+
+
+def build_activity_vector_material(dict_data_customers, factor_matrix):
+    bill_of_materials = get_bill_of_materials(dict_data_customers)
+    activity_rows = get_material_activity_rows(bill_of_materials, factor_matrix)
+    found = activity_rows >= 0
+
+    return np.bincount(
+        activity_rows[found],
+        weights=bill_of_materials.useful_masses[found],
+        minlength=len(factor_matrix.matrix),
+    )
+
+
+def build_activity_vector_processing(dict_data_customers, factor_matrix):
+    activity_vector = np.zeros(len(factor_matrix.matrix))
+    processing_country = dict_data_customers["Processing"]["Lieu d'assemblage"]
+    activity_vector[
+        factor_matrix.activities[get_electricity_alias(processing_country)]
+    ] = dict_data_customers["Processing"]["Consommation d'energie (kWh)"]
+
+    return activity_vector
+
+
+def build_activity_vector_use_phase(dict_data_customers, factor_matrix):
+    activity_vector = np.zeros(len(factor_matrix.matrix))
     use_phase_country = dict_data_customers["Usage"]["Lieu d'utilisation"]
+    activity_vector[
+        factor_matrix.activities[get_electricity_alias(use_phase_country)]
+    ] = compute_use_phase_electricity(dict_data_customers)
+
+    return activity_vector
+
+
+def build_activity_vector_transportation(dict_data_customers, factor_matrix):
+    activity_vector = np.zeros(len(factor_matrix.matrix))
+    activity_vector[
+        [factor_matrix.activities[i] for i in list_transportation_means]
+    ] = compute_tkm_transportation_array(dict_data_customers)
+
+    return activity_vector
+
+
+# functions building the activity vector of each phase (same order as list_phases)
+dict_activity_vector_builders = {
+    "Material": build_activity_vector_material,
+    "Processing": build_activity_vector_processing,
+    "Use phase": build_activity_vector_use_phase,
+    "Transportation": build_activity_vector_transportation,
+}
+
+
+def build_activity_matrix(dict_data_customers, factor_matrix):
+    """Build the quantity of each activity used during each phase of the life cycle
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        factor_matrix (FactorMatrix): factor matrix built with build_factor_matrix
+
+    Returns:
+        numpy.ndarray: quantities of shape (n_phases, n_activities), rows ordered as list_phases
+    """
+    # the materials are converted to arrays once for all the phases
+    dict_data_customers = {
+        **dict_data_customers,
+        "Materiaux": get_bill_of_materials(dict_data_customers),
+    }
+
+    return np.stack(
+        [
+            dict_activity_vector_builders[phase](dict_data_customers, factor_matrix)
+            for phase in list_phases
+        ]
+    )
+
+
+def compute_impact_matrix(dict_data_customers, factor_matrix):
+    """Compute the impact of each phase with a single matrix product
+
+    Returns:
+        numpy.ndarray: impacts of shape (n_phases, n_indicators), rows ordered as list_phases
+    """
+    return (
+        build_activity_matrix(dict_data_customers, factor_matrix) @ factor_matrix.matrix
+    )
 
-    for col in df_database.columns:
-        if col != "Unit":
-            dict_impact_use_phase[col] = (
-                df_database.loc[
-                    dict_link_electricity_country_to_database[use_phase_country], col
-                ]
-                * use_phase_electricity_kw
-            )
 
-    return dict_impact_use_phase
+def compute_phase_impacts(dict_data_customers, df_database):
+    """Compute the impact of each phase of the life cycle
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        df_database (pandas.DataFrame): dataframe with the impact of the materials
+
+    Returns:
+        pandas.DataFrame: impacts with one row per phase and one column per indicator
+    """
+    import pandas as pd
+
+    factor_matrix = build_factor_matrix(df_database)
+    dict_data_customers = {
+        **dict_data_customers,
+        "Materiaux": get_bill_of_materials(dict_data_customers),
+    }
+    warn_missing_materials(dict_data_customers["Materiaux"], factor_matrix)
+
+    return pd.DataFrame(
+        compute_impact_matrix(dict_data_customers, factor_matrix),
+        index=list_phases,
+        columns=factor_matrix.indicators,
+    )
+
+
+def compute_single_phase_impact(dict_data_customers, df_database, phase):
+    """Compute the impact of a single phase, in the format {impact_name: impact_value}"""
+    factor_matrix = build_factor_matrix(df_database)
+    if phase == "Material":
+        dict_data_customers = {
+            **dict_data_customers,
+            "Materiaux": get_bill_of_materials(dict_data_customers),
+        }
+        warn_missing_materials(dict_data_customers["Materiaux"], factor_matrix)
+    activity_vector = dict_activity_vector_builders[phase](
+        dict_data_customers, factor_matrix
+    )
+
+    return dict(zip(factor_matrix.indicators, activity_vector @ factor_matrix.matrix))
+
+
+def compute_material_impact(dict_data_customers, df_database):
+    """Compute the impact of the materials
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        df_database (pandas.DataFrame): dataframe with the impact of the materials
+
+    Returns:
+        dict: dict with the impact of the materials in the format:
+            {material_name_1: {impact_name_1: impact_value, impact_name_2: impact_value, ...}}
+    """
+    factor_matrix = build_factor_matrix(df_database)
+    bill_of_materials = get_bill_of_materials(dict_data_customers)
+    warn_missing_materials(bill_of_materials, factor_matrix)
+    activity_rows = get_material_activity_rows(bill_of_materials, factor_matrix)
+    found = activity_rows >= 0
+    # only the rows of the materials are read: no (n_materials, n_activities) matrix is built
+    impact_matrix = np.zeros((len(activity_rows), len(factor_matrix.indicators)))
+    impact_matrix[found] = (
+        factor_matrix.matrix[activity_rows[found]]
+        * bill_of_materials.useful_masses[found, None]
+    )
+
+    dict_impact_material = {}
+    for material_name, impacts in zip(
+        get_material_names(bill_of_materials), impact_matrix
+    ):
+        dict_impact_material[material_name] = dict(
+            zip(factor_matrix.indicators, impacts)
+        )
+
+    return dict_impact_material
+
+
+def compute_impact_processing(dict_data_customers, df_database):
+    return compute_single_phase_impact(dict_data_customers, df_database, "Processing")
+
+
+def compute_impact_use_phase(dict_data_customers, df_database):
+    return compute_single_phase_impact(dict_data_customers, df_database, "Use phase")
 
 
 # data for the trips distance, source: https://www.searates.com/fr/services/distances-time/
@@ -97,6 +521,71 @@ distance_trips = {
 }
 
 
+list_transportation_means = ["train", "truck", "plane", "boat"]
+dict_transportation_mean_codes = {
+    mean: i for i, mean in enumerate(list_transportation_means)
+}
+# the transportation within a country is done by truck (and by default between countries)
+truck_code = dict_transportation_mean_codes["truck"]
+# the end product is transported by truck from the assembly site to the country of use
+end_product_transportation_code = truck_code
+
+
+def compile_distance_trips(distance_trips):
+    """Compile the distance_trips dict into integer-indexed arrays
+
+    Args:
+        distance_trips (dict): dict with the distances, keys look like 'France - Chine'
+
+    Returns:
+        tuple: with:
+            - dict_country_codes (dict): {country: code}, the code is the index in the arrays
+            - array_distances (numpy.ndarray): symmetric distance of the trip between two countries
+              with each transportation mean (divided by 2 for plane trips), of shape
+              (n_countries, n_countries, n_means), NaN when the trip is not in distance_trips
+            - array_trip_distances (numpy.ndarray): distance done with each transportation mean for
+              a single transport (see compute_distance_single_transport), of shape
+              (n_countries, n_countries, n_means, n_means), the third axis being the mean used
+              between the countries and the last one the mean the distance is done with
+    """
+    dict_country_codes = {}
+    for trip in distance_trips.keys():
+        for country in trip.split(" - "):
+            dict_country_codes.setdefault(country, len(dict_country_codes))
+    n_countries = len(dict_country_codes)
+    n_means = len(list_transportation_means)
+
+    distances = np.full((n_countries, n_countries), np.nan)
+    for trip, distance in distance_trips.items():
+        country_a, country_b = [dict_country_codes[i] for i in trip.split(" - ")]
+        distances[country_a, country_b] = distance
+        distances[country_b, country_a] = distance
+
+    # for plane trips, the distance is divided by 2
+    array_distances = np.repeat(distances[:, :, None], n_means, axis=2)
+    array_distances[:, :, dict_transportation_mean_codes["plane"]] /= 2
+
+    # a trip from country A to country B is done in 3 steps: within A with a truck, from A to B with
+    # the transportation mean and within B with a truck (only the first step if A == B)
+    array_trip_distances = np.zeros((n_countries, n_countries, n_means, n_means))
+    within_country = np.diagonal(array_distances[:, :, truck_code])
+    array_trip_distances[:, :, :, truck_code] += within_country[:, None, None]
+    for mean in range(n_means):
+        array_trip_distances[:, :, mean, mean] += array_distances[:, :, mean]
+    array_trip_distances[:, :, :, truck_code] += within_country[None, :, None]
+    for country in range(n_countries):
+        array_trip_distances[country, country] = 0
+        array_trip_distances[country, country, :, truck_code] = within_country[country]
+
+    return dict_country_codes, array_distances, array_trip_distances
+
+
+# compiled once at import, so that the transportation only needs indexed gathers
+dict_country_codes, array_distances, array_trip_distances = compile_distance_trips(
+    distance_trips
+)
+
+
 def get_trip_index(dict_with_info, str_a, str_b):
     """Get the info in a dict where the key looks like either 'France - Chine' or 'Chine - France'
 
@@ -108,26 +597,36 @@ def get_trip_index(dict_with_info, str_a, str_b):
     Returns:
         info: the info found in the dict
     """
-    try:
-        info = dict_with_info[f"{str_a} - {str_b}"]
-    except KeyError:
-        try:
-            info = dict_with_info[f"{str_b} - {str_a}"]
-        except KeyError:
-            raise KeyError(
-                f"Warning: distance for trip {str_a} - {str_b} not found in the database"
-            )
+    if f"{str_a} - {str_b}" in dict_with_info:
+        return dict_with_info[f"{str_a} - {str_b}"]
+    if f"{str_b} - {str_a}" in dict_with_info:
+        return dict_with_info[f"{str_b} - {str_a}"]
+    raise KeyError(
+        f"Warning: distance for trip {str_a} - {str_b} not found in the database"
+    )
+
 
-    return info
+def get_country_code(country):
+    code = dict_country_codes.get(country)
+    if code is None:
+        raise KeyError(f"Warning: country {country} not found in the distance database")
+
+    return code
 
 
 def get_distance_trip(country_from, counrty_to, transportation_mean):
-    """Get the distance of a trip from the distance_trips dict (defined above as a global variable)
+    """Get the distance of a trip from the compiled distance_trips (defined above as a global variable)
     for plane trips, the distance is divided by 2"""
-    distance = get_trip_index(distance_trips, country_from, counrty_to)
+    distance = array_distances[
+        get_country_code(country_from),
+        get_country_code(counrty_to),
+        dict_transportation_mean_codes[transportation_mean],
+    ]
+    if np.isnan(distance):
+        raise KeyError(
+            f"Warning: distance for trip {country_from} - {counrty_to} not found in the database"
+        )
 
-    if transportation_mean == "plane":
-        distance /= 2
     return distance
 
 
@@ -137,99 +636,618 @@ def compute_distance_single_transport(country_from, counrty_to, transportation_m
     - from A to B with a transportation mean
     - within B with a truck (to go from the harbor to the customer for example)
     """
+    distances = compute_trip_distances(
+        np.array([get_country_code(country_from)]),
+        np.array([get_country_code(counrty_to)]),
+        np.array([dict_transportation_mean_codes[transportation_mean]]),
+    )[0]
 
-    dict_distance_transport = {i: 0 for i in ["train", "truck", "plane", "boat"]}
+    return dict(zip(list_transportation_means, distances))
 
-    # create the list of trips to do
-    if country_from == counrty_to:
-        list_trips = [(country_from, country_from, "truck")]
-    else:
-        list_trips = [
-            (country_from, country_from, "truck"),
-            (country_from, counrty_to, transportation_mean),
-            (counrty_to, counrty_to, "truck"),
-        ]
 
-    for trip in list_trips:
-        trip_from = trip[0]
-        trip_to = trip[1]
-        trip_transportation_mean = trip[2]
-        dict_distance_transport[trip_transportation_mean] += get_distance_trip(
-            trip_from, trip_to, trip_transportation_mean
+def compute_trip_distances(countries_from, countries_to, transportation_means):
+    """Gather the distance done with each transportation mean for many trips at once
+
+    Args:
+        countries_from (numpy.ndarray): country codes of the start of the trips
+        countries_to (numpy.ndarray): country codes of the end of the trips
+        transportation_means (numpy.ndarray): codes of the mean used between the countries
+
+    Returns:
+        numpy.ndarray: distances of shape (n_trips, n_means)
+    """
+    distances = array_trip_distances[countries_from, countries_to, transportation_means]
+
+    if np.isnan(distances).any():
+        i = np.isnan(distances).any(axis=1).argmax()
+        list_countries = list(dict_country_codes.keys())
+        raise KeyError(
+            f"Warning: distance for trip {list_countries[countries_from[i]]} - "
+            f"{list_countries[countries_to[i]]} not found in the database"
         )
 
-    return dict_distance_transport
+    return distances
 
 
-def compute_tkm_transportation(dict_data_customers):
-    dict_tkm_transport = {i: 0 for i in ["train", "truck", "plane", "boat"]}
-
-    for i in range(len(dict_data_customers["Materiaux"])):
-        raw_mass = dict_data_customers["Materiaux"][i][
-            "Masse utile (kg)"
-        ]  # in kg, before processing losses
-        country_from = dict_data_customers["Materiaux"][i]["Lieu de production"]
-        country_to = dict_data_customers["Processing"]["Lieu d'assemblage"]
-
-        # get the transportation mean
-        try:
-            transportation_mean = get_trip_index(
-                dict_data_customers["Moyen de transport"], country_from, country_to
+def build_transportation_mean_matrix(dict_transportation_means):
+    """Convert the 'Moyen de transport' dict of the customer to a matrix of transportation mean codes
+
+    Args:
+        dict_transportation_means (dict): dict with keys like 'France - Chine' and values like 'boat'
+
+    Returns:
+        numpy.ndarray: code of the transportation mean between each pair of countries,
+            of shape (n_countries, n_countries), truck when the pair is not in the dict
+    """
+    matrix = np.full((len(dict_country_codes),) * 2, truck_code)
+
+    # 'A - B' has priority over 'B - A' for the trip from A to B
+    list_trips = []
+    for trip, transportation_mean in dict_transportation_means.items():
+        list_countries = trip.split(" - ")
+        if all(country in dict_country_codes for country in list_countries):
+            country_a, country_b = [dict_country_codes[i] for i in list_countries]
+            list_trips.append(
+                (
+                    country_a,
+                    country_b,
+                    dict_transportation_mean_codes[transportation_mean],
+                )
             )
-        except KeyError:
-            transportation_mean = "truck"
+    for country_a, country_b, transportation_mean in list_trips:
+        matrix[country_b, country_a] = transportation_mean
+    for country_a, country_b, transportation_mean in list_trips:
+        matrix[country_a, country_b] = transportation_mean
 
-        dict_distance_transport_material = compute_distance_single_transport(
-            country_from, country_to, transportation_mean
-        )
+    return matrix
+
+
+def compute_tkm_transportation_components(dict_data_customers):
+    """Compute the tkm done with each transportation mean, for each material and for the end product
+
+    Returns:
+        tuple: with:
+            - tkm_materials (numpy.ndarray): tkm to bring each material to the assembly site,
+              of shape (n_materials, n_means), the means ordered as list_transportation_means
+            - tkm_end_product (numpy.ndarray): tkm to bring the end product to the country of use,
+              of shape (n_means,)
+    """
+    bill_of_materials = get_bill_of_materials(dict_data_customers)
+    transportation_mean_matrix = build_transportation_mean_matrix(
+        dict_data_customers["Moyen de transport"]
+    )
+    assembly_country = get_country_code(
+        dict_data_customers["Processing"]["Lieu d'assemblage"]
+    )
+    use_country = get_country_code(dict_data_customers["Usage"]["Lieu d'utilisation"])
+
+    # transportation of the materials to the assembly site
+    materials_countries = np.array(
+        [get_country_code(i) for i in bill_of_materials.countries], dtype=int
+    )[bill_of_materials.country_ids]
+    distances_materials = compute_trip_distances(
+        materials_countries,
+        np.full(len(materials_countries), assembly_country),
+        transportation_mean_matrix[materials_countries, assembly_country],
+    )
+
+    # transportation of the end product to the country of use
+    distances_processing = compute_trip_distances(
+        np.array([assembly_country]),
+        np.array([use_country]),
+        np.array([end_product_transportation_code]),
+    )[0]
+    mass_end_product = bill_of_materials.finished_masses.sum()
+
+    return (
+        # the useful masses are before the processing losses
+        distances_materials
+        * bill_of_materials.useful_masses[:, None]
+        / 1000,  # kg to t
+        distances_processing * mass_end_product / 1000,
+    )
+
+
+def compute_trip_tkm_tables(
+    dict_transportation_means, list_countries_from, list_countries_to, list_main_means
+):
+    """Compute the tkm per kg of the trips between many countries, for many main transportation means
 
-        # Convert the distances to tkm
-        for transportation_mean in dict_distance_transport_material.keys():
-            dict_tkm_transport[transportation_mean] += (
-                dict_distance_transport_material[transportation_mean]
-                * raw_mass
-                / 1000  # convert kg to t
+    Args:
+        dict_transportation_means (dict): 'Moyen de transport' dict of the customer, its values are
+            replaced by each main transportation mean in turn (as done by the dashboard)
+        list_countries_from (list): countries of the start of the trips
+        list_countries_to (list): countries of the end of the trips
+        list_main_means (list): main transportation means
+
+    Returns:
+        numpy.ndarray: tkm done with each transportation mean for 1 kg, of shape
+            (n_countries_from, n_countries_to, n_main_means, n_means)
+    """
+    # code of the transportation mean between each pair of countries, for each main mean
+    transportation_mean_matrices = np.stack(
+        [
+            build_transportation_mean_matrix(
+                {trip: mean for trip in dict_transportation_means.keys()}
             )
+            for mean in list_main_means
+        ]
+    )
+    countries_from = np.array([get_country_code(i) for i in list_countries_from])
+    countries_to = np.array([get_country_code(i) for i in list_countries_to])
 
-    # add the transportation for the processing
-    country_from = dict_data_customers["Processing"]["Lieu d'assemblage"]
-    country_to = dict_data_customers["Usage"]["Lieu d'utilisation"]
-    # get the transportation mean between the two countries
-    try:
-        transportation_mean = get_trip_index(
-            dict_data_customers["Moyen de transport"], country_from, country_to
-        )
-    except KeyError:
-        transportation_mean = "truck"
+    countries_from, countries_to, main_means = np.meshgrid(
+        countries_from, countries_to, np.arange(len(list_main_means)), indexing="ij"
+    )
+    distances = compute_trip_distances(
+        countries_from.ravel(),
+        countries_to.ravel(),
+        transportation_mean_matrices[main_means, countries_from, countries_to].ravel(),
+    )
+
+    return distances.reshape(countries_from.shape + (-1,)) / 1000  # convert kg to t
+
+
+def compute_tkm_transportation_array(dict_data_customers):
+    """Compute the tkm done with each transportation mean, ordered as list_transportation_means"""
+    tkm_materials, tkm_end_product = compute_tkm_transportation_components(
+        dict_data_customers
+    )
+
+    return tkm_materials.sum(axis=0) + tkm_end_product
 
-    dict_distance_transport_processing = compute_distance_single_transport(
-        country_from, country_to, "truck"
+
+def compute_tkm_transportation(dict_data_customers):
+    return dict(
+        zip(
+            list_transportation_means,
+            compute_tkm_transportation_array(dict_data_customers),
+        )
     )
-    mass_end_product = sum(
-        [i["Masse produit fini (kg)"] for i in dict_data_customers["Materiaux"]]
+
+
+def compute_impact_transportation(dict_data_customers, df_database):
+    return compute_single_phase_impact(
+        dict_data_customers, df_database, "Transportation"
     )
 
-    # Convert the distances to tkm
-    for transportation_mean in dict_distance_transport_processing.keys():
-        dict_tkm_transport[transportation_mean] += (
-            dict_distance_transport_processing[transportation_mean]
-            * mass_end_product
-            / 1000  # convert kg to t
+
+def concatenate_bills_of_materials(list_dict_data_customers):
+    """Gather the materials of many products into a single BillOfMaterials
+
+    The arrays of the products are concatenated, their name_ids and country_ids being mapped to the
+    distinct names and countries of all the products.
+
+    Returns:
+        tuple: (bill_of_materials, scenario_ids), with the index of the product of each material
+    """
+    list_bills = [
+        get_bill_of_materials(dict_data_customers)
+        for dict_data_customers in list_dict_data_customers
+    ]
+    dict_name_ids = {}
+    dict_country_ids = {}
+    list_name_ids = [np.zeros(0, dtype=np.int32)]
+    list_country_ids = [np.zeros(0, dtype=np.int32)]
+    for bill_of_materials in list_bills:
+        name_ids = np.array(
+            [
+                dict_name_ids.setdefault(name, len(dict_name_ids))
+                for name in bill_of_materials.names
+            ],
+            dtype=np.int32,
         )
+        country_ids = np.array(
+            [
+                dict_country_ids.setdefault(country, len(dict_country_ids))
+                for country in bill_of_materials.countries
+            ],
+            dtype=np.int32,
+        )
+        list_name_ids.append(name_ids[bill_of_materials.name_ids])
+        list_country_ids.append(country_ids[bill_of_materials.country_ids])
+
+    bill_of_materials = BillOfMaterials(
+        list(dict_name_ids),
+        np.concatenate(list_name_ids),
+        np.concatenate([np.zeros(0)] + [i.useful_masses for i in list_bills]),
+        np.concatenate([np.zeros(0)] + [i.finished_masses for i in list_bills]),
+        list(dict_country_ids),
+        np.concatenate(list_country_ids),
+    )
+    scenario_ids = np.repeat(
+        np.arange(len(list_bills)), [len(i.name_ids) for i in list_bills]
+    )
 
-    return dict_tkm_transport
+    return bill_of_materials, scenario_ids
 
 
-def compute_impact_transportation(dict_data_customers, df_database):
-    dict_impact_transportation = {i: 0 for i in df_database.columns if i != "Unit"}
+def get_electricity_rows(list_countries, factor_matrix):
+    """Row of the electricity mix of each country in the factor matrix"""
+    return np.array(
+        [factor_matrix.activities[get_electricity_alias(i)] for i in list_countries],
+        dtype=int,
+    )
 
-    dict_tkm_transport = compute_tkm_transportation(dict_data_customers)
 
-    for col in dict_impact_transportation.keys():
-        for transportation_mean in dict_tkm_transport.keys():
-            dict_impact_transportation[col] += (
-                df_database.loc[transportation_mean, col]
-                * dict_tkm_transport[transportation_mean]
+def compute_tkm_transportation_batch(
+    list_dict_data_customers, bill_of_materials, scenario_ids
+):
+    """Compute the tkm done with each transportation mean by many products at once
+
+    Args:
+        list_dict_data_customers (list): list of dicts with the data from the customers
+        bill_of_materials (BillOfMaterials): materials of all the products, and scenario_ids the
+            product of each material (see concatenate_bills_of_materials)
+
+    Returns:
+        numpy.ndarray: tkm of shape (n_scenarios, n_means), the means ordered as
+            list_transportation_means
+    """
+    n_scenarios = len(list_dict_data_customers)
+    if n_scenarios == 0:
+        return np.zeros((0, len(list_transportation_means)))
+
+    # the products usually share a few 'Moyen de transport' dicts: one matrix per distinct dict
+    dict_matrix_ids = {}
+    matrix_ids = np.array(
+        [
+            dict_matrix_ids.setdefault(
+                tuple(dict_data_customers["Moyen de transport"].items()),
+                len(dict_matrix_ids),
             )
+            for dict_data_customers in list_dict_data_customers
+        ],
+        dtype=int,
+    )
+    transportation_mean_matrices = np.stack(
+        [build_transportation_mean_matrix(dict(i)) for i in dict_matrix_ids.keys()]
+    )
+    assembly_countries = np.array(
+        [
+            get_country_code(dict_data_customers["Processing"]["Lieu d'assemblage"])
+            for dict_data_customers in list_dict_data_customers
+        ],
+        dtype=int,
+    )
+    use_countries = np.array(
+        [
+            get_country_code(dict_data_customers["Usage"]["Lieu d'utilisation"])
+            for dict_data_customers in list_dict_data_customers
+        ],
+        dtype=int,
+    )
+
+    # transportation of the materials to the assembly site of their product
+    materials_countries = np.array(
+        [get_country_code(i) for i in bill_of_materials.countries], dtype=int
+    )[bill_of_materials.country_ids]
+    materials_assembly_countries = assembly_countries[scenario_ids]
+    distances_materials = compute_trip_distances(
+        materials_countries,
+        materials_assembly_countries,
+        transportation_mean_matrices[
+            matrix_ids[scenario_ids], materials_countries, materials_assembly_countries
+        ],
+    )
+    tkm_transport = np.zeros((n_scenarios, len(list_transportation_means)))
+    # the useful masses are before the processing losses
+    np.add.at(
+        tkm_transport,
+        scenario_ids,
+        distances_materials * bill_of_materials.useful_masses[:, None] / 1000,
+    )
+
+    # transportation of the end products to their country of use
+    distances_end_products = compute_trip_distances(
+        assembly_countries,
+        use_countries,
+        np.full(n_scenarios, end_product_transportation_code),
+    )
+    masses_end_products = np.bincount(
+        scenario_ids, weights=bill_of_materials.finished_masses, minlength=n_scenarios
+    )
+
+    return tkm_transport + distances_end_products * masses_end_products[:, None] / 1000
 
-    return dict_impact_transportation
+
+def build_activity_triples(list_dict_data_customers, factor_matrix):
+    """List the activities used by many products at once, as (scenario, phase, row, quantity)
+
+    The quantities are only built for the activities actually used, so the memory does not depend
+    on the size of the factor library.
+
+    Args:
+        list_dict_data_customers (list): list of dicts with the data from the customers
+        factor_matrix (FactorMatrix): factor matrix built with build_factor_matrix
+
+    Returns:
+        tuple: arrays of the same length, with:
+            - scenario_ids (numpy.ndarray): index of the product
+            - phase_ids (numpy.ndarray): index of the phase in list_phases
+            - activity_rows (numpy.ndarray): row of the activity in the factor matrix
+            - quantities (numpy.ndarray): quantity of the activity
+    """
+    n_scenarios = len(list_dict_data_customers)
+    scenarios = np.arange(n_scenarios)
+    n_means = len(list_transportation_means)
+
+    bill_of_materials, material_scenario_ids = concatenate_bills_of_materials(
+        list_dict_data_customers
+    )
+    material_rows = get_material_activity_rows(bill_of_materials, factor_matrix)
+    found = material_rows >= 0
+
+    processing_rows = get_electricity_rows(
+        [i["Processing"]["Lieu d'assemblage"] for i in list_dict_data_customers],
+        factor_matrix,
+    )
+    processing_energies = np.array(
+        [
+            i["Processing"]["Consommation d'energie (kWh)"]
+            for i in list_dict_data_customers
+        ],
+        dtype=float,
+    )
+    use_phase_rows = get_electricity_rows(
+        [i["Usage"]["Lieu d'utilisation"] for i in list_dict_data_customers],
+        factor_matrix,
+    )
+    use_phase_electricity = np.array(
+        [compute_use_phase_electricity(i) for i in list_dict_data_customers],
+        dtype=float,
+    )
+    transportation_rows = np.array(
+        [factor_matrix.activities[i] for i in list_transportation_means], dtype=int
+    )
+    tkm_transport = compute_tkm_transportation_batch(
+        list_dict_data_customers, bill_of_materials, material_scenario_ids
+    )
+
+    return (
+        np.concatenate(
+            [
+                material_scenario_ids[found],
+                scenarios,
+                scenarios,
+                np.repeat(scenarios, n_means),
+            ]
+        ),
+        np.concatenate(
+            [
+                np.full(found.sum(), list_phases.index("Material")),
+                np.full(n_scenarios, list_phases.index("Processing")),
+                np.full(n_scenarios, list_phases.index("Use phase")),
+                np.full(n_scenarios * n_means, list_phases.index("Transportation")),
+            ]
+        ),
+        np.concatenate(
+            [
+                material_rows[found],
+                processing_rows,
+                use_phase_rows,
+                np.tile(transportation_rows, n_scenarios),
+            ]
+        ),
+        np.concatenate(
+            [
+                bill_of_materials.useful_masses[found],
+                processing_energies,
+                use_phase_electricity,
+                tkm_transport.ravel(),
+            ]
+        ),
+    )
+
+
+def compute_impact_matrices(list_dict_data_customers, factor_matrix):
+    """Compute the impact of each phase of many products at once
+
+    Each used activity contributes quantity x factors to its (scenario, phase), the contributions
+    being summed with a single scatter-add: no array has one entry per activity of the library.
+
+    Args:
+        list_dict_data_customers (list): list of dicts with the data from the customers
+        factor_matrix (FactorMatrix): factor matrix built with build_factor_matrix
+
+    Returns:
+        numpy.ndarray: impacts of shape (n_scenarios, n_phases, n_indicators)
+    """
+    scenario_ids, phase_ids, activity_rows, quantities = build_activity_triples(
+        list_dict_data_customers, factor_matrix
+    )
+    impact_matrices = np.zeros(
+        (
+            len(list_dict_data_customers),
+            len(list_phases),
+            len(factor_matrix.indicators),
+        )
+    )
+    np.add.at(
+        impact_matrices,
+        (scenario_ids, phase_ids),
+        quantities[:, None] * factor_matrix.matrix[activity_rows],
+    )
+
+    return impact_matrices
+
+
+def compute_impacts_batch(data_customers, df_database, list_scenario_names=None):
+    """Compute the impact of each phase for many product variants in one call
+
+    Args:
+        data_customers (list or pandas.DataFrame): either a list of dicts with the data from the
+            customers, or a dataframe with one row per scenario and the columns "Usage",
+            "Materiaux", "Processing" and "Moyen de transport"
+        df_database (pandas.DataFrame): dataframe with the impact of the materials
+        list_scenario_names (list, optional): name of each scenario. Defaults to the index of
+            the dataframe, or to 0, 1, 2... for a list.
+
+    Returns:
+        pandas.DataFrame: impacts with a (scenario, phase) multi-index and one column per indicator
+    """
+    import pandas as pd
+
+    if isinstance(data_customers, pd.DataFrame):
+        if list_scenario_names is None:
+            list_scenario_names = list(data_customers.index)
+        data_customers = data_customers.to_dict("records")
+    if list_scenario_names is None:
+        list_scenario_names = list(range(len(data_customers)))
+
+    factor_matrix = build_factor_matrix(df_database)
+    impact_matrices = compute_impact_matrices(data_customers, factor_matrix)
+
+    return pd.DataFrame(
+        impact_matrices.reshape(-1, len(factor_matrix.indicators)),
+        index=pd.MultiIndex.from_product(
+            [list_scenario_names, list_phases], names=["scenario", "phase"]
+        ),
+        columns=factor_matrix.indicators,
+    )
+
+
+# convert the different impacts to micropoints, to be able to compare them (the indicators of other
+# factor databases that are not in this table count as 0 micropoints, see get_micropoint_weights)
+conversion_to_micropoints = {
+    "kg eq. CO2": 28.6,
+    "eq. kBq U235": 12.73,
+    "kg eq. Sb": 1395510,
+}
+
+
+def get_micropoint_weights(list_indicators):
+    """Micropoints of one unit of each indicator, 0 for the indicators not in conversion_to_micropoints"""
+    return np.array(
+        [conversion_to_micropoints.get(i, 0) for i in list_indicators], dtype=float
+    )
+
+
+def find_unconverted_indicators(list_indicators):
+    """Indicators not in conversion_to_micropoints (they count as 0 micropoints)
+
+    They are reported as information, e.g. for the factor libraries with more indicators than
+    conversion_to_micropoints, and are not checked by check_missing_activities.
+    """
+    return [i for i in list_indicators if i not in conversion_to_micropoints]
+
+
+# rows and extra columns of the impact table displayed in the dashboard
+list_impact_table_rows = list_phases + [
+    "Total per category",
+    "Total per category (micropoints)",
+    "Distribution per indicator (%)",
+]
+list_impact_table_extra_columns = [
+    "Total per phase (micropoints)",
+    "Distribution per phase (%)",
+]
+
+
+def compute_impact_tables(impact_matrices, list_indicators):
+    """Add the totals, micropoints and distributions to the impacts of each phase
+
+    Works on any number of scenarios at once (leading dimensions of impact_matrices).
+
+    Args:
+        impact_matrices (numpy.ndarray): impacts of shape (..., n_phases, n_indicators)
+        list_indicators (list): name of the indicators (see get_micropoint_weights)
+
+    Returns:
+        numpy.ndarray: impact tables of shape (..., n_rows, n_indicators + 2), with the rows
+            list_impact_table_rows and the columns list_indicators + list_impact_table_extra_columns
+    """
+    conversion = get_micropoint_weights(list_indicators)
+    impact_matrices = np.asarray(impact_matrices, dtype=float)
+    n_indicators = len(list_indicators)
+
+    tables = np.zeros(
+        impact_matrices.shape[:-2] + (len(list_impact_table_rows), n_indicators + 2)
+    )
+    # impact of each phase, then sum per category and its conversion to micropoints
+    tables[..., : len(list_phases), :n_indicators] = impact_matrices
+    tables[..., 4, :n_indicators] = impact_matrices.sum(axis=-2)
+    tables[..., 5, :n_indicators] = tables[..., 4, :n_indicators] * conversion
+
+    # sum of the impacts, per row, in micropoints
+    tables[..., :6, n_indicators] = tables[..., :6, :n_indicators] @ conversion
+    total_micropoints = tables[..., 4, n_indicators, None]
+
+    # percentage impact of each category
+    tables[..., 6, : n_indicators + 1] = (
+        tables[..., 5, : n_indicators + 1] / total_micropoints * 100
+    )
+    # percentage impact of each phase
+    tables[..., :, n_indicators + 1] = (
+        tables[..., :, n_indicators] / total_micropoints * 100
+    )
+
+    return tables
+
+
+def build_impact_table(df_phase_impacts):
+    """Build the impact table displayed in the dashboard (df_impact) from the impacts of each phase
+
+    Args:
+        df_phase_impacts (pandas.DataFrame): impacts with one row per phase and one column per
+            indicator (see compute_phase_impacts)
+
+    Returns:
+        pandas.DataFrame: impact table, with the totals, micropoints and distributions
+    """
+    import pandas as pd
+
+    list_indicators = list(df_phase_impacts.columns)
+
+    return pd.DataFrame(
+        compute_impact_tables(df_phase_impacts.to_numpy(), list_indicators),
+        index=list_impact_table_rows,
+        columns=list_indicators + list_impact_table_extra_columns,
+    )
+
+
+def compute_impact_tables_batch(data_customers, df_database, list_scenario_names=None):
+    """Compute the impact table (df_impact of the dashboard) of many product variants in one call
+
+    Args:
+        data_customers (list or pandas.DataFrame): data from the customers (see compute_impacts_batch)
+        df_database (pandas.DataFrame): dataframe with the impact of the materials
+        list_scenario_names (list, optional): name of each scenario (see compute_impacts_batch)
+
+    Returns:
+        pandas.DataFrame: impact tables with a (scenario, row) multi-index
+    """
+    return build_impact_tables_batch(
+        compute_impacts_batch(data_customers, df_database, list_scenario_names)
+    )
+
+
+def build_impact_tables_batch(df_impacts):
+    """Build the impact tables of many scenarios from the impacts of their phases
+
+    Args:
+        df_impacts (pandas.DataFrame): impacts with a (scenario, phase) multi-index and one column
+            per indicator (see compute_impacts_batch)
+
+    Returns:
+        pandas.DataFrame: impact tables with a (scenario, row) multi-index
+    """
+    import pandas as pd
+
+    list_indicators = list(df_impacts.columns)
+    list_scenario_names = list(
+        df_impacts.index.get_level_values(0)[:: len(list_phases)]
+    )
+
+    tables = compute_impact_tables(
+        df_impacts.to_numpy().reshape(-1, len(list_phases), len(list_indicators)),
+        list_indicators,
+    )
+
+    return pd.DataFrame(
+        tables.reshape(-1, tables.shape[-1]),
+        index=pd.MultiIndex.from_product(
+            [list_scenario_names, list_impact_table_rows], names=["scenario", "row"]
+        ),
+        columns=list_indicators + list_impact_table_extra_columns,
+    )
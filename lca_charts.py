@@ -0,0 +1,90 @@
+"""Altair charts of the dashboard, shared with the static reports (see lca_reports)
+
+Importing this module imports altair, so it is only imported when a chart is displayed.
+"""
+
+import altair as alt
+
+# size of the pie charts
+chart_width = 500
+chart_height = 400
+
+
+def build_pie_chart(df_distribution, value_column, list_tooltips, interval_column=None):
+    """Pie chart of a distribution, labelled with its "index" column
+
+    Args:
+        df_distribution (pandas.DataFrame): one row per slice, with the columns "index" and
+            value_column (see lca_result_cache.build_distribution_per_indicator and
+            build_distribution_per_phase)
+        value_column (str): column with the size of the slices, in %
+        list_tooltips (list): altair shorthands of the tooltips
+        interval_column (str, optional): column displayed under the labels (e.g. the 95%
+            confidence interval). Defaults to None.
+
+    Returns:
+        altair.LayerChart: the pie and its labels
+    """
+    base = alt.Chart(df_distribution).encode(
+        alt.Theta(f"{value_column}:Q").stack(True),
+        alt.Color("index:N").legend(None),
+        alt.Tooltip(list_tooltips),
+    )
+
+    pie = base.mark_arc(outerRadius=100).properties(
+        width=chart_width, height=chart_height
+    )
+    text = base.mark_text(radius=160, size=20).encode(text="index:N")
+    if interval_column is not None:
+        text += base.mark_text(radius=160, size=12, dy=20).encode(
+            text=f"{interval_column}:N"
+        )
+
+    return pie + text
+
+
+def build_pie_chart_per_category(distribution_per_indicator, interval_column=None):
+    """Pie chart "Impact per category" of the dashboard"""
+    list_tooltips = [
+        "index:N",
+        "Distribution per indicator (%):Q",
+        "Total per category:Q",
+    ]
+    if interval_column is not None:
+        list_tooltips.append(f"{interval_column}:N")
+
+    return build_pie_chart(
+        distribution_per_indicator.reset_index(),
+        "Distribution per indicator (%)",
+        list_tooltips,
+        interval_column,
+    )
+
+
+def build_pie_chart_per_phase(distribution_per_phase, interval_column=None):
+    """Pie chart "Impact per phase" of the dashboard"""
+    list_tooltips = ["index:N", "Distribution per phase (%):Q"]
+    if interval_column is not None:
+        list_tooltips.append(f"{interval_column}:N")
+
+    return build_pie_chart(
+        distribution_per_phase,
+        "Distribution per phase (%)",
+        list_tooltips,
+        interval_column,
+    )
+
+
+def build_tornado_chart(df_tornado):
+    """Tornado chart "What drives the impact?" of the dashboard"""
+    return (
+        alt.Chart(df_tornado)
+        .mark_bar()
+        .encode(
+            alt.X("Low (%):Q", title="Change of the total impact (%)"),
+            alt.X2("High (%):Q"),
+            alt.Y("Input:N", sort=None, title=None),
+            alt.Color("Input:N").legend(None),
+            alt.Tooltip(["Input:N", "Low (%):Q", "High (%):Q"]),
+        )
+    )
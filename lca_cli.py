@@ -0,0 +1,319 @@
+"""Headless runner computing the impact table of many products, without the Streamlit dashboard
+
+The inputs are customer files in the format of data/dict_data_customers.json: either .json files
+(one product, or a list of products) or .jsonl streams (one product per line, "-" for stdin), or
+tables with one row per material (.csv or .xlsx, see lca_ingestion). The inputs are streamed and
+the results written chunk by chunk, so the memory does not depend on the size of the inputs.
+
+Examples:
+    python -m lca_cli data/dict_data_customers.json -o results.csv
+    python -m lca_cli export.csv -o results.parquet --chunk-size 5000
+    cat products.jsonl | python -m lca_cli - -o results.parquet --jobs 8
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import json
+import os
+import sys
+from pathlib import Path
+
+import lca_calculations
+import lca_database
+import lca_use_phase
+
+default_data_file_path = Path(__file__).parent / "data" / "Holis - Technical test.xlsx"
+
+# factor matrix of the worker processes (memory-mapped, shared by all the workers)
+worker_factor_matrix = None
+# compiled electricity trajectories of the worker processes, None for the static use phase
+worker_compiled_trajectories = None
+
+
+def read_customer_records(list_input_paths):
+    """Read the customer records of the input files, one at a time
+
+    Args:
+        list_input_paths (list): paths to .json, .jsonl, .csv or .xlsx files, "-" to read JSON
+            lines from stdin
+
+    Yields:
+        tuple: (scenario_name, dict_data_customers), the scenario name being the stem of the file
+            (followed by the position of the record for lists and JSON lines, and by the product
+            id for tables)
+    """
+    for input_path in list_input_paths:
+        if input_path == "-":
+            yield from read_json_lines(sys.stdin, "stdin")
+            continue
+
+        input_path = Path(input_path)
+        if input_path.suffix == ".jsonl":
+            with open(input_path, "r") as f:
+                yield from read_json_lines(f, input_path.stem)
+        elif input_path.suffix in [".csv", ".xlsx"]:
+            # only the tables need pandas and openpyxl to be read
+            import lca_ingestion
+
+            for product_id, dict_data_customers in lca_ingestion.read_table_records(
+                input_path
+            ):
+                yield f"{input_path.stem}:{product_id}", dict_data_customers
+        else:
+            with open(input_path, "r") as f:
+                data = json.load(f)
+            if isinstance(data, list):
+                for i, dict_data_customers in enumerate(data):
+                    yield f"{input_path.stem}:{i}", dict_data_customers
+            else:
+                yield input_path.stem, data
+
+
+def read_json_lines(f, name):
+    for i, line in enumerate(f):
+        if line.strip():
+            yield f"{name}:{i}", json.loads(line)
+
+
+def iter_chunks(iterable, chunk_size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        yield chunk
+
+
+def init_worker(data_file_path, alias_file_path=None, compiled_trajectories=None):
+    global worker_factor_matrix, worker_compiled_trajectories
+    worker_factor_matrix, _ = lca_database.SharedFactorDatabase(
+        data_file_path, alias_file_path=alias_file_path
+    ).get()
+    worker_compiled_trajectories = compiled_trajectories
+
+
+def check_chunks(chunks, factor_matrix, strict=False):
+    """Check that the activities used by each chunk are in the factor database, before computing it
+
+    Each missing activity is reported once (the missing materials count as 0 in the results). With
+    strict, a KeyError listing the missing activities of the first incomplete chunk is raised.
+    """
+    dict_reported = collections.defaultdict(set)
+    for chunk in chunks:
+        list_dict_data_customers = [dict_data for _, dict_data in chunk]
+        if strict:
+            lca_calculations.check_missing_activities(
+                list_dict_data_customers, factor_matrix
+            )
+            yield chunk
+            continue
+
+        dict_missing = lca_calculations.find_missing_activities(
+            list_dict_data_customers, factor_matrix
+        )
+        for kind, list_missing in dict_missing.items():
+            list_new = [i for i in list_missing if i not in dict_reported[kind]]
+            if list_new:
+                print(
+                    f"Warning: missing from the databases ({kind}): {', '.join(list_new)}",
+                    file=sys.stderr,
+                )
+                dict_reported[kind].update(list_new)
+        yield chunk
+
+
+def compute_chunk(list_records):
+    """Compute the impact tables of a chunk of (scenario_name, dict_data_customers) records"""
+    list_scenario_names = [name for name, _ in list_records]
+    list_dict_data_customers = [dict_data for _, dict_data in list_records]
+
+    if worker_compiled_trajectories is not None:
+        return lca_use_phase.compute_impact_tables_batch(
+            list_dict_data_customers,
+            worker_factor_matrix,
+            worker_compiled_trajectories,
+            list_scenario_names,
+        )
+    return lca_calculations.compute_impact_tables_batch(
+        list_dict_data_customers, worker_factor_matrix, list_scenario_names
+    )
+
+
+def map_chunks(
+    chunks, jobs, data_file_path, alias_file_path=None, compiled_trajectories=None
+):
+    """Compute the chunks in order, with at most 2 pending chunks per process to bound the memory"""
+    if jobs == 1:
+        init_worker(data_file_path, alias_file_path, compiled_trajectories)
+        yield from map(compute_chunk, chunks)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_worker,
+        initargs=(data_file_path, alias_file_path, compiled_trajectories),
+    ) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(compute_chunk, chunk))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_results(df_results_chunks, output_path):
+    """Write the impact tables, appended chunk by chunk
+
+    Returns:
+        int: number of scenarios written
+    """
+    output_path = Path(output_path)
+    n_scenarios = 0
+
+    if output_path.suffix == ".parquet":
+        # parquet files are written with one row group per chunk (requires pyarrow)
+        import pyarrow
+        import pyarrow.parquet
+
+        writer = None
+        try:
+            for df_results in df_results_chunks:
+                table = pyarrow.Table.from_pandas(df_results)
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+                n_scenarios += len(df_results) // len(
+                    lca_calculations.list_impact_table_rows
+                )
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            import pandas as pd
+
+            pd.DataFrame().to_parquet(output_path)
+
+        return n_scenarios
+
+    for i, df_results in enumerate(df_results_chunks):
+        df_results.to_csv(output_path, mode="w" if i == 0 else "a", header=i == 0)
+        n_scenarios += len(df_results) // len(lca_calculations.list_impact_table_rows)
+
+    return n_scenarios
+
+
+def format_error(error):
+    """Message of an error, without the quotes added by str around the message of a KeyError"""
+    if isinstance(error, KeyError) and len(error.args) == 1:
+        return str(error.args[0])
+    return str(error)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compute the life cycle impacts of many products (same table as the dashboard)"
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help='customer .json or .jsonl files, "-" to read JSON lines from stdin',
+    )
+    parser.add_argument(
+        "-o", "--output", required=True, help="output .csv or .parquet file"
+    )
+    parser.add_argument(
+        "--database",
+        default=default_data_file_path,
+        help="excel workbook with the Database sheet, or .csv/.parquet table of the factors "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--aliases",
+        help="csv file of aliases of the activities of the database (see "
+        "lca_database.read_alias_table)",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="stop when a product uses an activity that is not in the database, instead of "
+        "counting its materials as 0",
+    )
+    parser.add_argument(
+        "--electricity-trajectories",
+        help="csv file of the trajectories of the electricity mixes over the years of use, for "
+        "a time-resolved use phase (see lca_use_phase.read_electricity_trajectories)",
+    )
+    parser.add_argument(
+        "--start-year",
+        type=int,
+        help="first year of use in the electricity trajectories (default: their first year)",
+    )
+    parser.add_argument(
+        "--usage-profile",
+        help="csv file with the share of the use in each step of a year of the electricity "
+        "trajectories (default: uniform use)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of processes (default: number of cores)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="number of products computed together (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        # publish the snapshot of the database once, before the workers attach to it (this also
+        # validates the aliases)
+        factor_matrix, _ = lca_database.SharedFactorDatabase(
+            args.database, alias_file_path=args.aliases
+        ).get()
+        list_unconverted = lca_calculations.find_unconverted_indicators(
+            factor_matrix.indicators
+        )
+        if list_unconverted:
+            print(
+                "Note: no conversion to micropoints (counted as 0 micropoints) for "
+                + ", ".join(list_unconverted),
+                file=sys.stderr,
+            )
+        compiled_trajectories = None
+        if args.electricity_trajectories:
+            usage_profile = None
+            if args.usage_profile:
+                usage_profile = lca_use_phase.read_usage_profile(args.usage_profile)
+            compiled_trajectories = lca_use_phase.compile_trajectories(
+                lca_use_phase.read_electricity_trajectories(
+                    args.electricity_trajectories, args.start_year
+                ),
+                factor_matrix,
+                usage_profile,
+            )
+
+        chunks = check_chunks(
+            iter_chunks(read_customer_records(args.inputs), args.chunk_size),
+            factor_matrix,
+            args.strict,
+        )
+        n_scenarios = write_results(
+            map_chunks(
+                chunks,
+                max(args.jobs, 1),
+                args.database,
+                args.aliases,
+                compiled_trajectories,
+            ),
+            args.output,
+        )
+    except (KeyError, ValueError) as error:
+        sys.exit(f"Error: {format_error(error)}")
+    print(f"{n_scenarios} products written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import numpy as np
+
+import lca_calculations
+
+# name of the column with the total of the indicators, converted to micropoints
+total_micropoints_column = "Total (micropoints)"
+
+
+def build_input_quantities(dict_data_customers, factor_matrix):
+    """List the inputs the impacts are linear in, with their quantity and their activity
+
+    The inputs are the useful mass of each material, the electricity of the processing, the
+    electricity of the use phase and the tkm done with each transportation mean.
+
+    Returns:
+        tuple: with:
+            - list_inputs (list): (phase, input name) of each input
+            - quantities (numpy.ndarray): quantity of each input
+            - activity_rows (numpy.ndarray): row of the activity of each input in the factor
+              matrix, -1 when the activity is not in the database (its factors are then 0)
+    """
+    bill_of_materials = lca_calculations.get_bill_of_materials(dict_data_customers)
+    list_inputs = [
+        ("Material", f"{name} (kg)")
+        for name in lca_calculations.get_material_names(bill_of_materials)
+    ]
+    list_quantities = list(bill_of_materials.useful_masses)
+    list_activity_rows = [
+        factor_matrix.activities.get(name, -1)
+        for name in lca_calculations.get_material_names(bill_of_materials)
+    ]
+
+    list_inputs.append(("Processing", "Electricity (kWh)"))
+    list_quantities.append(
+        dict_data_customers["Processing"]["Consommation d'energie (kWh)"]
+    )
+    list_activity_rows.append(
+        factor_matrix.activities[
+            lca_calculations.get_electricity_alias(
+                dict_data_customers["Processing"]["Lieu d'assemblage"]
+            )
+        ]
+    )
+
+    list_inputs.append(("Use phase", "Electricity (kWh)"))
+    list_quantities.append(
+        lca_calculations.compute_use_phase_electricity(dict_data_customers)
+    )
+    list_activity_rows.append(
+        factor_matrix.activities[
+            lca_calculations.get_electricity_alias(
+                dict_data_customers["Usage"]["Lieu d'utilisation"]
+            )
+        ]
+    )
+
+    tkm_transport = lca_calculations.compute_tkm_transportation_array(
+        dict_data_customers
+    )
+    for transportation_mean, tkm in zip(
+        lca_calculations.list_transportation_means, tkm_transport
+    ):
+        list_inputs.append(("Transportation", f"{transportation_mean} (tkm)"))
+        list_quantities.append(tkm)
+        list_activity_rows.append(factor_matrix.activities[transportation_mean])
+
+    return (
+        list_inputs,
+        np.array(list_quantities, dtype=float),
+        np.array(list_activity_rows, dtype=int),
+    )
+
+
+def compute_contributions(dict_data_customers, df_database):
+    """Compute the exact sensitivity of the impacts to each input, and each input's contribution
+
+    Every phase is linear in its inputs, so the partial derivative of an indicator with respect to
+    an input is the factor of its activity, and its contribution is quantity x derivative: the
+    contributions of all the inputs sum to the total impact. Everything is computed in one pass
+    with array operations.
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        df_database (pandas.DataFrame): dataframe with the impact of the materials
+
+    Returns:
+        pandas.DataFrame: one row per input, indexed by (phase, input), with the column
+            ("Quantity", "") and the columns (kind, indicator) with kind in "Derivative",
+            "Contribution" and "Share (%)", for each indicator and for the total in micropoints
+    """
+    import pandas as pd
+
+    factor_matrix = lca_calculations.build_factor_matrix(df_database)
+    list_inputs, quantities, activity_rows = build_input_quantities(
+        dict_data_customers, factor_matrix
+    )
+    conversion = lca_calculations.get_micropoint_weights(factor_matrix.indicators)
+
+    # derivative of each indicator, then of the total in micropoints, with respect to each input
+    derivatives = np.zeros((len(list_inputs), len(factor_matrix.indicators) + 1))
+    found = activity_rows >= 0
+    derivatives[found, :-1] = factor_matrix.matrix[activity_rows[found]]
+    derivatives[:, -1] = derivatives[:, :-1] @ conversion
+
+    contributions = derivatives * quantities[:, None]
+    totals = contributions.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = np.where(totals != 0, contributions / totals * 100, 0)
+
+    list_columns = factor_matrix.indicators + [total_micropoints_column]
+    df_contributions = pd.concat(
+        {
+            "Derivative": pd.DataFrame(derivatives, columns=list_columns),
+            "Contribution": pd.DataFrame(contributions, columns=list_columns),
+            "Share (%)": pd.DataFrame(shares, columns=list_columns),
+        },
+        axis=1,
+    )
+    df_contributions.insert(0, ("Quantity", ""), quantities)
+    df_contributions.index = pd.MultiIndex.from_tuples(
+        list_inputs, names=["phase", "input"]
+    )
+
+    return df_contributions
+
+
+def compute_tornado(df_contributions, column=total_micropoints_column, variation=10):
+    """Compute the change of an indicator when each input varies by +/- variation %
+
+    Args:
+        df_contributions (pandas.DataFrame): output of compute_contributions
+        column (str, optional): indicator. Defaults to the total in micropoints.
+        variation (float, optional): variation of the inputs, in %. Defaults to 10.
+
+    Returns:
+        pandas.DataFrame: one row per input, sorted by decreasing effect, with the columns
+            "Input", "Low (%)" and "High (%)" (change of the indicator, in %)
+    """
+    import pandas as pd
+
+    shares = df_contributions[("Share (%)", column)]
+    df_tornado = pd.DataFrame(
+        {
+            "Input": [f"{phase} - {name}" for phase, name in df_contributions.index],
+            "Low (%)": -shares.to_numpy() * variation / 100,
+            "High (%)": shares.to_numpy() * variation / 100,
+        }
+    )
+
+    return df_tornado.iloc[np.argsort(-shares.abs().to_numpy(), kind="stable")]
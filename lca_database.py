@@ -0,0 +1,520 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import threading
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+import lca_calculations
+import lca_instrumentation
+
+# rename the index of the database to match the name of the material in the customer data
+dict_link_database_to_customer_data = {
+    "Plaque de polystyrène, (PS), RER": "Plaque de PPMA",
+    "Acier inoxydable, rouleaux, laminés à froid": "Acier",
+    "Mix cuivre (99,999% issu de l'électrolyse)": "Fil de cuivre",
+    "Transport maritime par porte-conteneurs  [tkm], GLO": "boat",
+    "Transport ferroviaire , GLO défaut": "train",
+    "Transport en camion [tkm], GLO": "truck",
+    "Transport aérien moyen-courrier  [tkm], GLO": "plane",
+}
+
+# version of the snapshot format, to be incremented when the way the snapshot is written changes
+snapshot_version = 1
+
+
+def read_database_excel(data_file_path):
+    """Read the "Database" sheet of the workbook (slow, as openpyxl parses the whole workbook)
+
+    Args:
+        data_file_path (Path): path to the excel workbook
+
+    Returns:
+        pandas.DataFrame: the database, cleaned and renamed to match the customer data
+    """
+    import pandas as pd
+
+    with lca_instrumentation.instrumentation.measure("database: read excel"):
+        df = pd.read_excel(data_file_path, sheet_name="Database", header=3, index_col=0)
+
+    # remove white spaces at the end and the beginning of the index
+    df.index = df.index.str.strip()
+
+    df.rename(index=dict_link_database_to_customer_data, inplace=True)
+
+    return df
+
+
+def read_database_table(data_file_path):
+    """Read a database exported as a table (.csv or .parquet), e.g. a whole LCI library
+
+    Args:
+        data_file_path (Path): path to the table, with one row per activity: its name in the first
+            column (or the index of the parquet file), one column per indicator and optionally a
+            "Unit" column
+
+    Returns:
+        pandas.DataFrame: the database
+    """
+    import pandas as pd
+
+    with lca_instrumentation.instrumentation.measure("database: read table"):
+        if Path(data_file_path).suffix == ".parquet":
+            df = pd.read_parquet(data_file_path)
+            if isinstance(df.index, pd.RangeIndex):
+                df = df.set_index(df.columns[0])
+        else:
+            df = pd.read_csv(data_file_path, index_col=0)
+
+    df.index = df.index.astype(str).str.strip()
+
+    return df
+
+
+# function reading the database, for each file extension
+dict_database_readers = {
+    ".xlsx": read_database_excel,
+    ".csv": read_database_table,
+    ".parquet": read_database_table,
+}
+
+
+def read_database(data_file_path):
+    """Read the database with the reader of its file extension (see dict_database_readers)"""
+    suffix = Path(data_file_path).suffix
+    if suffix not in dict_database_readers:
+        raise KeyError(
+            f"Unsupported format of the database: {suffix} (supported: "
+            f"{', '.join(dict_database_readers)})"
+        )
+
+    return dict_database_readers[suffix](data_file_path)
+
+
+def read_alias_table(alias_file_path):
+    """Read the aliases of the activities of the database, from a csv file
+
+    The aliases map the names used by the customers to the activities of the database, so that
+    products can be modelled with any library without renaming it. The file has the columns
+    "Alias" and "Activity", e.g.:
+        Alias,Activity
+        Acier,"Acier inoxydable, rouleaux, laminés à froid"
+        "Electricity, Allemagne","Mix électrique réseau, DE"
+    (the electricity mix of a country is the activity of the alias "Electricity, <country>").
+
+    Raises:
+        KeyError: listing all the aliases given twice with different activities
+
+    Returns:
+        dict: {alias: activity name}
+    """
+    dict_aliases = {}
+    list_conflicts = []
+    with open(alias_file_path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            alias, activity = row["Alias"].strip(), row["Activity"].strip()
+            if dict_aliases.get(alias, activity) != activity:
+                list_conflicts.append(f"{alias} -> {dict_aliases[alias]} or {activity}")
+            dict_aliases[alias] = activity
+
+    if list_conflicts:
+        raise KeyError(
+            f"Conflicting aliases in {alias_file_path}: {'; '.join(list_conflicts)}"
+        )
+
+    return dict_aliases
+
+
+def hash_file(file_path):
+    """Compute the sha256 hash of a file"""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+
+    return sha256.hexdigest()
+
+
+def get_snapshot_folder(data_file_path, snapshot_folder=None):
+    """Get the folder of the snapshot of the database (by default, a ".cache" folder next to the workbook)"""
+    if snapshot_folder is None:
+        snapshot_folder = Path(data_file_path).parent / ".cache"
+
+    return Path(snapshot_folder)
+
+
+def get_metadata_path(data_file_path, snapshot_folder=None):
+    """Get the path of the metadata of the snapshot, that points to the current values file"""
+    return (
+        get_snapshot_folder(data_file_path, snapshot_folder)
+        / f"{Path(data_file_path).stem}.database.json"
+    )
+
+
+def write_database_snapshot(df_database, dict_workbook_info, metadata_path):
+    """Write the database as a .npy file (numeric columns) and a .json file (everything else)
+
+    The values file is named after the hash of the workbook, so a new version never overwrites a
+    file that other processes may have memory-mapped. The metadata file is written to a temporary
+    file and then renamed: switching to the new version is atomic for the readers. The values of
+    the previous version are kept, for the readers that read its metadata just before the switch,
+    and removed when the next version is written (see publish_and_read_snapshot).
+
+    Returns:
+        dict: the metadata of the snapshot
+    """
+    metadata_path.parent.mkdir(parents=True, exist_ok=True)
+    stem = metadata_path.name[: -len(".json")]
+    values_path = metadata_path.with_name(
+        f"{stem}.{dict_workbook_info['sha256'][:16]}.npy"
+    )
+
+    list_numeric_columns = list(df_database.select_dtypes("number").columns)
+    dict_metadata = {
+        "snapshot_version": snapshot_version,
+        **dict_workbook_info,
+        "values_file": values_path.name,
+        "index_renaming": dict_link_database_to_customer_data,
+        "index": list(df_database.index),
+        "columns": list(df_database.columns),
+        "numeric_columns": list_numeric_columns,
+        "text_columns": {
+            col: list(df_database[col])
+            for col in df_database.columns
+            if col not in list_numeric_columns
+        },
+    }
+
+    previous_values_file = read_snapshot_metadata(metadata_path).get("values_file")
+    if not values_path.exists():
+        tmp_values_path = values_path.with_name(f"{values_path.name}.{os.getpid()}.tmp")
+        with open(tmp_values_path, "wb") as f:
+            np.save(f, df_database[list_numeric_columns].to_numpy(dtype=float))
+        os.replace(tmp_values_path, values_path)
+
+    # the metadata is written last: it is what makes the snapshot valid
+    write_snapshot_metadata(dict_metadata, metadata_path)
+
+    # remove the values of the older versions (the processes that still map them keep a valid
+    # mapping until they attach to the new version)
+    for old_values_path in metadata_path.parent.glob(f"{stem}.*.npy"):
+        if old_values_path.name not in [values_path.name, previous_values_file]:
+            try:
+                old_values_path.unlink()
+            except OSError:
+                pass
+
+    return dict_metadata
+
+
+def write_snapshot_metadata(dict_metadata, metadata_path):
+    """Write the metadata of the snapshot atomically (temporary file renamed)"""
+    tmp_metadata_path = metadata_path.with_name(
+        f"{metadata_path.name}.{os.getpid()}.tmp"
+    )
+    with open(tmp_metadata_path, "w") as f:
+        json.dump(dict_metadata, f, ensure_ascii=False)
+    os.replace(tmp_metadata_path, metadata_path)
+
+
+def read_snapshot_metadata(metadata_path):
+    """Read the metadata of the snapshot, an empty dict if there is no valid snapshot"""
+    try:
+        with open(metadata_path, "r") as f:
+            dict_metadata = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if dict_metadata.get("snapshot_version") != snapshot_version:
+        return {}
+    if dict_metadata.get("index_renaming") != dict_link_database_to_customer_data:
+        return {}
+    if not (metadata_path.parent / dict_metadata["values_file"]).exists():
+        return {}
+
+    return dict_metadata
+
+
+def read_snapshot_values(metadata_path, dict_metadata):
+    """Memory-map the numeric values of the snapshot (read-only, shared between processes)"""
+    return np.load(metadata_path.parent / dict_metadata["values_file"], mmap_mode="r")
+
+
+def read_database_snapshot(metadata_path, dict_metadata):
+    """Rebuild the database dataframe from its snapshot"""
+    import pandas as pd
+
+    df = pd.DataFrame(
+        read_snapshot_values(metadata_path, dict_metadata),
+        index=pd.Index(dict_metadata["index"]),
+        columns=dict_metadata["numeric_columns"],
+    )
+    for col, list_values in dict_metadata["text_columns"].items():
+        df[col] = list_values
+
+    return df[dict_metadata["columns"]]
+
+
+def publish_database(data_file_path, snapshot_folder=None):
+    """Make sure the snapshot of the database matches the workbook, and return its metadata
+
+    The snapshot is keyed by the modification time and size of the workbook (cheap to check) and by
+    its sha256 hash (checked only when the modification time changed). The excel file is only read
+    when the workbook content changed, and a new snapshot is then written. A snapshot compiled in
+    advance (see main) is thus used as is after a deployment, without loading pandas or openpyxl,
+    even if the deployment changed the modification time of the workbook.
+
+    Args:
+        data_file_path (Path): path to the excel workbook
+        snapshot_folder (Path, optional): folder of the snapshot. Defaults to a ".cache" folder next
+            to the workbook.
+
+    Returns:
+        dict: the metadata of the snapshot, its "sha256" key is the version of the database
+    """
+    metadata_path = get_metadata_path(data_file_path, snapshot_folder)
+
+    stat = os.stat(data_file_path)
+    dict_workbook_info = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    dict_metadata = read_snapshot_metadata(metadata_path)
+    if dict_metadata:
+        if all(dict_metadata.get(k) == v for k, v in dict_workbook_info.items()):
+            return dict_metadata
+
+        dict_workbook_info["sha256"] = hash_file(data_file_path)
+        if dict_metadata.get("sha256") == dict_workbook_info["sha256"]:
+            # the workbook was touched but its content did not change: only the metadata is updated
+            dict_metadata = {**dict_metadata, **dict_workbook_info}
+            try:
+                write_snapshot_metadata(dict_metadata, metadata_path)
+            except OSError as e:
+                # e.g. read-only deployment: the snapshot is still valid, it is checked again later
+                warnings.warn(f"could not update the metadata of the snapshot ({e})")
+            return dict_metadata
+
+    if "sha256" not in dict_workbook_info:
+        dict_workbook_info["sha256"] = hash_file(data_file_path)
+    df = read_database(data_file_path)
+
+    return write_database_snapshot(df, dict_workbook_info, metadata_path)
+
+
+def load_database(data_file_path, snapshot_folder=None):
+    """Load the database, from its snapshot when the workbook did not change since it was written
+
+    Args:
+        data_file_path (Path): path to the excel workbook
+        snapshot_folder (Path, optional): folder of the snapshot. Defaults to a ".cache" folder next
+            to the workbook.
+
+    Returns:
+        pandas.DataFrame: the database, cleaned and renamed to match the customer data
+    """
+    try:
+        return publish_and_read_snapshot(
+            data_file_path, snapshot_folder, read_database_snapshot
+        )[1]
+    except OSError as e:
+        warnings.warn(f"could not use the snapshot of the database ({e})")
+        return read_database(data_file_path)
+
+
+def publish_and_read_snapshot(data_file_path, snapshot_folder, read_snapshot):
+    """Publish the database (see publish_database) and read its snapshot
+
+    The values of a version are removed when the version after the next one is written: if they
+    are removed between the reading of the metadata and of the values, the metadata is read again.
+
+    Args:
+        data_file_path (Path): path to the excel workbook
+        snapshot_folder (Path): folder of the snapshot, None for the default one
+        read_snapshot (function): reader called with (metadata_path, dict_metadata), e.g.
+            read_database_snapshot
+
+    Returns:
+        tuple: (dict_metadata, result of read_snapshot)
+    """
+    metadata_path = get_metadata_path(data_file_path, snapshot_folder)
+    dict_metadata = publish_database(data_file_path, snapshot_folder)
+    try:
+        return dict_metadata, read_snapshot(metadata_path, dict_metadata)
+    except FileNotFoundError:
+        dict_metadata = publish_database(data_file_path, snapshot_folder)
+        return dict_metadata, read_snapshot(metadata_path, dict_metadata)
+
+
+def attach_factor_matrix(metadata_path, dict_metadata, dict_aliases=None):
+    """Build a factor matrix viewing the memory-mapped values of the snapshot (no copy)
+
+    Args:
+        metadata_path (Path): path of the metadata of the snapshot
+        dict_metadata (dict): metadata of the snapshot
+        dict_aliases (dict, optional): {alias: activity name} added to the index of the activities
+            (see lca_calculations.build_activity_index). Defaults to None.
+    """
+    values = read_snapshot_values(metadata_path, dict_metadata)
+    list_indicators = [col for col in dict_metadata["columns"] if col != "Unit"]
+    list_positions = [
+        dict_metadata["numeric_columns"].index(col) for col in list_indicators
+    ]
+    if list_positions != list(range(values.shape[1])):
+        # only the indicator columns are kept: this selection needs a copy
+        values = np.ascontiguousarray(values[:, list_positions])
+        values.setflags(write=False)
+
+    return lca_calculations.FactorMatrix(
+        values,
+        lca_calculations.build_activity_index(dict_metadata["index"], dict_aliases),
+        list_indicators,
+    )
+
+
+class SharedFactorDatabase:
+    """Factor database shared by all the processes through the memory-mapped snapshot
+
+    The factor matrix is never copied: every process maps the same read-only pages of the values
+    file. Each call to get checks (with a stat of the workbook) whether the workbook changed, and
+    if so publishes the new version and attaches to it. The aliases of the activities (see
+    read_alias_table) are reloaded the same way when their file changes.
+    """
+
+    def __init__(self, data_file_path, snapshot_folder=None, alias_file_path=None):
+        self.data_file_path = data_file_path
+        self.snapshot_folder = snapshot_folder
+        self.alias_file_path = alias_file_path
+        self.metadata_path = get_metadata_path(data_file_path, snapshot_folder)
+        self.dict_metadata = {}
+        self.factor_matrix = None
+        # (mtime_ns, size, sha256) of the alias file the factor matrix was built with
+        self.alias_file_info = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        if self.alias_file_info is None:
+            return self.dict_metadata.get("sha256")
+        return f"{self.dict_metadata.get('sha256')}+{self.alias_file_info[2][:16]}"
+
+    def get(self):
+        """Get the current factor matrix and its version
+
+        Returns:
+            tuple: (lca_calculations.FactorMatrix with a read-only memory-mapped matrix, or an
+                in-memory matrix when the snapshot can not be written, version)
+        """
+        stat = os.stat(self.data_file_path)
+        alias_stat = (
+            os.stat(self.alias_file_path) if self.alias_file_path is not None else None
+        )
+        with self._lock:
+            dict_metadata = self.dict_metadata
+            df_database = None
+            if (
+                self.factor_matrix is None
+                or dict_metadata["mtime_ns"] != stat.st_mtime_ns
+                or dict_metadata["size"] != stat.st_size
+            ):
+                try:
+                    dict_metadata = publish_database(
+                        self.data_file_path, self.snapshot_folder
+                    )
+                except OSError as e:
+                    # e.g. read-only deployment without a snapshot: the factor matrix is built in
+                    # memory (as in load_database), and the snapshot is tried again when the
+                    # workbook changes
+                    warnings.warn(f"could not use the snapshot of the database ({e})")
+                    df_database = read_database(self.data_file_path)
+                    dict_metadata = {
+                        "mtime_ns": stat.st_mtime_ns,
+                        "size": stat.st_size,
+                        "sha256": hash_file(self.data_file_path),
+                        "index": list(df_database.index),
+                    }
+
+            alias_file_info = self.alias_file_info
+            if alias_stat is not None and (
+                alias_file_info is None
+                or alias_file_info[:2] != (alias_stat.st_mtime_ns, alias_stat.st_size)
+            ):
+                alias_file_info = (
+                    alias_stat.st_mtime_ns,
+                    alias_stat.st_size,
+                    hash_file(self.alias_file_path),
+                )
+
+            if df_database is not None:
+                self.factor_matrix = lca_calculations.build_factor_matrix(
+                    df_database
+                )._replace(
+                    activities=lca_calculations.build_activity_index(
+                        dict_metadata["index"], self.read_aliases()
+                    )
+                )
+            elif (
+                self.factor_matrix is None
+                or dict_metadata["sha256"] != self.dict_metadata["sha256"]
+            ):
+                with lca_instrumentation.instrumentation.measure(
+                    "database: attach snapshot"
+                ):
+                    try:
+                        self.factor_matrix = attach_factor_matrix(
+                            self.metadata_path, dict_metadata, self.read_aliases()
+                        )
+                    except FileNotFoundError:
+                        # the values were removed by newer versions (see write_database_snapshot)
+                        dict_metadata = publish_database(
+                            self.data_file_path, self.snapshot_folder
+                        )
+                        self.factor_matrix = attach_factor_matrix(
+                            self.metadata_path, dict_metadata, self.read_aliases()
+                        )
+            elif alias_file_info != self.alias_file_info:
+                # only the aliases changed: the values stay mapped
+                self.factor_matrix = self.factor_matrix._replace(
+                    activities=lca_calculations.build_activity_index(
+                        dict_metadata["index"], self.read_aliases()
+                    )
+                )
+            self.dict_metadata = dict_metadata
+            self.alias_file_info = alias_file_info
+
+            return self.factor_matrix, self.version
+
+    def read_aliases(self):
+        if self.alias_file_path is None:
+            return None
+        return read_alias_table(self.alias_file_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compile the snapshot of the database, so that the dashboard and the service \
+            start without reading the excel workbook (e.g. when building a deployment image)"
+    )
+    parser.add_argument(
+        "data_file_path",
+        nargs="?",
+        default="data/Holis - Technical test.xlsx",
+        help="excel workbook with the Database sheet (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--snapshot-folder",
+        help="folder of the snapshot (default: a .cache folder next to the workbook)",
+    )
+    args = parser.parse_args(argv)
+
+    dict_metadata = publish_database(args.data_file_path, args.snapshot_folder)
+    print(
+        f"Snapshot of the database (version {dict_metadata['sha256'][:16]}) written to "
+        f"{get_metadata_path(args.data_file_path, args.snapshot_folder)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import collections
+import threading
+
+import lca_calculations
+import lca_instrumentation
+
+
+# the functions below extract (as a hashable key) the fields of the customer data read by each phase
+def get_material_inputs(dict_data_customers):
+    bill_of_materials = lca_calculations.get_bill_of_materials(dict_data_customers)
+    return (
+        tuple(bill_of_materials.names),
+        bill_of_materials.name_ids.tobytes(),
+        bill_of_materials.useful_masses.tobytes(),
+    )
+
+
+def get_processing_inputs(dict_data_customers):
+    return (
+        dict_data_customers["Processing"]["Lieu d'assemblage"],
+        dict_data_customers["Processing"]["Consommation d'energie (kWh)"],
+    )
+
+
+def get_use_phase_inputs(dict_data_customers):
+    return (
+        dict_data_customers["Usage"]["Duree de vie (annees)"],
+        dict_data_customers["Usage"]["Nombre de cycles par an"],
+        dict_data_customers["Usage"]["Puisance (W)"],
+        dict_data_customers["Usage"]["Duree de cycle (min)"],
+        dict_data_customers["Usage"]["Lieu d'utilisation"],
+    )
+
+
+def get_transportation_inputs(dict_data_customers):
+    bill_of_materials = lca_calculations.get_bill_of_materials(dict_data_customers)
+    return (
+        tuple(bill_of_materials.countries),
+        bill_of_materials.country_ids.tobytes(),
+        bill_of_materials.useful_masses.tobytes(),
+        bill_of_materials.finished_masses.sum(),
+        dict_data_customers["Processing"]["Lieu d'assemblage"],
+        dict_data_customers["Usage"]["Lieu d'utilisation"],
+        tuple(sorted(dict_data_customers["Moyen de transport"].items())),
+    )
+
+
+dict_phase_input_getters = {
+    "Material": get_material_inputs,
+    "Processing": get_processing_inputs,
+    "Use phase": get_use_phase_inputs,
+    "Transportation": get_transportation_inputs,
+}
+
+
+class IncrementalImpactCalculator:
+    """Compute the impact of each phase, memoized on the fields of the customer data it reads
+
+    When a single field changes (e.g. the power in the dashboard), only the phases reading it are
+    recomputed, the other ones are served from their cache. The calculator is thread-safe, so it
+    can be shared between the sessions of the dashboard.
+    """
+
+    def __init__(self, df_database, max_entries_per_phase=1024):
+        """
+        Args:
+            df_database (pandas.DataFrame or lca_calculations.FactorMatrix): dataframe with the
+                impact of the materials, or the factor matrix built from it
+            max_entries_per_phase (int, optional): size of the cache of each phase, the least
+                recently used results are evicted first. Defaults to 1024.
+        """
+        self.factor_matrix = lca_calculations.build_factor_matrix(df_database)
+        self.max_entries_per_phase = max_entries_per_phase
+        self.dict_caches = {
+            phase: collections.OrderedDict() for phase in lca_calculations.list_phases
+        }
+        # number of times each phase was actually computed (i.e. cache misses)
+        self.dict_n_computations = {phase: 0 for phase in lca_calculations.list_phases}
+        self._lock = threading.Lock()
+
+    def compute_phase_impact(self, dict_data_customers, phase):
+        """Compute the impact of a single phase
+
+        Returns:
+            numpy.ndarray: read-only impacts of the phase, one value per indicator
+        """
+        key = dict_phase_input_getters[phase](dict_data_customers)
+        cache = self.dict_caches[phase]
+
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                lca_instrumentation.instrumentation.record_cache_call(f"phase: {phase}")
+                return cache[key]
+
+        lca_instrumentation.instrumentation.record_cache_call(
+            f"phase: {phase}", hit=False
+        )
+        with lca_instrumentation.instrumentation.measure(f"compute phase: {phase}"):
+            impacts = (
+                lca_calculations.dict_activity_vector_builders[phase](
+                    dict_data_customers, self.factor_matrix
+                )
+                @ self.factor_matrix.matrix
+            )
+        impacts.setflags(write=False)
+
+        with self._lock:
+            self.dict_n_computations[phase] += 1
+            cache[key] = impacts
+            if len(cache) > self.max_entries_per_phase:
+                cache.popitem(last=False)
+
+        return impacts
+
+    def compute_phase_impacts(self, dict_data_customers):
+        """Same as lca_calculations.compute_phase_impacts, reusing the phases whose inputs did not change
+
+        Returns:
+            pandas.DataFrame: impacts with one row per phase and one column per indicator
+        """
+        import pandas as pd
+
+        return pd.DataFrame(
+            [
+                self.compute_phase_impact(dict_data_customers, phase)
+                for phase in lca_calculations.list_phases
+            ],
+            index=lca_calculations.list_phases,
+            columns=self.factor_matrix.indicators,
+        )
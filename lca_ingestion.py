@@ -0,0 +1,194 @@
+"""Streaming readers of customer data exported as tables (csv or xlsx), one row per material
+
+Each row holds one material of a product, with the columns of the product repeated on every row:
+    - "Produit": identifier of the product (required on every row), the rows of a product must be
+      consecutive (a ValueError is raised otherwise)
+    - the use phase: "Duree de vie (annees)", "Nombre de cycles par an", "Duree de cycle (min)",
+      "Puisance (W)", "Lieu d'utilisation"
+    - the processing: "Lieu d'assemblage", "Pertes (%)", "Consommation d'energie (kWh)"
+    - "Moyen de transport": main transportation mean, used for all the trips between countries (as
+      in the dashboard), or a json dict like '{"France - Chine": "boat"}' (identical on all the
+      rows of a product)
+    - the material: "Nom", "Masse produit fini (kg)", "Lieu de production" and optionally
+      "Masse utile (kg)" (by default, the finished mass increased by the processing losses)
+
+The rows are read in bounded chunks and the products are yielded one at a time, in the format of
+data/dict_data_customers.json, so the memory does not depend on the size of the file.
+"""
+
+import json
+import math
+
+import openpyxl
+import pandas as pd
+
+import lca_calculations
+
+# columns of the product, and the section of the customer data they belong to
+dict_product_columns = {
+    "Usage": [
+        "Duree de vie (annees)",
+        "Nombre de cycles par an",
+        "Duree de cycle (min)",
+        "Puisance (W)",
+        "Lieu d'utilisation",
+    ],
+    "Processing": ["Lieu d'assemblage", "Pertes (%)", "Consommation d'energie (kWh)"],
+}
+product_id_column = "Produit"
+transportation_column = "Moyen de transport"
+list_material_columns = ["Nom", "Masse produit fini (kg)", "Lieu de production"]
+
+
+def is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def build_transportation_means(value):
+    """Build the 'Moyen de transport' dict from the value of the column (main mean or json dict)"""
+    if value.strip().startswith("{"):
+        return json.loads(value)
+
+    # the same transportation mean for all the trips between the countries of the distance table
+    list_countries = list(lca_calculations.dict_country_codes.keys())
+    return {
+        f"{country_a} - {country_b}": value
+        for i, country_a in enumerate(list_countries)
+        for country_b in list_countries[i + 1 :]
+    }
+
+
+def build_product(list_rows, product_id=None, first_row_number=1):
+    """Build the customer data of a product from its rows (dicts {column: value})
+
+    Args:
+        list_rows (list): dicts {column: value}, one per material of the product
+        product_id (str, optional): identifier of the product, for the error messages
+        first_row_number (int, optional): number of the first row of the product in the table (the
+            header excluded), for the error messages. Defaults to 1.
+
+    Raises:
+        ValueError: if the transportation mean of a row is empty, or differs from the one of the
+            first row of the product
+
+    Returns:
+        dict: the data of the product, in the format of data/dict_data_customers.json
+    """
+    first_row = list_rows[0]
+    transportation_means = first_row[transportation_column]
+    for row_number, row in enumerate(list_rows, start=first_row_number):
+        value = row[transportation_column]
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(
+                f'Invalid "{transportation_column}" {value!r} for the product {product_id} '
+                f"(row {row_number})"
+            )
+        if value.strip() != transportation_means.strip():
+            raise ValueError(
+                f'The "{transportation_column}" {value!r} of the product {product_id} (row '
+                f"{row_number}) differs from its first row ({transportation_means!r})"
+            )
+
+    dict_data_customers = {
+        section: {column: first_row[column] for column in list_columns}
+        for section, list_columns in dict_product_columns.items()
+    }
+    losses = dict_data_customers["Processing"]["Pertes (%)"] / 100
+
+    dict_data_customers["Materiaux"] = []
+    for row in list_rows:
+        material = {column: row[column] for column in list_material_columns}
+        useful_mass = row.get("Masse utile (kg)")
+        if is_missing(useful_mass):
+            useful_mass = material["Masse produit fini (kg)"] / (1 - losses)
+        material["Masse utile (kg)"] = useful_mass
+        dict_data_customers["Materiaux"].append(material)
+
+    dict_data_customers[transportation_column] = build_transportation_means(
+        transportation_means
+    )
+
+    return dict_data_customers
+
+
+def group_rows_into_products(rows):
+    """Group the consecutive rows of each product
+
+    Args:
+        rows (iterable): dicts {column: value}, one per material
+
+    Raises:
+        ValueError: if the identifier of the product of a row is missing, if the rows of a product
+            are not consecutive (the products are built as soon as their rows end, so they can not
+            be grouped afterwards), or if a product is invalid (see build_product)
+
+    Yields:
+        tuple: (product_id, dict_data_customers)
+    """
+    set_product_ids = set()
+    product_id = None
+    first_row_number = 1
+    list_rows = []
+    for row_number, row in enumerate(rows, start=1):
+        if is_missing(row[product_id_column]):
+            raise ValueError(f'Missing "{product_id_column}" (row {row_number})')
+        if row[product_id_column] != product_id and list_rows:
+            yield str(product_id), build_product(
+                list_rows, product_id, first_row_number
+            )
+            list_rows = []
+        if not list_rows:
+            product_id = row[product_id_column]
+            if product_id in set_product_ids:
+                raise ValueError(
+                    f"The rows of the product {product_id} are not consecutive (row "
+                    f"{row_number})"
+                )
+            set_product_ids.add(product_id)
+            first_row_number = row_number
+        list_rows.append(row)
+
+    if list_rows:
+        yield str(product_id), build_product(list_rows, product_id, first_row_number)
+
+
+def read_csv_rows(input_path, chunk_size=10000):
+    """Read the rows of a csv file, chunk_size rows at a time"""
+    with pd.read_csv(
+        input_path, chunksize=chunk_size, dtype={product_id_column: str}
+    ) as reader:
+        for df_chunk in reader:
+            yield from df_chunk.to_dict("records")
+
+
+def read_xlsx_rows(input_path, sheet_name=None):
+    """Read the rows of a sheet of an xlsx file (the first sheet by default), one at a time
+
+    The workbook is opened in read-only mode: the rows are parsed while they are iterated, instead
+    of loading the whole sheet.
+    """
+    workbook = openpyxl.load_workbook(input_path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        iterator_rows = worksheet.iter_rows(values_only=True)
+        list_columns = [str(i).strip() for i in next(iterator_rows)]
+        for values in iterator_rows:
+            if all(is_missing(value) for value in values):
+                continue
+            yield dict(zip(list_columns, values))
+    finally:
+        workbook.close()
+
+
+def read_table_records(input_path, chunk_size=10000, sheet_name=None):
+    """Read the products of a csv or xlsx file, one at a time
+
+    Yields:
+        tuple: (product_id, dict_data_customers)
+    """
+    if str(input_path).endswith(".xlsx"):
+        rows = read_xlsx_rows(input_path, sheet_name)
+    else:
+        rows = read_csv_rows(input_path, chunk_size)
+
+    yield from group_rows_into_products(rows)
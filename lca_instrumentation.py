@@ -0,0 +1,229 @@
+"""Timers and counters of the calculation pipeline, exported as JSON lines or Prometheus text
+
+The measures are kept by a process-wide Instrumentation object (lca_instrumentation.instrumentation)
+shared by all the sessions of the dashboard, so that production sessions can be profiled without
+attaching a profiler:
+    with lca_instrumentation.instrumentation.measure("stage name"):
+        ...
+    lca_instrumentation.instrumentation.record_cache_call("cache name", hit=False)
+"""
+
+import contextlib
+import json
+import threading
+import time
+
+# Prometheus metrics: {name: (type, group of the snapshot, key of the measure)}
+dict_prometheus_metrics = {
+    "stage_calls_total": ("counter", "stages", "calls"),
+    "stage_seconds_total": ("counter", "stages", "total_seconds"),
+    "stage_seconds_max": ("gauge", "stages", "max_seconds"),
+    "stage_seconds_last": ("gauge", "stages", "last_seconds"),
+    "cache_calls_total": ("counter", "caches", "calls"),
+    "cache_hits_total": ("counter", "caches", "hits"),
+    "cache_misses_total": ("counter", "caches", "misses"),
+}
+
+
+def add_time(dict_stages, stage, seconds):
+    dict_stage = dict_stages.setdefault(
+        stage,
+        {
+            "calls": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+            "last_seconds": 0.0,
+        },
+    )
+    dict_stage["calls"] += 1
+    dict_stage["total_seconds"] += seconds
+    dict_stage["max_seconds"] = max(dict_stage["max_seconds"], seconds)
+    dict_stage["last_seconds"] = seconds
+
+
+def add_cache_calls(dict_caches, cache, calls, misses):
+    dict_cache = dict_caches.setdefault(cache, {"calls": 0, "misses": 0})
+    dict_cache["calls"] += calls
+    dict_cache["misses"] += misses
+
+
+def build_snapshot(start_time, dict_stages, dict_caches):
+    return {
+        "timestamp": time.time(),
+        "start_time": start_time,
+        "stages": {k: dict(v) for k, v in dict_stages.items()},
+        "caches": {
+            k: {**v, "hits": v["calls"] - v["misses"]} for k, v in dict_caches.items()
+        },
+    }
+
+
+class Instrumentation:
+    """Thread-safe registry of the time spent in each stage, and of the calls of each cache"""
+
+    def __init__(self):
+        self.start_time = time.time()
+        # {stage: {"calls": ..., "total_seconds": ..., "max_seconds": ..., "last_seconds": ...}}
+        self.dict_stages = {}
+        # {cache: {"calls": ..., "misses": ...}}
+        self.dict_caches = {}
+        # measures recorded since the last write_json_lines (same format), and its time
+        self.dict_unwritten_stages = {}
+        self.dict_unwritten_caches = {}
+        self.last_write_time = self.start_time
+        self._lock = threading.Lock()
+
+    def record_time(self, stage, seconds):
+        with self._lock:
+            add_time(self.dict_stages, stage, seconds)
+            add_time(self.dict_unwritten_stages, stage, seconds)
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        """Context manager measuring the time spent in a stage (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_time(stage, time.perf_counter() - start)
+
+    def record_cache_call(self, cache, hit=True):
+        with self._lock:
+            add_cache_calls(self.dict_caches, cache, 1, not hit)
+            add_cache_calls(self.dict_unwritten_caches, cache, 1, not hit)
+
+    def record_cache_miss(self, cache):
+        """Record a miss of a call already recorded as a hit
+
+        For st.cache_data and st.cache_resource, the body of the cached function only runs on a
+        miss: record_cache_call is called around the call, and record_cache_miss in the body.
+        """
+        with self._lock:
+            add_cache_calls(self.dict_caches, cache, 0, 1)
+            add_cache_calls(self.dict_unwritten_caches, cache, 0, 1)
+
+    def reset(self):
+        with self._lock:
+            self.start_time = time.time()
+            self.dict_stages = {}
+            self.dict_caches = {}
+            self.dict_unwritten_stages = {}
+            self.dict_unwritten_caches = {}
+            self.last_write_time = self.start_time
+
+    def snapshot(self):
+        """Copy of the measures
+
+        Returns:
+            dict: with the keys "timestamp", "start_time", "stages" and "caches" (with their hits)
+        """
+        with self._lock:
+            return build_snapshot(self.start_time, self.dict_stages, self.dict_caches)
+
+    def to_dataframes(self):
+        """Measures as dataframes, for the debug panel of the dashboard
+
+        Returns:
+            tuple: (df_stages sorted by decreasing total time, df_caches)
+        """
+        import pandas as pd
+
+        dict_snapshot = self.snapshot()
+        df_stages = pd.DataFrame.from_dict(
+            dict_snapshot["stages"],
+            orient="index",
+            columns=["calls", "total_seconds", "max_seconds", "last_seconds"],
+        )
+        df_stages["mean_seconds"] = df_stages["total_seconds"] / df_stages["calls"]
+        df_caches = pd.DataFrame.from_dict(
+            dict_snapshot["caches"], orient="index", columns=["calls", "hits", "misses"]
+        )
+        df_caches["hit_rate"] = df_caches["hits"] / df_caches["calls"]
+
+        return df_stages.sort_values("total_seconds", ascending=False), df_caches
+
+    def to_json_lines(self, dict_snapshot=None):
+        """Measures as JSON lines, one line per stage and per cache
+
+        Each line holds the measures from its "start_time" to its "timestamp".
+
+        Args:
+            dict_snapshot (dict, optional): measures in the format of snapshot. Defaults to None
+                (all the measures).
+        """
+        if dict_snapshot is None:
+            dict_snapshot = self.snapshot()
+        list_lines = [
+            json.dumps(
+                {
+                    "timestamp": dict_snapshot["timestamp"],
+                    "start_time": dict_snapshot["start_time"],
+                    "type": "stage",
+                    "name": stage,
+                    **dict_stage,
+                },
+                ensure_ascii=False,
+            )
+            for stage, dict_stage in dict_snapshot["stages"].items()
+        ] + [
+            json.dumps(
+                {
+                    "timestamp": dict_snapshot["timestamp"],
+                    "start_time": dict_snapshot["start_time"],
+                    "type": "cache",
+                    "name": cache,
+                    **dict_cache,
+                },
+                ensure_ascii=False,
+            )
+            for cache, dict_cache in dict_snapshot["caches"].items()
+        ]
+
+        return "".join(f"{line}\n" for line in list_lines)
+
+    def to_prometheus(self, prefix="lca"):
+        """Measures in the Prometheus text exposition format"""
+        dict_snapshot = self.snapshot()
+
+        list_lines = []
+        for name, (metric_type, group, key) in dict_prometheus_metrics.items():
+            label = group[:-1]
+            list_lines.append(f"# HELP {prefix}_{name} {key} of each {label}")
+            list_lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+            for label_value, dict_values in dict_snapshot[group].items():
+                list_lines.append(
+                    f'{prefix}_{name}{{{label}="{escape_label_value(label_value)}"}} '
+                    f"{dict_values[key]}"
+                )
+
+        return "".join(f"{line}\n" for line in list_lines)
+
+    def write_json_lines(self, output_path):
+        """Append the measures recorded since the last call to a JSON lines file
+
+        The "start_time" of the lines is the time of the previous lines, so the file can be written
+        after each rerun without repeating the previous measures: the totals are the sums of the
+        lines. Nothing is written when nothing was recorded.
+        """
+        with self._lock:
+            if not self.dict_unwritten_stages and not self.dict_unwritten_caches:
+                return
+            dict_snapshot = build_snapshot(
+                self.last_write_time,
+                self.dict_unwritten_stages,
+                self.dict_unwritten_caches,
+            )
+            self.dict_unwritten_stages = {}
+            self.dict_unwritten_caches = {}
+            self.last_write_time = dict_snapshot["timestamp"]
+
+        with open(output_path, "a") as f:
+            f.write(self.to_json_lines(dict_snapshot))
+
+
+def escape_label_value(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# instrumentation shared by the whole process
+instrumentation = Instrumentation()
@@ -0,0 +1,446 @@
+import numpy as np
+import pandas as pd
+
+import lca_calculations
+import lca_contributions
+import lca_sweep
+
+# parameters of the sweep that are not decisions: they keep the value of the customer data
+list_fixed_parameters = ["Duree de vie (annees)", "Puisance (W)"]
+
+
+def build_default_search_space(dict_data_customers):
+    """Build the search space offered by the sidebar of the dashboard (main.py)"""
+    return {
+        name: values
+        for name, values in lca_sweep.build_default_sweep_space(
+            dict_data_customers
+        ).items()
+        if name not in list_fixed_parameters
+    }
+
+
+def build_search_tables(dict_data_customers, factor_matrix, dict_search_space):
+    """Precompute the additive contributions of the decisions to the impacts
+
+    The impact of a configuration is the sum of a constant, a table per decision (processing: assembly
+    location, use phase: location of use), a table for the transportation of the end product
+    (assembly location, location of use, transportation mean) and a table per production location
+    parameter (production location, assembly location, transportation mean).
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        factor_matrix (lca_calculations.FactorMatrix): factor matrix of the database
+        dict_search_space (dict): {parameter_name: list of values} for the optimized parameters,
+            the other parameters keep their value from dict_data_customers
+
+    Returns:
+        tuple: with:
+            - dict_values (dict): {parameter_name: list of values}, for every parameter
+            - list_production_parameters (list): name of the production location parameters
+            - dict_tables (dict): with the keys "Constant" (n_indicators), "Processing"
+              (n_assembly, n_indicators), "Use phase" (n_use, n_indicators), "Transportation end
+              product" (n_assembly, n_use, n_means, n_indicators) and "Production" (list of
+              (n_production, n_assembly, n_means, n_indicators), one per production parameter)
+    """
+    dict_current_values = lca_sweep.get_sweep_parameters(dict_data_customers)
+    for name in dict_search_space.keys():
+        if name not in dict_current_values or name in list_fixed_parameters:
+            raise KeyError(f"Parameter {name} can not be optimized")
+    dict_values = {
+        name: list(dict_search_space.get(name, [value]))
+        for name, value in dict_current_values.items()
+    }
+
+    dict_sweep_tables = lca_sweep.build_sweep_tables(
+        dict_data_customers, factor_matrix, dict_values
+    )
+
+    # the materials with the same name share their production location parameter
+    dict_production_tables = {}
+    for material_name, table in zip(
+        lca_calculations.get_material_names(
+            lca_calculations.get_bill_of_materials(dict_data_customers)
+        ),
+        dict_sweep_tables["Transportation materials"],
+    ):
+        name = lca_sweep.get_production_parameter_name(material_name)
+        dict_production_tables[name] = dict_production_tables.get(name, 0) + table
+
+    dict_tables = {
+        "Constant": dict_sweep_tables["Material"],
+        "Processing": dict_sweep_tables["Processing"],
+        "Use phase": dict_sweep_tables["Use phase"]
+        * dict_values["Duree de vie (annees)"][0]
+        * dict_values["Puisance (W)"][0],
+        "Transportation end product": dict_sweep_tables["Transportation end product"],
+        "Production": list(dict_production_tables.values()),
+    }
+
+    return dict_values, list(dict_production_tables.keys()), dict_tables
+
+
+def evaluate_configurations(dict_tables, i_assembly, i_use, i_mean, production_choices):
+    """Compute the impacts of many configurations at once
+
+    Args:
+        dict_tables (dict): contribution tables (see build_search_tables)
+        i_assembly, i_use, i_mean (numpy.ndarray): index of the value of each decision, per
+            configuration
+        production_choices (numpy.ndarray): index of the production location of each production
+            parameter, of shape (n_configurations, n_production_parameters)
+
+    Returns:
+        numpy.ndarray: impacts of shape (n_configurations, n_indicators)
+    """
+    impacts = (
+        dict_tables["Constant"]
+        + dict_tables["Processing"][i_assembly]
+        + dict_tables["Use phase"][i_use]
+        + dict_tables["Transportation end product"][i_assembly, i_use, i_mean]
+    )
+    for k, table in enumerate(dict_tables["Production"]):
+        impacts += table[production_choices[:, k], i_assembly, i_mean]
+
+    return impacts
+
+
+def build_configuration_dataframe(
+    dict_values,
+    list_production_parameters,
+    list_indicators,
+    i_assembly,
+    i_use,
+    i_mean,
+    production_choices,
+    impacts,
+    sort_column=lca_contributions.total_micropoints_column,
+):
+    """Build one row per configuration, sorted by increasing sort_column
+
+    Returns:
+        pandas.DataFrame: with one column per optimized parameter, one column per indicator and the
+            column "Total (micropoints)"
+    """
+    dict_columns = {
+        "Lieu d'utilisation": np.asarray(dict_values["Lieu d'utilisation"])[i_use],
+        "Lieu d'assemblage": np.asarray(dict_values["Lieu d'assemblage"])[i_assembly],
+        "Moyen de transport": np.asarray(dict_values["Moyen de transport"])[i_mean],
+    }
+    for k, name in enumerate(list_production_parameters):
+        dict_columns[name] = np.asarray(dict_values[name])[production_choices[:, k]]
+    df_configurations = pd.DataFrame(dict_columns)
+    df_configurations[list_indicators] = impacts
+    df_configurations[lca_contributions.total_micropoints_column] = (
+        impacts @ lca_calculations.get_micropoint_weights(list_indicators)
+    )
+
+    return df_configurations.sort_values(sort_column, kind="stable", ignore_index=True)
+
+
+def optimize_configuration(
+    dict_data_customers,
+    df_database,
+    dict_search_space=None,
+    objective=lca_contributions.total_micropoints_column,
+    n_best=1,
+):
+    """Find the configurations with the lowest impact
+
+    The production location of each material only changes the transportation of this material, so
+    for each (assembly location, transportation mean) the best production location of each material
+    is found independently. Only the (assembly location, location of use, transportation mean)
+    grid is then enumerated, with array operations: the result is exact, without enumerating the
+    product of the production locations.
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        df_database (pandas.DataFrame): dataframe with the impact of the materials
+        dict_search_space (dict, optional): {parameter_name: list of values} for the optimized
+            parameters, the other parameters keep their value from dict_data_customers. Defaults to
+            the space offered by the dashboard (see build_default_search_space).
+        objective (str, optional): indicator to minimize. Defaults to the total in micropoints.
+        n_best (int, optional): number of configurations returned, taken among the best
+            configuration of each (assembly location, location of use, transportation mean).
+            Defaults to 1.
+
+    Returns:
+        pandas.DataFrame: the n_best configurations, sorted by increasing objective (see
+            build_configuration_dataframe)
+    """
+    if dict_search_space is None:
+        dict_search_space = build_default_search_space(dict_data_customers)
+
+    factor_matrix = lca_calculations.build_factor_matrix(df_database)
+    dict_values, list_production_parameters, dict_tables = build_search_tables(
+        dict_data_customers, factor_matrix, dict_search_space
+    )
+    if objective == lca_contributions.total_micropoints_column:
+        weights = lca_calculations.get_micropoint_weights(factor_matrix.indicators)
+    else:
+        weights = np.zeros(len(factor_matrix.indicators))
+        weights[factor_matrix.indicators.index(objective)] = 1
+
+    # best production location of each parameter, per (assembly location, transportation mean)
+    best_productions = np.zeros(
+        (
+            len(dict_values["Lieu d'assemblage"]),
+            len(dict_values["Moyen de transport"]),
+            len(list_production_parameters),
+        ),
+        dtype=int,
+    )
+    best_production_score = np.zeros(best_productions.shape[:2])
+    for k, table in enumerate(dict_tables["Production"]):
+        production_scores = table @ weights
+        best_productions[..., k] = production_scores.argmin(axis=0)
+        best_production_score += production_scores.min(axis=0)
+
+    # score of every (assembly location, location of use, transportation mean)
+    scores = (
+        dict_tables["Constant"] @ weights
+        + (dict_tables["Processing"] @ weights)[:, None, None]
+        + (dict_tables["Use phase"] @ weights)[None, :, None]
+        + dict_tables["Transportation end product"] @ weights
+        + best_production_score[:, None, :]
+    )
+    list_best = np.argsort(scores.ravel(), kind="stable")[:n_best]
+    i_assembly, i_use, i_mean = np.unravel_index(list_best, scores.shape)
+    production_choices = best_productions[i_assembly, i_mean]
+
+    return build_configuration_dataframe(
+        dict_values,
+        list_production_parameters,
+        factor_matrix.indicators,
+        i_assembly,
+        i_use,
+        i_mean,
+        production_choices,
+        evaluate_configurations(
+            dict_tables, i_assembly, i_use, i_mean, production_choices
+        ),
+        objective,
+    )
+
+
+def is_dominated(points, front, chunk_size=1024):
+    """Check which points are dominated by a point of the front (all the objectives are minimized)
+
+    Args:
+        points (numpy.ndarray): points of shape (n_points, n_objectives)
+        front (numpy.ndarray): points of shape (n_front, n_objectives)
+        chunk_size (int, optional): number of points compared at once, to bound the memory.
+            Defaults to 1024.
+
+    Returns:
+        numpy.ndarray: boolean array of shape (n_points,)
+    """
+    dominated = np.zeros(len(points), dtype=bool)
+    if len(front) == 0:
+        return dominated
+
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start : start + chunk_size, None, :]
+        dominated[start : start + chunk_size] = (
+            (front <= chunk).all(axis=-1) & (front < chunk).any(axis=-1)
+        ).any(axis=-1)
+
+    return dominated
+
+
+def find_pareto_front(points, chunk_size=1024):
+    """Find the non-dominated points (all the objectives are minimized)
+
+    A point can only be dominated by a point with a lower sum of the objectives, so the points are
+    processed by increasing sum, in chunks compared to the front found so far.
+
+    Args:
+        points (numpy.ndarray): points of shape (n_points, n_objectives)
+        chunk_size (int, optional): number of points processed at once. Defaults to 1024.
+
+    Returns:
+        numpy.ndarray: index of the points of the front (a single index per duplicated point)
+    """
+    _, unique_indices = np.unique(points, axis=0, return_index=True)
+    sorted_indices = unique_indices[
+        np.argsort(points[unique_indices].sum(axis=1), kind="stable")
+    ]
+
+    list_front_indices = [np.zeros(0, dtype=int)]
+    front = points[:0]
+    for start in range(0, len(sorted_indices), chunk_size):
+        chunk_indices = sorted_indices[start : start + chunk_size]
+        chunk_indices = chunk_indices[~is_dominated(points[chunk_indices], front)]
+        chunk_indices = chunk_indices[
+            ~is_dominated(points[chunk_indices], points[chunk_indices])
+        ]
+        list_front_indices.append(chunk_indices)
+        front = np.concatenate([front, points[chunk_indices]])
+
+    return np.concatenate(list_front_indices)
+
+
+def thin_front(points, max_size):
+    """Keep at most max_size points of a front, spread along it
+
+    The best point of each objective is always kept, the others are taken evenly in the order of
+    the sum of the objectives.
+
+    Returns:
+        numpy.ndarray: index of the points kept
+    """
+    if len(points) <= max_size:
+        return np.arange(len(points))
+
+    best_indices = np.unique(points.argmin(axis=0))
+    sorted_indices = np.argsort(points.sum(axis=1), kind="stable")
+    spread_indices = sorted_indices[
+        np.linspace(0, len(points) - 1, max_size - len(best_indices)).astype(int)
+    ]
+
+    return np.union1d(best_indices, spread_indices)
+
+
+def compute_pareto_front(
+    dict_data_customers,
+    df_database,
+    dict_search_space=None,
+    list_objectives=None,
+    max_front_size=1000,
+):
+    """Find the configurations that are not dominated on the given indicators
+
+    For each (assembly location, transportation mean), the front of the transportation of the
+    materials is the non-dominated part of the sum of the fronts of each production location
+    parameter, built one parameter at a time. Each location of use then shifts this front by a
+    constant. The (assembly location, transportation mean) are processed from the most promising
+    one, and the partial sums that can not reach the front found so far (even with the lowest
+    possible contribution of the remaining parameters) are pruned.
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        df_database (pandas.DataFrame): dataframe with the impact of the materials
+        dict_search_space (dict, optional): {parameter_name: list of values} for the optimized
+            parameters, the other parameters keep their value from dict_data_customers. Defaults to
+            the space offered by the dashboard (see build_default_search_space).
+        list_objectives (list, optional): indicators to minimize. Defaults to all the indicators.
+        max_front_size (int, optional): maximum number of points kept in the intermediate fronts,
+            the front is exact when it is never reached (see thin_front). None for no limit.
+            Defaults to 1000.
+
+    Returns:
+        pandas.DataFrame: the configurations of the front (see build_configuration_dataframe)
+    """
+    if dict_search_space is None:
+        dict_search_space = build_default_search_space(dict_data_customers)
+
+    factor_matrix = lca_calculations.build_factor_matrix(df_database)
+    if list_objectives is None:
+        list_objectives = factor_matrix.indicators
+    objectives = [factor_matrix.indicators.index(i) for i in list_objectives]
+    dict_values, list_production_parameters, dict_tables = build_search_tables(
+        dict_data_customers, factor_matrix, dict_search_space
+    )
+    n_assembly = len(dict_values["Lieu d'assemblage"])
+    n_means = len(dict_values["Moyen de transport"])
+    n_production_parameters = len(list_production_parameters)
+
+    # constant part of the impacts of each (assembly location, location of use, transportation mean)
+    shifts = (
+        dict_tables["Constant"]
+        + dict_tables["Processing"][:, None, None]
+        + dict_tables["Use phase"][None, :, None]
+        + dict_tables["Transportation end product"]
+    )[..., objectives]
+    production_tables = [table[..., objectives] for table in dict_tables["Production"]]
+    # lowest contribution of the production parameters from each one to the last
+    ideal_remaining = np.zeros(
+        (n_production_parameters + 1, n_assembly, n_means, len(objectives))
+    )
+    for k in reversed(range(n_production_parameters)):
+        ideal_remaining[k] = ideal_remaining[k + 1] + production_tables[k].min(axis=0)
+    # lowest possible impacts of each (assembly location, location of use, transportation mean)
+    ideal_points = shifts + ideal_remaining[0][:, None]
+
+    front = np.zeros((0, len(objectives)))
+    list_front_configurations = np.zeros((0, 3 + n_production_parameters), dtype=int)
+    order = np.argsort(ideal_points.min(axis=1).sum(axis=-1).ravel(), kind="stable")
+    for i_assembly, i_mean in zip(*np.unravel_index(order, (n_assembly, n_means))):
+        list_use = np.flatnonzero(
+            ~is_dominated(ideal_points[i_assembly, :, i_mean], front)
+        )
+        if len(list_use) == 0:
+            continue
+        shift_min = shifts[i_assembly, list_use, i_mean].min(axis=0)
+
+        # front of the transportation of the materials, one production parameter at a time
+        points = np.zeros((1, len(objectives)))
+        choices = np.zeros((1, 0), dtype=int)
+        for k, table in enumerate(production_tables):
+            options = table[:, i_assembly, i_mean]
+            options_indices = find_pareto_front(options)
+            points = (points[:, None] + options[options_indices]).reshape(
+                -1, len(objectives)
+            )
+            choices = np.concatenate(
+                [
+                    np.repeat(choices, len(options_indices), axis=0),
+                    np.tile(options_indices, len(choices))[:, None],
+                ],
+                axis=1,
+            )
+            kept = find_pareto_front(points)
+            kept = kept[
+                ~is_dominated(
+                    points[kept]
+                    + ideal_remaining[k + 1, i_assembly, i_mean]
+                    + shift_min,
+                    front,
+                )
+            ]
+            if max_front_size is not None:
+                kept = kept[thin_front(points[kept], max_front_size)]
+            points, choices = points[kept], choices[kept]
+            if len(points) == 0:
+                break
+
+        if len(points) == 0:
+            continue
+
+        # shift the front by each location of use, and merge it with the front found so far
+        candidates = (
+            points[None] + shifts[i_assembly, list_use, i_mean][:, None]
+        ).reshape(-1, len(objectives))
+        candidate_configurations = np.concatenate(
+            [
+                np.full((len(candidates), 1), i_assembly),
+                np.repeat(list_use, len(points))[:, None],
+                np.full((len(candidates), 1), i_mean),
+                np.tile(choices, (len(list_use), 1)),
+            ],
+            axis=1,
+        )
+        front = np.concatenate([front, candidates])
+        list_front_configurations = np.concatenate(
+            [list_front_configurations, candidate_configurations]
+        )
+        kept = find_pareto_front(front)
+        if max_front_size is not None:
+            kept = kept[thin_front(front[kept], max_front_size)]
+        front, list_front_configurations = front[kept], list_front_configurations[kept]
+
+    i_assembly, i_use, i_mean = list_front_configurations[:, :3].T
+    production_choices = list_front_configurations[:, 3:]
+
+    return build_configuration_dataframe(
+        dict_values,
+        list_production_parameters,
+        factor_matrix.indicators,
+        i_assembly,
+        i_use,
+        i_mean,
+        production_choices,
+        evaluate_configurations(
+            dict_tables, i_assembly, i_use, i_mean, production_choices
+        ),
+    )
@@ -0,0 +1,621 @@
+"""Static reports (html or pdf) of the dashboard, for every configuration of its sidebar
+
+The configurations are enumerated and computed with the vectorized sweep (see lca_sweep), then the
+reports, with the numbers and the two pie charts of the dashboard, are rendered and written by a
+pool of processes. The content hash of each report (its configuration and its numbers) is kept in
+the manifest of the output folder, so that a rebuild of the catalog only renders the reports whose
+content changed, and removes the reports of the previous builds that are no longer in the space of
+configurations. The output folder also has an index.csv with the configuration of each report.
+
+The charts are rendered with vl-convert-python (as SVG in the html reports), so the reports are
+self-contained and can be read offline.
+
+Examples:
+    python -m lca_reports -o reports
+    python -m lca_reports -o reports --values "Lieu d'utilisation=France" --format pdf --jobs 8
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+import lca_calculations
+import lca_cli
+import lca_database
+import lca_sweep
+
+# version of the reports, to be incremented when their layout changes (all are then rendered again)
+report_version = 2
+list_report_formats = ["html", "pdf"]
+manifest_file_name = "manifest.json"
+index_file_name = "index.csv"
+
+repo_folder = Path(__file__).parent
+default_data_file_path = repo_folder / "data" / "Holis - Technical test.xlsx"
+default_customer_file_path = repo_folder / "data" / "dict_data_customers.json"
+
+# vega-lite specs of the charts, built once per process (see get_chart_templates)
+chart_templates = None
+
+html_template = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Life-Cycle Analysis of a Microwave</title>
+</head>
+<body style="font-family: sans-serif">
+<h1>Life-Cycle Analysis of a Microwave</h1>
+<table>
+{parameter_rows}
+</table>
+<p><b>Fonctional unit</b>: {functional_unit}</p>
+<h2>Results</h2>
+<p>The total impact of this product is <b>{total_micropoints} µPt</b>.</p>
+<p>This corresponds to <b>{citizen_share} %</b> of the impact of an average European citizen per \
+year.</p>
+<div style="display: flex">
+<div><h3>Impact per category</h3>{svg_per_category}</div>
+<div><h3>Impact per phase</h3>{svg_per_phase}</div>
+</div>
+</body>
+</html>
+"""
+
+
+def parse_sweep_values(list_values):
+    """Parse the values given on the command line, in the format "parameter=value_1,value_2"
+
+    Raises:
+        ValueError: if a value is not in this format
+
+    Returns:
+        dict: {parameter_name: list of values}, the numbers being converted to int or float
+    """
+    dict_values = {}
+    for values in list_values:
+        name, separator, str_values = values.partition("=")
+        if not separator or not name.strip() or not str_values.strip():
+            raise ValueError(
+                f'Invalid values {values!r}, expected "parameter=value_1,value_2"'
+            )
+        dict_values[name] = [parse_value(i) for i in str_values.split(",")]
+
+    return dict_values
+
+
+def parse_value(value):
+    for conversion in [int, float]:
+        try:
+            return conversion(value)
+        except ValueError:
+            pass
+
+    return value
+
+
+def get_report_name(dict_parameters):
+    """Stable file name (without suffix) of the report of a configuration"""
+    canonical_json = json.dumps(dict_parameters, sort_keys=True, ensure_ascii=False)
+
+    return hashlib.sha256(canonical_json.encode()).hexdigest()[:16]
+
+
+def build_report_contents(df_parameters, tables, list_indicators):
+    """Numbers displayed in the reports of a chunk of configurations
+
+    They are rounded as in the dashboard (see main.py and lca_result_cache), with array operations
+    on the whole chunk.
+
+    Args:
+        df_parameters (pandas.DataFrame): one row per configuration, one column per parameter
+        tables (numpy.ndarray): impact tables (see lca_calculations.compute_impact_tables) of the
+            configurations, of shape (n_configurations, n_rows, n_indicators + 2)
+        list_indicators (list): name of the indicators
+
+    Returns:
+        list: one dict per configuration, with the keys "parameters", "total_micropoints",
+            "citizen_share", "distribution_per_indicator" and "distribution_per_phase" (records of
+            the dataframes of the pie charts)
+    """
+    n_indicators = len(list_indicators)
+    n_phases = len(lca_calculations.list_phases)
+    row_total = lca_calculations.list_impact_table_rows.index("Total per category")
+    row_distribution = lca_calculations.list_impact_table_rows.index(
+        "Distribution per indicator (%)"
+    )
+
+    total_micropoints = tables[:, row_total, n_indicators].astype(int)
+    citizen_shares = (total_micropoints / 1000000 * 100).round(1)
+    totals_per_category = tables[:, row_total, :n_indicators].round(1)
+    distributions_per_indicator = tables[:, row_distribution, :n_indicators].round(1)
+    distributions_per_phase = tables[:, :n_phases, n_indicators + 1].round(1)
+
+    return [
+        {
+            "parameters": dict_parameters,
+            "total_micropoints": int(total_micropoints[i]),
+            "citizen_share": float(citizen_shares[i]),
+            "distribution_per_indicator": [
+                {
+                    "index": indicator,
+                    "Total per category": float(totals_per_category[i, j]),
+                    "Distribution per indicator (%)": float(
+                        distributions_per_indicator[i, j]
+                    ),
+                }
+                for j, indicator in enumerate(list_indicators)
+            ],
+            "distribution_per_phase": [
+                {
+                    "index": phase,
+                    "Distribution per phase (%)": float(distributions_per_phase[i, j]),
+                }
+                for j, phase in enumerate(lca_calculations.list_phases)
+            ],
+        }
+        for i, dict_parameters in enumerate(df_parameters.to_dict("records"))
+    ]
+
+
+def compute_content_hash(dict_content, report_format):
+    canonical_json = json.dumps(
+        [report_version, report_format, dict_content],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+
+    return hashlib.sha256(canonical_json.encode()).hexdigest()
+
+
+def iter_report_contents(
+    dict_data_customers, factor_matrix, dict_sweep_space=None, chunk_size=100000
+):
+    """Compute the contents of the reports of all the configurations, chunk by chunk
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        factor_matrix (lca_calculations.FactorMatrix): factor matrix of the database
+        dict_sweep_space (dict, optional): {parameter_name: list of values}, see
+            lca_sweep.sweep_parameters. Defaults to the space offered by the dashboard.
+        chunk_size (int, optional): maximum number of configurations per chunk. Defaults to
+            100000.
+
+    Yields:
+        list: (report_name, dict_content) of each configuration of the chunk
+    """
+    list_parameters = list(lca_sweep.get_sweep_parameters(dict_data_customers).keys())
+    list_indicators = list(factor_matrix.indicators)
+
+    for df_chunk in lca_sweep.sweep_parameters(
+        dict_data_customers, factor_matrix, dict_sweep_space, chunk_size
+    ):
+        impacts = df_chunk[
+            [
+                f"{phase} - {indicator}"
+                for phase in lca_calculations.list_phases
+                for indicator in list_indicators
+            ]
+        ].to_numpy()
+        tables = lca_calculations.compute_impact_tables(
+            impacts.reshape(
+                len(df_chunk), len(lca_calculations.list_phases), len(list_indicators)
+            ),
+            list_indicators,
+        )
+        df_parameters = df_chunk[list_parameters].astype(object)
+
+        yield [
+            (get_report_name(dict_content["parameters"]), dict_content)
+            for dict_content in build_report_contents(
+                df_parameters, tables, list_indicators
+            )
+        ]
+
+
+def get_chart_templates(dict_content):
+    """Vega-lite specs of the pie charts, built once with lca_charts (the charts of the dashboard)
+
+    The charts of all the reports only differ by their data, so the specs are built (and validated)
+    once per process, and the data of each report replaces their datasets.
+
+    Returns:
+        tuple: with:
+            - dict_specs (dict): {chart_name: spec}, with the charts "Impact per category",
+              "Impact per phase" and "Report" (both pie charts side by side, for the pdf reports)
+            - dict_dataset_names (dict): {key of the report content: name of its dataset}
+    """
+    global chart_templates
+    if chart_templates is not None:
+        return chart_templates
+
+    import altair as alt
+    import pandas as pd
+
+    import lca_charts
+
+    pie_per_category = lca_charts.build_pie_chart_per_category(
+        pd.DataFrame(dict_content["distribution_per_indicator"]).set_index("index")
+    )
+    pie_per_phase = lca_charts.build_pie_chart_per_phase(
+        pd.DataFrame(dict_content["distribution_per_phase"])
+    )
+    dict_specs = {
+        "Impact per category": pie_per_category.to_dict(),
+        "Impact per phase": pie_per_phase.to_dict(),
+        "Report": alt.hconcat(
+            pie_per_category.properties(title="Impact per category"),
+            pie_per_phase.properties(title="Impact per phase"),
+        ).to_dict(),
+    }
+    dict_dataset_names = {
+        "distribution_per_indicator": dict_specs["Impact per category"]["data"]["name"],
+        "distribution_per_phase": dict_specs["Impact per phase"]["data"]["name"],
+    }
+    chart_templates = (dict_specs, dict_dataset_names)
+
+    return chart_templates
+
+
+def build_chart_spec(dict_content, chart_name):
+    """Vega-lite spec of a chart of a report (see get_chart_templates)"""
+    dict_specs, dict_dataset_names = get_chart_templates(dict_content)
+    spec = dict_specs[chart_name]
+    dict_datasets = {
+        dataset_name: dict_content[key]
+        for key, dataset_name in dict_dataset_names.items()
+    }
+
+    return {
+        **spec,
+        "datasets": {name: dict_datasets[name] for name in spec["datasets"].keys()},
+    }
+
+
+def describe_functional_unit(dict_parameters):
+    return (
+        f"cooking food in 3 minutes at a power of {dict_parameters['Puisance (W)']} W, 1200 "
+        f"times a year during {dict_parameters['Duree de vie (annees)']} years."
+    )
+
+
+def render_html(dict_content):
+    import html
+
+    # requires vl-convert-python, as render_pdf: the charts are embedded as SVG, without scripts
+    import vl_convert
+
+    parameter_rows = "\n".join(
+        f"<tr><td>{html.escape(str(name))}</td><td>{html.escape(str(value))}</td></tr>"
+        for name, value in dict_content["parameters"].items()
+    )
+
+    return html_template.format(
+        parameter_rows=parameter_rows,
+        functional_unit=html.escape(
+            describe_functional_unit(dict_content["parameters"])
+        ),
+        total_micropoints=dict_content["total_micropoints"],
+        citizen_share=dict_content["citizen_share"],
+        svg_per_category=vl_convert.vegalite_to_svg(
+            build_chart_spec(dict_content, "Impact per category")
+        ),
+        svg_per_phase=vl_convert.vegalite_to_svg(
+            build_chart_spec(dict_content, "Impact per phase")
+        ),
+    ).encode()
+
+
+def render_pdf(dict_content):
+    # requires vl-convert-python, as the pdf export of altair
+    import vl_convert
+
+    spec = build_chart_spec(dict_content, "Report")
+    spec["title"] = {
+        "text": "Life-Cycle Analysis of a Microwave",
+        "subtitle": [
+            f"{name}: {value}" for name, value in dict_content["parameters"].items()
+        ]
+        + [
+            f"Fonctional unit: {describe_functional_unit(dict_content['parameters'])}",
+            f"The total impact of this product is {dict_content['total_micropoints']} µPt, "
+            f"{dict_content['citizen_share']} % of the impact of an average European "
+            "citizen per year.",
+        ],
+        "anchor": "start",
+    }
+
+    return vl_convert.vegalite_to_pdf(spec)
+
+
+dict_report_renderers = {
+    "html": render_html,
+    "pdf": render_pdf,
+}
+
+
+def write_reports(list_reports, output_folder, report_format):
+    """Render and write a batch of (report_name, dict_content) reports (run by the workers)
+
+    Returns:
+        list: name of the reports written
+    """
+    output_folder = Path(output_folder)
+    for report_name, dict_content in list_reports:
+        output_path = output_folder / f"{report_name}.{report_format}"
+        # written atomically, so that an interrupted rebuild never leaves a partial report
+        tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(dict_report_renderers[report_format](dict_content))
+        os.replace(tmp_path, output_path)
+
+    return [report_name for report_name, _ in list_reports]
+
+
+def read_manifest(output_folder):
+    """Content hash of each report of the output folder: {report_file_name: content_hash}"""
+    manifest_path = Path(output_folder) / manifest_file_name
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+
+def write_manifest(output_folder, dict_manifest):
+    manifest_path = Path(output_folder) / manifest_file_name
+    tmp_path = manifest_path.with_name(f".{manifest_file_name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(dict_manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def iter_changed_batches(
+    chunks,
+    output_folder,
+    report_format,
+    dict_manifest,
+    batch_size,
+    dict_counts,
+    set_report_files,
+):
+    """Batches of the reports whose content hash is not the one of the manifest
+
+    The index of the reports is written along the way, the unchanged reports are counted in
+    dict_counts["unchanged"], and the file names of all the reports are added to set_report_files.
+
+    Yields:
+        tuple: (list of (report_name, dict_content), {report_file_name: content_hash})
+    """
+    import pandas as pd
+
+    output_folder = Path(output_folder)
+    index_path = output_folder / index_file_name
+    for i, list_reports in enumerate(chunks):
+        pd.DataFrame(
+            [
+                {
+                    **dict_content["parameters"],
+                    "Report": f"{report_name}.{report_format}",
+                    "Total (micropoints)": dict_content["total_micropoints"],
+                }
+                for report_name, dict_content in list_reports
+            ]
+        ).to_csv(index_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+        list_changed = []
+        dict_hashes = {}
+        for report_name, dict_content in list_reports:
+            file_name = f"{report_name}.{report_format}"
+            set_report_files.add(file_name)
+            content_hash = compute_content_hash(dict_content, report_format)
+            if (
+                dict_manifest.get(file_name) == content_hash
+                and (output_folder / file_name).exists()
+            ):
+                dict_counts["unchanged"] += 1
+                continue
+            list_changed.append((report_name, dict_content))
+            dict_hashes[file_name] = content_hash
+            if len(list_changed) == batch_size:
+                yield list_changed, dict_hashes
+                list_changed, dict_hashes = [], {}
+        if list_changed:
+            yield list_changed, dict_hashes
+
+
+def remove_stale_reports(output_folder, report_format, dict_manifest, set_report_files):
+    """Remove the reports of the manifest that are not in set_report_files (of the same format)
+
+    Returns:
+        int: number of reports removed
+    """
+    list_stale = [
+        file_name
+        for file_name in dict_manifest
+        if file_name.endswith(f".{report_format}") and file_name not in set_report_files
+    ]
+    for file_name in list_stale:
+        (Path(output_folder) / file_name).unlink(missing_ok=True)
+        del dict_manifest[file_name]
+
+    return len(list_stale)
+
+
+def build_reports(
+    dict_data_customers,
+    factor_matrix,
+    output_folder,
+    dict_sweep_space=None,
+    report_format="html",
+    jobs=1,
+    batch_size=200,
+    chunk_size=100000,
+):
+    """Write the reports of all the configurations, skipping the ones whose content is unchanged
+
+    The configurations are computed in the current process (see iter_report_contents), and the
+    reports rendered and written by jobs processes, with at most 2 pending batches per process to
+    bound the memory. The manifest is updated with the batches written, also when interrupted. Once
+    all the configurations are written, the reports of the manifest outside of them (e.g. of a
+    previous build with other values) are removed.
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        factor_matrix (lca_calculations.FactorMatrix): factor matrix of the database
+        output_folder (str): folder of the reports
+        dict_sweep_space (dict, optional): {parameter_name: list of values}, see
+            lca_sweep.sweep_parameters. Defaults to the space offered by the dashboard.
+        report_format (str, optional): "html" or "pdf" (both require vl-convert-python).
+            Defaults to "html".
+        jobs (int, optional): number of processes rendering the reports. Defaults to 1.
+        batch_size (int, optional): number of reports rendered by a task. Defaults to 200.
+        chunk_size (int, optional): number of configurations computed together. Defaults to
+            100000.
+
+    Returns:
+        dict: number of reports "written", "unchanged" and "removed"
+    """
+    if report_format not in dict_report_renderers:
+        raise KeyError(
+            f"Unknown report format {report_format} (available: "
+            f"{', '.join(dict_report_renderers.keys())})"
+        )
+
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    dict_manifest = read_manifest(output_folder)
+    dict_counts = {"written": 0, "unchanged": 0, "removed": 0}
+    set_report_files = set()
+    batches = iter_changed_batches(
+        iter_report_contents(
+            dict_data_customers, factor_matrix, dict_sweep_space, chunk_size
+        ),
+        output_folder,
+        report_format,
+        dict_manifest,
+        batch_size,
+        dict_counts,
+        set_report_files,
+    )
+
+    def record_batch(list_written, dict_hashes):
+        dict_manifest.update(dict_hashes)
+        dict_counts["written"] += len(list_written)
+
+    try:
+        if jobs == 1:
+            for list_reports, dict_hashes in batches:
+                record_batch(
+                    write_reports(list_reports, output_folder, report_format),
+                    dict_hashes,
+                )
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+                pending = collections.deque()
+                for list_reports, dict_hashes in batches:
+                    pending.append(
+                        (
+                            executor.submit(
+                                write_reports,
+                                list_reports,
+                                output_folder,
+                                report_format,
+                            ),
+                            dict_hashes,
+                        )
+                    )
+                    if len(pending) >= 2 * jobs:
+                        future, dict_hashes = pending.popleft()
+                        record_batch(future.result(), dict_hashes)
+                while pending:
+                    future, dict_hashes = pending.popleft()
+                    record_batch(future.result(), dict_hashes)
+        # only once the whole space is known (not when interrupted)
+        dict_counts["removed"] = remove_stale_reports(
+            output_folder, report_format, dict_manifest, set_report_files
+        )
+    finally:
+        write_manifest(output_folder, dict_manifest)
+
+    return dict_counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Write the static reports of the dashboard for every configuration of its "
+        "sidebar"
+    )
+    parser.add_argument(
+        "-o", "--output", required=True, help="output folder of the reports"
+    )
+    parser.add_argument(
+        "--customer-data",
+        default=default_customer_file_path,
+        help="customer .json file, for the parameters that are not swept (default: "
+        "%(default)s)",
+    )
+    parser.add_argument(
+        "--values",
+        action="append",
+        default=[],
+        help='values of a parameter, e.g. "Duree de vie (annees)=5,10,15" (can be repeated, '
+        "default: the values offered by the dashboard)",
+    )
+    parser.add_argument("--format", choices=list_report_formats, default="html")
+    parser.add_argument(
+        "--database",
+        default=default_data_file_path,
+        help="excel workbook with the Database sheet, or .csv/.parquet table of the factors "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--aliases",
+        help="csv file of aliases of the activities of the database (see "
+        "lca_database.read_alias_table)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of processes rendering the reports (default: number of cores)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=200,
+        help="number of reports rendered by a task (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.customer_data, "r") as f:
+        dict_data_customers = json.load(f)
+    dict_sweep_space = lca_sweep.build_default_sweep_space(dict_data_customers)
+
+    try:
+        dict_sweep_space.update(parse_sweep_values(args.values))
+        factor_matrix, _ = lca_database.SharedFactorDatabase(
+            args.database, alias_file_path=args.aliases
+        ).get()
+        dict_counts = build_reports(
+            dict_data_customers,
+            factor_matrix,
+            args.output,
+            dict_sweep_space,
+            args.format,
+            max(args.jobs, 1),
+            args.batch_size,
+        )
+    except (KeyError, ValueError) as error:
+        sys.exit(f"Error: {lca_cli.format_error(error)}")
+    print(
+        f"{dict_counts['written']} reports written to {args.output}, "
+        f"{dict_counts['unchanged']} unchanged, {dict_counts['removed']} removed",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
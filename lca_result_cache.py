@@ -0,0 +1,256 @@
+import collections
+import hashlib
+import json
+import os
+import pickle
+import threading
+from pathlib import Path
+
+import lca_calculations
+import lca_contributions
+import lca_instrumentation
+
+# version of the cached results, to be incremented when the way they are computed changes
+result_cache_version = 2
+
+
+def canonicalize(value):
+    """Canonical form of the customer data, identical for inputs leading to the same results
+
+    The keys of the dicts are sorted (when serialized) and the numbers are converted to floats, so
+    that e.g. a lifetime of 10 (from the json file) and 10.0 (from a widget) give the same form.
+    """
+    if isinstance(value, lca_calculations.BillOfMaterials):
+        value = lca_calculations.bill_of_materials_to_records(value)
+    if isinstance(value, dict):
+        return {str(k): canonicalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(v) for v in value]
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    return float(value)
+
+
+def compute_cache_key(dict_data_customers, database_version):
+    """Stable hash of the canonical customer data and of the version of the database"""
+    canonical_json = json.dumps(
+        [
+            result_cache_version,
+            database_version,
+            canonicalize(dict_data_customers),
+        ],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+
+    return hashlib.sha256(canonical_json.encode()).hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU cache of results, with an optional on-disk tier
+
+    The memory tier is thread-safe, so it can be shared between the sessions of the dashboard. The
+    disk tier (one pickle file per key, written atomically) survives restarts and is shared between
+    the processes using the same folder, its least recently used files being removed beyond
+    max_disk_entries. The folder must only be writable by trusted processes, as it is unpickled.
+    """
+
+    def __init__(
+        self,
+        max_entries=1024,
+        disk_folder=None,
+        max_disk_entries=4096,
+        name="result cache",
+    ):
+        """
+        Args:
+            max_entries (int, optional): number of results kept in memory. Defaults to 1024.
+            disk_folder (Path, optional): folder of the disk tier. Defaults to None (no disk tier).
+            max_disk_entries (int, optional): number of results kept on disk. Defaults to 4096.
+            name (str, optional): name of the cache in the instrumentation. Defaults to
+                "result cache".
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.disk_folder = Path(disk_folder) if disk_folder is not None else None
+        self.max_disk_entries = max_disk_entries
+        self.dict_entries = collections.OrderedDict()
+        self.dict_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def get_disk_path(self, key):
+        return self.disk_folder / f"{key}.pkl"
+
+    def read_disk(self, key):
+        """Read a result from the disk tier, None when it is not there (or unreadable)"""
+        disk_path = self.get_disk_path(key)
+        try:
+            with open(disk_path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # truncated or outdated file: it is recomputed
+            try:
+                disk_path.unlink()
+            except OSError:
+                pass
+            return None
+
+        # the modification time is the last use of the file, for the eviction
+        try:
+            os.utime(disk_path)
+        except OSError:
+            pass
+
+        return value
+
+    def write_disk(self, key, value):
+        self.disk_folder.mkdir(parents=True, exist_ok=True)
+        disk_path = self.get_disk_path(key)
+        tmp_disk_path = disk_path.with_name(
+            f"{disk_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with open(tmp_disk_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_disk_path, disk_path)
+
+        list_disk_paths = list(self.disk_folder.glob("*.pkl"))
+        if len(list_disk_paths) > self.max_disk_entries:
+            list_mtimes = []
+            for path in list_disk_paths:
+                try:
+                    list_mtimes.append((path.stat().st_mtime_ns, path))
+                except OSError:
+                    pass
+            for _, path in sorted(list_mtimes)[: -self.max_disk_entries]:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def put(self, key, value):
+        with self._lock:
+            self.dict_entries[key] = value
+            self.dict_entries.move_to_end(key)
+            while len(self.dict_entries) > self.max_entries:
+                self.dict_entries.popitem(last=False)
+
+    def get_or_compute(self, key, function, *args, **kwargs):
+        """Get the result of a key, computing it with function(*args, **kwargs) on a miss
+
+        The results are shared by all the callers: they must not be modified.
+        """
+        with self._lock:
+            if key in self.dict_entries:
+                self.dict_entries.move_to_end(key)
+                self.dict_stats["memory_hits"] += 1
+                lca_instrumentation.instrumentation.record_cache_call(self.name)
+                return self.dict_entries[key]
+
+        if self.disk_folder is not None:
+            with lca_instrumentation.instrumentation.measure(f"{self.name}: read disk"):
+                value = self.read_disk(key)
+            if value is not None:
+                with self._lock:
+                    self.dict_stats["disk_hits"] += 1
+                lca_instrumentation.instrumentation.record_cache_call(self.name)
+                self.put(key, value)
+                return value
+
+        value = function(*args, **kwargs)
+        with self._lock:
+            self.dict_stats["misses"] += 1
+        lca_instrumentation.instrumentation.record_cache_call(self.name, hit=False)
+        self.put(key, value)
+        if self.disk_folder is not None:
+            try:
+                self.write_disk(key, value)
+            except OSError as error:
+                print(
+                    f"Warning: the result could not be written to the disk cache ({error})"
+                )
+
+        return value
+
+
+def build_distribution_per_indicator(df_impact):
+    """Dataframe of the pie chart of the impact per category of the dashboard"""
+    return (
+        df_impact.loc[["Total per category", "Distribution per indicator (%)"]][
+            [
+                i
+                for i in df_impact.columns
+                if i not in lca_calculations.list_impact_table_extra_columns
+            ]
+        ]
+        .round(1)
+        .T
+    )
+
+
+def build_distribution_per_phase(df_impact):
+    """Dataframe of the pie chart of the impact per phase of the dashboard"""
+    return (
+        df_impact.iloc[: len(lca_calculations.list_phases)][
+            ["Distribution per phase (%)"]
+        ]
+        .round(1)
+        .reset_index()
+    )
+
+
+def build_tornado(dict_data_customers, factor_matrix):
+    """Dataframe of the tornado chart of the dashboard (only the inputs that have an effect)"""
+    df_contributions = lca_contributions.compute_contributions(
+        dict_data_customers, factor_matrix
+    )
+    df_tornado = lca_contributions.compute_tornado(df_contributions).round(2)
+
+    return df_tornado[df_tornado["High (%)"] != 0]
+
+
+def compute_dashboard_results(
+    dict_data_customers, factor_matrix, impact_calculator=None, include_tornado=True
+):
+    """Compute the impact table and the dataframes of the charts of the dashboard
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        factor_matrix (lca_calculations.FactorMatrix): factor matrix of the database
+        impact_calculator (lca_incremental.IncrementalImpactCalculator, optional): calculator
+            reusing the phases whose inputs did not change. Defaults to None.
+        include_tornado (bool, optional): whether to compute the tornado chart (the most costly
+            one, see build_tornado to compute it separately). Defaults to True.
+
+    Returns:
+        dict: with the keys "df_impact", "distribution_per_indicator", "distribution_per_phase"
+            and "df_tornado" (when include_tornado)
+    """
+    instrumentation = lca_instrumentation.instrumentation
+    with instrumentation.measure("compute_phase_impacts"):
+        if impact_calculator is not None:
+            df_phase_impacts = impact_calculator.compute_phase_impacts(
+                dict_data_customers
+            )
+        else:
+            df_phase_impacts = lca_calculations.compute_phase_impacts(
+                dict_data_customers, factor_matrix
+            )
+    with instrumentation.measure("build_impact_table"):
+        df_impact = lca_calculations.build_impact_table(df_phase_impacts)
+    with instrumentation.measure("build chart dataframes"):
+        distribution_per_indicator = build_distribution_per_indicator(df_impact)
+        distribution_per_phase = build_distribution_per_phase(df_impact)
+    dict_results = {
+        "df_impact": df_impact,
+        "distribution_per_indicator": distribution_per_indicator,
+        "distribution_per_phase": distribution_per_phase,
+    }
+    if include_tornado:
+        with instrumentation.measure("build_tornado"):
+            dict_results["df_tornado"] = build_tornado(
+                dict_data_customers, factor_matrix
+            )
+
+    return dict_results
@@ -0,0 +1,455 @@
+"""Local HTTP/JSON service computing the impact table (df_impact of the dashboard)
+
+Endpoints:
+    POST /impact: the body is a product in the format of data/dict_data_customers.json, the
+        response is its impact table as {"index": [...], "columns": [...], "data": [[...], ...]}
+        (pandas "split" orientation: pd.DataFrame(**response) rebuilds df_impact)
+    GET /metrics: latency, throughput, cache and batching metrics
+    GET /health: {"status": "ok", "database_version": ...}
+
+The concurrent requests are gathered into micro-batches computed with a single vectorized call,
+and the results of identical products are served from a bounded LRU cache.
+
+Examples:
+    python -m lca_service --port 8000
+    curl -X POST --data @data/dict_data_customers.json http://127.0.0.1:8000/impact
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import lca_calculations
+import lca_database
+import lca_result_cache
+
+default_data_file_path = Path(__file__).parent / "data" / "Holis - Technical test.xlsx"
+
+# maximum size of the body of a request, in bytes
+max_body_size = 10 * 1024 * 1024
+
+dict_reasons = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+}
+
+
+def hash_payload(dict_data_customers):
+    """Hash of a product, identical for the products leading to the same results
+
+    The order of the keys and the type of the numbers (e.g. 10 or 10.0) do not matter, see
+    lca_result_cache.canonicalize.
+    """
+    return lca_result_cache.compute_cache_key(dict_data_customers, None)
+
+
+def compute_impact_tables(list_dict_data_customers, factor_matrix):
+    """Compute the impact tables of many products with a single vectorized evaluation
+
+    Returns:
+        list: impact table of each product, as a dict in the pandas "split" orientation
+    """
+    tables = lca_calculations.compute_impact_tables(
+        lca_calculations.compute_impact_matrices(
+            list_dict_data_customers, factor_matrix
+        ),
+        factor_matrix.indicators,
+    )
+    list_columns = (
+        factor_matrix.indicators + lca_calculations.list_impact_table_extra_columns
+    )
+
+    return [
+        {
+            "index": lca_calculations.list_impact_table_rows,
+            "columns": list_columns,
+            "data": table.tolist(),
+        }
+        for table in tables
+    ]
+
+
+async def read_request_head(request_line, reader):
+    """Parse the request line and read the headers of a HTTP/1.1 request
+
+    Returns:
+        tuple: (method, path, version, dict of the headers with lowercase names)
+
+    Raises:
+        ValueError: if the request line or a header line is malformed
+    """
+    list_words = request_line.decode("latin-1").split()
+    if len(list_words) != 3 or not list_words[2].startswith("HTTP/"):
+        raise ValueError(f"invalid request line {request_line!r}")
+    method, path, version = list_words
+    dict_headers = {}
+    # readline raises a ValueError for a line longer than the limit of the reader
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, separator, value = line.decode("latin-1").partition(":")
+        if not separator or not name.strip():
+            raise ValueError(f"invalid header line {line!r}")
+        dict_headers[name.strip().lower()] = value.strip()
+
+    return method, path, version, dict_headers
+
+
+class ServiceMetrics:
+    """Latency, throughput, cache and batching metrics of the service"""
+
+    def __init__(self, max_latencies=10000):
+        self.start_time = time.monotonic()
+        self.n_requests = 0
+        self.n_errors = 0
+        self.n_cache_hits = 0
+        self.n_batches = 0
+        self.n_batched_products = 0
+        self.batch_seconds = 0.0
+        # latencies of the last requests, to compute the percentiles
+        self.latencies = collections.deque(maxlen=max_latencies)
+
+    def record_request(self, seconds, cache_hit=False, error=False):
+        self.n_requests += 1
+        self.n_cache_hits += cache_hit
+        self.n_errors += error
+        self.latencies.append(seconds)
+
+    def record_batch(self, n_products, seconds):
+        self.n_batches += 1
+        self.n_batched_products += n_products
+        self.batch_seconds += seconds
+
+    def to_dict(self):
+        uptime = time.monotonic() - self.start_time
+        latencies_ms = np.array(self.latencies) * 1000
+        dict_latency = {"mean": None, "p50": None, "p95": None, "p99": None}
+        if len(latencies_ms):
+            dict_latency = {
+                "mean": float(latencies_ms.mean()),
+                **{
+                    f"p{percentile}": float(np.percentile(latencies_ms, percentile))
+                    for percentile in [50, 95, 99]
+                },
+            }
+
+        return {
+            "uptime_seconds": uptime,
+            "requests": self.n_requests,
+            "errors": self.n_errors,
+            "requests_per_second": self.n_requests / uptime if uptime > 0 else 0.0,
+            "cache_hits": self.n_cache_hits,
+            "cache_hit_rate": (
+                self.n_cache_hits / self.n_requests if self.n_requests else 0.0
+            ),
+            "latency_ms": dict_latency,
+            "batches": self.n_batches,
+            "mean_batch_size": (
+                self.n_batched_products / self.n_batches if self.n_batches else 0.0
+            ),
+            "products_computed_per_second": (
+                self.n_batched_products / self.batch_seconds
+                if self.batch_seconds > 0
+                else 0.0
+            ),
+        }
+
+
+class ImpactService:
+    """Compute the impact tables of the requests in micro-batches, with an LRU cache of the results
+
+    A batch is computed when it reaches max_batch_size products, or max_wait_ms after its first
+    product. The batches are computed one at a time in a worker thread, so the event loop keeps
+    accepting requests meanwhile. Identical products waiting for the same batch are computed once.
+    The cache is keyed by the version of the database, which is checked at most every
+    database_check_seconds.
+    """
+
+    def __init__(
+        self,
+        shared_database,
+        max_batch_size=256,
+        max_wait_ms=5,
+        cache_size=1024,
+        database_check_seconds=1,
+    ):
+        self.shared_database = shared_database
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self.database_check_seconds = database_check_seconds
+        self.metrics = ServiceMetrics()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.dict_cache = collections.OrderedDict()
+        # products of the next batch, and the future of each of them (by key)
+        self.list_pending = []
+        self.dict_pending_futures = {}
+        self._flush_handle = None
+        self._last_database_check = None
+        # check of the database in progress, awaited by all the requests arriving meanwhile
+        self._database_check = None
+
+    async def check_database(self):
+        """Get the version of the database, reloading it when the workbook changed
+
+        The requests arriving while the database is checked wait for the check, so that no request
+        is keyed with the version before the reload.
+        """
+        now = time.monotonic()
+        if (
+            self._last_database_check is None
+            or now - self._last_database_check > self.database_check_seconds
+        ):
+            self._last_database_check = now
+            self._database_check = asyncio.get_running_loop().run_in_executor(
+                self.executor, self.shared_database.get
+            )
+        await self._database_check
+
+        return self.shared_database.version
+
+    async def compute_impact_table(self, dict_data_customers):
+        """Compute the impact table of a product (see compute_impact_tables)
+
+        Returns:
+            tuple: (impact table, whether it was served from the cache)
+        """
+        key = (await self.check_database(), hash_payload(dict_data_customers))
+        if key in self.dict_cache:
+            self.dict_cache.move_to_end(key)
+            return self.dict_cache[key], True
+
+        # the future is taken before a flush, which removes it from the pending futures
+        future = self.dict_pending_futures.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.dict_pending_futures[key] = future
+            self.list_pending.append((key, dict_data_customers))
+            if len(self.list_pending) >= self.max_batch_size:
+                self.flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(
+                    self.max_wait_seconds, self.flush
+                )
+
+        # the future is shared by identical products: it must not be cancelled by one of them
+        return await asyncio.shield(future), False
+
+    def flush(self):
+        """Start the computation of the pending products"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        list_batch, self.list_pending = self.list_pending, []
+        dict_futures = {
+            key: self.dict_pending_futures.pop(key) for key, _ in list_batch
+        }
+        if list_batch:
+            asyncio.get_running_loop().create_task(
+                self.compute_batch(list_batch, dict_futures)
+            )
+
+    async def compute_batch(self, list_batch, dict_futures):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            factor_matrix, version = await loop.run_in_executor(
+                self.executor, self.shared_database.get
+            )
+        except Exception as error:
+            for future in dict_futures.values():
+                future.set_exception(error)
+            return
+        list_dict_data_customers = [dict_data for _, dict_data in list_batch]
+        try:
+            list_results = await loop.run_in_executor(
+                self.executor,
+                compute_impact_tables,
+                list_dict_data_customers,
+                factor_matrix,
+            )
+        except Exception:
+            # an invalid product fails the whole batch: the products are then computed one by one
+            list_results = []
+            for dict_data_customers in list_dict_data_customers:
+                try:
+                    list_results.append(
+                        (
+                            await loop.run_in_executor(
+                                self.executor,
+                                compute_impact_tables,
+                                [dict_data_customers],
+                                factor_matrix,
+                            )
+                        )[0]
+                    )
+                except Exception as error:
+                    list_results.append(error)
+        self.metrics.record_batch(len(list_batch), time.perf_counter() - start)
+
+        for (key, _), result in zip(list_batch, list_results):
+            future = dict_futures[key]
+            if isinstance(result, Exception):
+                future.set_exception(result)
+                continue
+            future.set_result(result)
+            # the results computed with an outdated database are not cached
+            if key[0] == version:
+                self.dict_cache[key] = result
+        while len(self.dict_cache) > self.cache_size:
+            self.dict_cache.popitem(last=False)
+
+    async def handle_request(self, method, path, body):
+        """Handle a request
+
+        Returns:
+            tuple: (status, dict sent as JSON)
+        """
+        if path == "/health":
+            return 200, {
+                "status": "ok",
+                "database_version": self.shared_database.version,
+            }
+        if path == "/metrics":
+            return 200, {
+                **self.metrics.to_dict(),
+                "cache_size": len(self.dict_cache),
+                "pending": len(self.list_pending),
+            }
+        if path != "/impact":
+            return 404, {"error": f"Unknown path {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST to compute an impact table"}
+
+        start = time.perf_counter()
+        try:
+            dict_data_customers = json.loads(body)
+            table, cache_hit = await self.compute_impact_table(dict_data_customers)
+        except Exception as error:
+            self.metrics.record_request(time.perf_counter() - start, error=True)
+            return 400, {"error": f"{type(error).__name__}: {error}"}
+        self.metrics.record_request(time.perf_counter() - start, cache_hit=cache_hit)
+
+        return 200, table
+
+    async def handle_connection(self, reader, writer):
+        """Serve the HTTP/1.1 requests of a connection (kept alive unless the client closes it)"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, path, version, dict_headers = await read_request_head(
+                        request_line, reader
+                    )
+                    content_length = int(dict_headers.get("content-length", 0))
+                    if content_length < 0:
+                        raise ValueError(f"Invalid Content-Length {content_length}")
+                except ValueError as error:
+                    # the rest of the stream can not be parsed: the connection is closed
+                    status, dict_response = 400, {
+                        "error": f"Malformed request: {error}"
+                    }
+                    keep_alive = False
+                else:
+                    if content_length > max_body_size:
+                        status, dict_response = 413, {"error": "Body too large"}
+                        keep_alive = False
+                    else:
+                        body = await reader.readexactly(content_length)
+                        status, dict_response = await self.handle_request(
+                            method, path.split("?")[0], body
+                        )
+                        keep_alive = (
+                            dict_headers.get("connection", "").lower() != "close"
+                            and version == "HTTP/1.1"
+                        )
+
+                response = json.dumps(dict_response).encode()
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {dict_reasons[status]}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(response)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                        "\r\n"
+                    ).encode()
+                    + response
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # connection closed by the client
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, service):
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Serving on http://{host}:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve the impact calculation over HTTP/JSON (same table as the dashboard)"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--database",
+        default=default_data_file_path,
+        help="excel workbook with the Database sheet, or .csv/.parquet table of the factors "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--aliases",
+        help="csv file of aliases of the activities of the database (see "
+        "lca_database.read_alias_table)",
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=256,
+        help="maximum number of products computed together (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=5,
+        help="maximum wait for a batch to fill up, in ms (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1024,
+        help="number of impact tables kept in the cache (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    service = ImpactService(
+        lca_database.SharedFactorDatabase(args.database, alias_file_path=args.aliases),
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        cache_size=args.cache_size,
+    )
+    try:
+        asyncio.run(serve(args.host, args.port, service))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Measure the cold start of the dashboard and of the calculations, each in a new interpreter
+
+Each scenario runs in a fresh python process (as a serverless deployment would), and the time is
+measured from the start of the process, so it includes the imports. The heavy modules loaded by
+each scenario are listed, to check that the fast-start path does not load them.
+
+Examples:
+    python -m lca_startup
+    python -m lca_startup --repeat 5 -o startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import lca_database
+
+repo_folder = Path(__file__).parent
+default_data_file_path = repo_folder / "data" / "Holis - Technical test.xlsx"
+
+# modules whose import is a large part of the start
+list_heavy_modules = ["pandas", "openpyxl", "altair", "pyarrow", "streamlit"]
+
+# the scenarios print the heavy modules they loaded, as a json list on the last line
+print_heavy_modules = f"""
+import json, sys
+print(json.dumps([m for m in {list_heavy_modules!r} if m in sys.modules]))
+"""
+
+
+def build_scenarios(data_file_path, snapshot_folder):
+    """Code of each scenario, and the environment variables it runs with
+
+    Returns:
+        dict: {scenario_name: (code, dict_environment)}
+    """
+    dict_scenarios = {
+        "empty interpreter": ("pass", {}),
+        "import the calculations": (
+            "import lca_calculations, lca_database, lca_incremental, lca_result_cache, "
+            "lca_uncertainty",
+            {},
+        ),
+        "database (precompiled snapshot)": (
+            "import lca_database\n"
+            f"lca_database.SharedFactorDatabase({str(data_file_path)!r}, "
+            f"{str(snapshot_folder)!r}).get()",
+            {},
+        ),
+        # a new snapshot folder for each run, so the workbook is always read
+        "database (excel workbook)": (
+            "import tempfile, lca_database\n"
+            "with tempfile.TemporaryDirectory() as folder:\n"
+            f"    lca_database.SharedFactorDatabase({str(data_file_path)!r}, folder).get()",
+            {},
+        ),
+    }
+    dashboard_code = (
+        "from streamlit.testing.v1 import AppTest\n"
+        "at = AppTest.from_file('main.py', default_timeout=120).run()\n"
+        "assert not at.exception, at.exception"
+    )
+    dict_scenarios["dashboard first run"] = (dashboard_code, {})
+    dict_scenarios["dashboard first run (fast start)"] = (
+        dashboard_code,
+        {"LCA_FAST_START": "1"},
+    )
+
+    return dict_scenarios
+
+
+def run_scenario(code, dict_environment, repeat=3):
+    """Run a scenario in new interpreters, and measure the median time until the process ends
+
+    Returns:
+        dict: {"seconds": ..., "heavy_modules": [...]}
+    """
+    environment = {
+        **os.environ,
+        **dict_environment,
+        "PYTHONPATH": os.pathsep.join(
+            [str(repo_folder), os.environ.get("PYTHONPATH", "")]
+        ),
+    }
+    list_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed_process = subprocess.run(
+            [sys.executable, "-c", code + print_heavy_modules],
+            cwd=repo_folder,
+            env=environment,
+            capture_output=True,
+            text=True,
+        )
+        list_times.append(time.perf_counter() - start)
+        if completed_process.returncode != 0:
+            raise RuntimeError(completed_process.stderr)
+
+    return {
+        "seconds": statistics.median(list_times),
+        "heavy_modules": json.loads(completed_process.stdout.splitlines()[-1]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the cold start of the dashboard and of the calculations"
+    )
+    parser.add_argument("-o", "--output", help="write the results to this json file")
+    parser.add_argument(
+        "--database",
+        default=default_data_file_path,
+        help="excel workbook with the Database sheet (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        help="only run this scenario (can be repeated, default: all the scenarios)",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        # the precompiled snapshot, as written by python -m lca_database when deploying
+        snapshot_folder = Path(tmp_folder) / "snapshot"
+        lca_database.publish_database(args.database, snapshot_folder)
+        dict_scenarios = build_scenarios(args.database, snapshot_folder)
+
+        dict_results = {}
+        for name, (code, dict_environment) in dict_scenarios.items():
+            if args.scenario and name not in args.scenario:
+                continue
+            dict_results[name] = run_scenario(code, dict_environment, args.repeat)
+            print(
+                f"{name:<36} {dict_results[name]['seconds'] * 1000:10.1f} ms   "
+                f"{', '.join(dict_results[name]['heavy_modules']) or '-'}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {"python": platform.python_version(), "results": dict_results},
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+import lca_calculations
+
+# name of the parameters that can be swept (the material production locations are added per material)
+list_sweep_parameters = [
+    "Duree de vie (annees)",
+    "Puisance (W)",
+    "Lieu d'utilisation",
+    "Lieu d'assemblage",
+    "Moyen de transport",
+]
+
+
+def get_production_parameter_name(material_name):
+    return f"Lieu de production ({material_name})"
+
+
+def get_sweep_parameters(dict_data_customers):
+    """Get the current value of each parameter that can be swept
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+
+    Returns:
+        dict: {parameter_name: current_value}
+    """
+    dict_parameters = {
+        "Duree de vie (annees)": dict_data_customers["Usage"]["Duree de vie (annees)"],
+        "Puisance (W)": dict_data_customers["Usage"]["Puisance (W)"],
+        "Lieu d'utilisation": dict_data_customers["Usage"]["Lieu d'utilisation"],
+        "Lieu d'assemblage": dict_data_customers["Processing"]["Lieu d'assemblage"],
+        # the dashboard uses the same transportation mean for all the trips between countries
+        "Moyen de transport": next(
+            iter(dict_data_customers["Moyen de transport"].values()), "truck"
+        ),
+    }
+    bill_of_materials = lca_calculations.get_bill_of_materials(dict_data_customers)
+    for name_id, country_id in zip(
+        bill_of_materials.name_ids, bill_of_materials.country_ids
+    ):
+        dict_parameters[
+            get_production_parameter_name(bill_of_materials.names[name_id])
+        ] = bill_of_materials.countries[country_id]
+
+    return dict_parameters
+
+
+def apply_sweep_parameters(dict_data_customers, dict_parameters):
+    """Return a copy of the customer data with the given parameters applied
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        dict_parameters (dict): {parameter_name: value}, parameters not given are left unchanged
+
+    Returns:
+        dict: the modified copy of dict_data_customers
+    """
+    dict_data = copy.deepcopy(dict_data_customers)
+
+    for name, value in dict_parameters.items():
+        if name in ["Duree de vie (annees)", "Puisance (W)", "Lieu d'utilisation"]:
+            dict_data["Usage"][name] = value
+        elif name == "Lieu d'assemblage":
+            dict_data["Processing"][name] = value
+        elif name == "Moyen de transport":
+            for trip in dict_data["Moyen de transport"].keys():
+                dict_data["Moyen de transport"][trip] = value
+        elif isinstance(dict_data["Materiaux"], lca_calculations.BillOfMaterials):
+            dict_data["Materiaux"] = set_production_location(
+                dict_data["Materiaux"], name, value
+            )
+        else:
+            list_materials = [
+                material
+                for material in dict_data["Materiaux"]
+                if get_production_parameter_name(material["Nom"]) == name
+            ]
+            if not list_materials:
+                raise KeyError(f"Parameter {name} can not be swept")
+            for material in list_materials:
+                material["Lieu de production"] = value
+
+    return dict_data
+
+
+def set_production_location(bill_of_materials, parameter_name, country):
+    """Return a copy of the BillOfMaterials with the production location parameter changed"""
+    materials = np.flatnonzero(
+        [
+            get_production_parameter_name(name) == parameter_name
+            for name in bill_of_materials.names
+        ]
+    )
+    if len(materials) == 0:
+        raise KeyError(f"Parameter {parameter_name} can not be swept")
+
+    list_countries = list(bill_of_materials.countries)
+    if country not in list_countries:
+        list_countries.append(country)
+    country_ids = bill_of_materials.country_ids.copy()
+    country_ids[np.isin(bill_of_materials.name_ids, materials)] = list_countries.index(
+        country
+    )
+
+    return bill_of_materials._replace(countries=list_countries, country_ids=country_ids)
+
+
+def build_default_sweep_space(dict_data_customers):
+    """Build the sweep space offered by the sidebar of the dashboard (main.py)"""
+    list_countries_usage = ["France", "Chine"]
+    list_countries_materials = list_countries_usage + ["Taiwan"]
+
+    dict_sweep_space = {
+        "Duree de vie (annees)": list(range(1, 31)),
+        "Puisance (W)": list(range(400, 1001, 50)),
+        "Lieu d'utilisation": list_countries_usage,
+        "Lieu d'assemblage": list_countries_usage,
+        "Moyen de transport": ["truck", "train", "boat", "plane"],
+    }
+    for name in lca_calculations.get_bill_of_materials(dict_data_customers).names:
+        dict_sweep_space[get_production_parameter_name(name)] = list_countries_materials
+
+    return dict_sweep_space
+
+
+def _phase_impact(dict_data_customers, factor_matrix, phase):
+    activity_vector = lca_calculations.dict_activity_vector_builders[phase](
+        dict_data_customers, factor_matrix
+    )
+    return activity_vector @ factor_matrix.matrix
+
+
+def build_sweep_tables(dict_data_customers, factor_matrix, dict_values):
+    """Precompute the contribution of each parameter value to the impacts
+
+    All the phases are linear in their quantities, so the impact of any point of the sweep is
+    the sum of contributions that only depend on a few parameters each:
+        - material: constant
+        - processing: assembly location
+        - use phase: (lifetime x power) x contribution of the location of use
+        - transportation: sum over the materials of a contribution depending on
+          (production location, assembly location, transportation mean), plus a contribution for
+          the end product depending on (assembly location, location of use, transportation mean)
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        factor_matrix (lca_calculations.FactorMatrix): factor matrix of the database
+        dict_values (dict): {parameter_name: list of values}, for every parameter of the sweep
+
+    Returns:
+        dict: contribution tables, each with the indicators on the last axis
+    """
+    list_use = dict_values["Lieu d'utilisation"]
+    list_assembly = dict_values["Lieu d'assemblage"]
+    list_means = dict_values["Moyen de transport"]
+
+    dict_tables = {
+        "Material": _phase_impact(dict_data_customers, factor_matrix, "Material"),
+        "Processing": np.stack(
+            [
+                _phase_impact(
+                    apply_sweep_parameters(
+                        dict_data_customers, {"Lieu d'assemblage": assembly}
+                    ),
+                    factor_matrix,
+                    "Processing",
+                )
+                for assembly in list_assembly
+            ]
+        ),
+        # use phase for a lifetime of 1 year and a power of 1 W
+        "Use phase": np.stack(
+            [
+                _phase_impact(
+                    apply_sweep_parameters(
+                        dict_data_customers,
+                        {
+                            "Duree de vie (annees)": 1,
+                            "Puisance (W)": 1,
+                            "Lieu d'utilisation": use,
+                        },
+                    ),
+                    factor_matrix,
+                    "Use phase",
+                )
+                for use in list_use
+            ]
+        ),
+    }
+
+    # impact of 1 tkm done with each transportation mean
+    transportation_factors = factor_matrix.matrix[
+        [
+            factor_matrix.activities[i]
+            for i in lca_calculations.list_transportation_means
+        ]
+    ]
+
+    # transportation of the end product (it does not depend on the main transportation mean)
+    bill_of_materials = lca_calculations.get_bill_of_materials(dict_data_customers)
+    mass_end_product = bill_of_materials.finished_masses.sum()
+    assembly_countries, use_countries = np.meshgrid(
+        [lca_calculations.get_country_code(i) for i in list_assembly],
+        [lca_calculations.get_country_code(i) for i in list_use],
+        indexing="ij",
+    )
+    distances_end_product = lca_calculations.compute_trip_distances(
+        assembly_countries.ravel(),
+        use_countries.ravel(),
+        np.full(
+            assembly_countries.size, lca_calculations.end_product_transportation_code
+        ),
+    ).reshape(len(list_assembly), len(list_use), -1)
+    table_end_product = (
+        distances_end_product * mass_end_product / 1000  # convert kg to t
+    ) @ transportation_factors
+    dict_tables["Transportation end product"] = np.repeat(
+        table_end_product[:, :, None], len(list_means), axis=2
+    )
+
+    # transportation of each material to the assembly site, the table per kg being shared by the
+    # materials with the same production locations
+    dict_tables_per_kg = {}
+    list_tables_materials = []
+    for material_name, useful_mass in zip(
+        lca_calculations.get_material_names(bill_of_materials),
+        bill_of_materials.useful_masses,
+    ):
+        list_production = dict_values[get_production_parameter_name(material_name)]
+        if tuple(list_production) not in dict_tables_per_kg:
+            dict_tables_per_kg[tuple(list_production)] = (
+                lca_calculations.compute_trip_tkm_tables(
+                    dict_data_customers["Moyen de transport"],
+                    list_production,
+                    list_assembly,
+                    list_means,
+                )
+                @ transportation_factors
+            )
+        list_tables_materials.append(
+            dict_tables_per_kg[tuple(list_production)] * useful_mass
+        )
+    dict_tables["Transportation materials"] = list_tables_materials
+
+    return dict_tables
+
+
+def count_sweep_points(dict_data_customers, dict_sweep_space=None):
+    """Number of points of the sweep (product of the number of values of each parameter)"""
+    if dict_sweep_space is None:
+        dict_sweep_space = build_default_sweep_space(dict_data_customers)
+
+    return int(np.prod([len(values) for values in dict_sweep_space.values()]))
+
+
+def sweep_parameters(
+    dict_data_customers, df_database, dict_sweep_space=None, chunk_size=100000
+):
+    """Compute the impacts over the Cartesian product of the parameters, streamed in chunks
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        df_database (pandas.DataFrame): dataframe with the impact of the materials
+        dict_sweep_space (dict, optional): {parameter_name: list of values} for the swept
+            parameters, the other parameters keep their value from dict_data_customers.
+            Defaults to the space offered by the dashboard (see build_default_sweep_space).
+        chunk_size (int, optional): maximum number of points per chunk. Defaults to 100000.
+
+    Yields:
+        pandas.DataFrame: one row per point, with one column per parameter and one column per
+            phase and indicator, named "<phase> - <indicator>"
+    """
+    if dict_sweep_space is None:
+        dict_sweep_space = build_default_sweep_space(dict_data_customers)
+
+    dict_current_values = get_sweep_parameters(dict_data_customers)
+    for name in dict_sweep_space.keys():
+        if name not in dict_current_values:
+            raise KeyError(f"Parameter {name} can not be swept")
+    dict_values = {
+        name: list(dict_sweep_space.get(name, [value]))
+        for name, value in dict_current_values.items()
+    }
+
+    factor_matrix = lca_calculations.build_factor_matrix(df_database)
+    dict_tables = build_sweep_tables(dict_data_customers, factor_matrix, dict_values)
+
+    list_names = list(dict_values.keys())
+    shape = tuple(len(dict_values[name]) for name in list_names)
+    n_points = int(np.prod(shape))
+    lifetimes = np.asarray(dict_values["Duree de vie (annees)"], dtype=float)
+    powers = np.asarray(dict_values["Puisance (W)"], dtype=float)
+    list_material_names = lca_calculations.get_material_names(
+        lca_calculations.get_bill_of_materials(dict_data_customers)
+    )
+    list_impact_columns = [
+        f"{phase} - {indicator}"
+        for phase in lca_calculations.list_phases
+        for indicator in factor_matrix.indicators
+    ]
+
+    for start in range(0, n_points, chunk_size):
+        points = np.arange(start, min(start + chunk_size, n_points))
+        dict_indices = dict(zip(list_names, np.unravel_index(points, shape)))
+        i_lifetime = dict_indices["Duree de vie (annees)"]
+        i_power = dict_indices["Puisance (W)"]
+        i_use = dict_indices["Lieu d'utilisation"]
+        i_assembly = dict_indices["Lieu d'assemblage"]
+        i_mean = dict_indices["Moyen de transport"]
+
+        impacts = np.empty(
+            (
+                len(points),
+                len(lca_calculations.list_phases),
+                len(factor_matrix.indicators),
+            )
+        )
+        impacts[:, 0] = dict_tables["Material"]
+        impacts[:, 1] = dict_tables["Processing"][i_assembly]
+        impacts[:, 2] = (
+            dict_tables["Use phase"][i_use]
+            * (lifetimes[i_lifetime] * powers[i_power])[:, None]
+        )
+        impacts[:, 3] = dict_tables["Transportation end product"][
+            i_assembly, i_use, i_mean
+        ]
+        for material_name, table_material in zip(
+            list_material_names, dict_tables["Transportation materials"]
+        ):
+            i_production = dict_indices[get_production_parameter_name(material_name)]
+            impacts[:, 3] += table_material[i_production, i_assembly, i_mean]
+
+        df_chunk = pd.DataFrame(
+            {
+                name: (
+                    pd.Categorical.from_codes(
+                        dict_indices[name], categories=dict_values[name]
+                    )
+                    if isinstance(dict_values[name][0], str)
+                    else np.asarray(dict_values[name])[dict_indices[name]]
+                )
+                for name in list_names
+            },
+            index=points,
+        )
+        df_chunk[list_impact_columns] = impacts.reshape(len(points), -1)
+
+        yield df_chunk
@@ -0,0 +1,339 @@
+import numpy as np
+
+import lca_calculations
+
+# Each uncertain value is multiplied by a random multiplier, described by a dict:
+#   - {"distribution": "lognormal", "gsd": 1.5}: median 1, geometric standard deviation gsd
+#   - {"distribution": "normal", "relative_std": 0.1}: mean 1, standard deviation relative_std,
+#     truncated at 0 (the quantities and factors do not change sign)
+#   - {"distribution": "uniform", "relative_range": 0.2}: uniform between 1 - range and 1 + range
+
+# illustrative defaults used by the dashboard (lognormal factors, as usual for LCI data)
+dict_default_factor_uncertainty = {
+    "default": {"distribution": "lognormal", "gsd": 1.2},
+}
+dict_default_quantity_uncertainty = {
+    "Masse utile (kg)": {"distribution": "normal", "relative_std": 0.05},
+    "Nombre de cycles par an": {"distribution": "normal", "relative_std": 0.2},
+    "Puisance (W)": {"distribution": "normal", "relative_std": 0.05},
+}
+
+# quantities of the customer data that can be uncertain, and the component they scale
+list_use_phase_quantities = [
+    "Duree de vie (annees)",
+    "Nombre de cycles par an",
+    "Puisance (W)",
+    "Duree de cycle (min)",
+]
+list_uncertain_quantities = list_use_phase_quantities + [
+    "Masse utile (kg)",
+    "Consommation d'energie (kWh)",
+]
+
+
+def draw_multipliers(dict_distribution, size, rng):
+    """Draw random multipliers following the given distribution
+
+    Args:
+        dict_distribution (dict): description of the distribution (see the top of this file)
+        size (int or tuple): shape of the samples
+        rng (numpy.random.Generator): random generator
+
+    Returns:
+        numpy.ndarray: multipliers of the given shape
+    """
+    distribution = dict_distribution["distribution"]
+    if distribution == "lognormal":
+        return rng.lognormal(0, np.log(dict_distribution["gsd"]), size)
+    if distribution == "normal":
+        return np.maximum(
+            1 + dict_distribution["relative_std"] * rng.standard_normal(size), 0
+        )
+    if distribution == "uniform":
+        relative_range = dict_distribution["relative_range"]
+        return rng.uniform(1 - relative_range, 1 + relative_range, size)
+
+    raise ValueError(f"Unknown distribution {distribution}")
+
+
+def build_component_matrices(dict_data_customers, factor_matrix):
+    """Split the activity quantities into components that scale with a single uncertain quantity
+
+    The components are, in this order: each material (its material, its transportation to the
+    assembly site and its share of the transportation of the end product, that all scale with its
+    useful mass, the finished mass being the useful mass without the processing losses), the
+    processing and the use phase. Only the activities used by the product are kept.
+
+    Returns:
+        tuple: with:
+            - components (numpy.ndarray): quantities of shape (n_components, n_phases,
+              n_used_activities), that sum to the columns of the used activities in the activity
+              matrix of lca_calculations.build_activity_matrix
+            - activity_rows (numpy.ndarray): row of each used activity in the factor matrix
+    """
+    bill_of_materials = lca_calculations.get_bill_of_materials(dict_data_customers)
+    n_materials = len(bill_of_materials.name_ids)
+    material_rows = lca_calculations.get_material_activity_rows(
+        bill_of_materials, factor_matrix
+    )
+    found = material_rows >= 0
+    transportation_rows = np.array(
+        [
+            factor_matrix.activities[i]
+            for i in lca_calculations.list_transportation_means
+        ]
+    )
+    electricity_rows = lca_calculations.get_electricity_rows(
+        [
+            dict_data_customers["Processing"]["Lieu d'assemblage"],
+            dict_data_customers["Usage"]["Lieu d'utilisation"],
+        ],
+        factor_matrix,
+    )
+
+    # the transportation of the end product is shared between the materials by finished mass
+    tkm_materials, tkm_end_product = (
+        lca_calculations.compute_tkm_transportation_components(dict_data_customers)
+    )
+    mass_end_product = bill_of_materials.finished_masses.sum()
+    if mass_end_product > 0:
+        tkm_materials = tkm_materials + np.outer(
+            bill_of_materials.finished_masses / mass_end_product, tkm_end_product
+        )
+
+    # (component, phase, activity row, quantity) of each activity used by the product
+    dict_phase_ids = {phase: i for i, phase in enumerate(lca_calculations.list_phases)}
+    n_means = len(transportation_rows)
+    component_ids = np.concatenate(
+        [
+            np.flatnonzero(found),
+            np.repeat(np.arange(n_materials), n_means),
+            [n_materials, n_materials + 1],
+        ]
+    ).astype(int)
+    phase_ids = np.concatenate(
+        [
+            np.full(found.sum(), dict_phase_ids["Material"]),
+            np.full(n_materials * n_means, dict_phase_ids["Transportation"]),
+            [dict_phase_ids["Processing"], dict_phase_ids["Use phase"]],
+        ]
+    ).astype(int)
+    rows = np.concatenate(
+        [
+            material_rows[found],
+            np.tile(transportation_rows, n_materials),
+            electricity_rows,
+        ]
+    )
+    quantities = np.concatenate(
+        [
+            bill_of_materials.useful_masses[found],
+            tkm_materials.ravel(),
+            [
+                dict_data_customers["Processing"]["Consommation d'energie (kWh)"],
+                lca_calculations.compute_use_phase_electricity(dict_data_customers),
+            ],
+        ]
+    )
+
+    activity_rows, activity_ids = np.unique(rows, return_inverse=True)
+    components = np.zeros(
+        (n_materials + 2, len(lca_calculations.list_phases), len(activity_rows))
+    )
+    np.add.at(components, (component_ids, phase_ids, activity_ids), quantities)
+
+    return components, activity_rows
+
+
+def draw_quantity_multipliers(
+    dict_data_customers, dict_quantity_uncertainty, n_samples, rng
+):
+    """Draw the multipliers of each component (see build_component_matrices)
+
+    Returns:
+        numpy.ndarray: multipliers of shape (n_samples, n_components)
+    """
+    for quantity in dict_quantity_uncertainty.keys():
+        if quantity not in list_uncertain_quantities:
+            raise KeyError(f"Warning: quantity {quantity} can not be uncertain")
+
+    n_materials = len(
+        lca_calculations.get_bill_of_materials(dict_data_customers).name_ids
+    )
+    multipliers = np.ones((n_samples, n_materials + 2))
+
+    if "Masse utile (kg)" in dict_quantity_uncertainty:
+        # the same draw scales the material and its transportation
+        multipliers[:, :n_materials] = draw_multipliers(
+            dict_quantity_uncertainty["Masse utile (kg)"], (n_samples, n_materials), rng
+        )
+    if "Consommation d'energie (kWh)" in dict_quantity_uncertainty:
+        multipliers[:, n_materials] = draw_multipliers(
+            dict_quantity_uncertainty["Consommation d'energie (kWh)"], n_samples, rng
+        )
+    for quantity in list_use_phase_quantities:
+        if quantity in dict_quantity_uncertainty:
+            multipliers[:, n_materials + 1] *= draw_multipliers(
+                dict_quantity_uncertainty[quantity], n_samples, rng
+            )
+
+    return multipliers
+
+
+def draw_factor_multipliers(
+    list_activities, n_indicators, dict_factor_uncertainty, n_samples, rng
+):
+    """Draw independent multipliers for each factor of the given activities
+
+    Args:
+        list_activities (list): name of the activities
+        n_indicators (int): number of indicators
+        dict_factor_uncertainty (dict): {activity_name: distribution}, the "default" key being
+            used for the activities not in the dict (no uncertainty if there is no default)
+        n_samples (int): number of samples
+        rng (numpy.random.Generator): random generator
+
+    Returns:
+        numpy.ndarray: multipliers of shape (n_samples, n_activities, n_indicators)
+    """
+    multipliers = np.ones((n_samples, len(list_activities), n_indicators))
+    for i, activity in enumerate(list_activities):
+        dict_distribution = dict_factor_uncertainty.get(
+            activity, dict_factor_uncertainty.get("default")
+        )
+        if dict_distribution is not None:
+            multipliers[:, i] = draw_multipliers(
+                dict_distribution, (n_samples, n_indicators), rng
+            )
+
+    return multipliers
+
+
+def sample_impact_tables(
+    dict_data_customers,
+    df_database,
+    n_samples,
+    dict_factor_uncertainty=None,
+    dict_quantity_uncertainty=None,
+    chunk_size=10000,
+    seed=None,
+):
+    """Propagate the uncertainty of the factors and quantities with a Monte Carlo simulation
+
+    All the samples of a chunk are computed at once with array operations: the activity quantities
+    of each sample are a weighted sum of the components (see build_component_matrices), that is
+    multiplied by the sampled factors of the activities actually used.
+
+    Args:
+        dict_data_customers (dict): dict with the data from the customers
+        df_database (pandas.DataFrame): dataframe with the impact of the materials
+        n_samples (int): number of samples
+        dict_factor_uncertainty (dict, optional): {activity_name or "default": distribution}.
+            Defaults to dict_default_factor_uncertainty.
+        dict_quantity_uncertainty (dict, optional): {quantity: distribution}, the quantities being
+            in list_uncertain_quantities. Defaults to dict_default_quantity_uncertainty.
+        chunk_size (int, optional): number of samples computed at once, to bound the memory.
+            Defaults to 10000.
+        seed (int, optional): seed of the random generator. Defaults to None.
+
+    Returns:
+        numpy.ndarray: impact tables (see lca_calculations.compute_impact_tables) of each sample,
+            of shape (n_samples, n_rows, n_indicators + 2)
+    """
+    if dict_factor_uncertainty is None:
+        dict_factor_uncertainty = dict_default_factor_uncertainty
+    if dict_quantity_uncertainty is None:
+        dict_quantity_uncertainty = dict_default_quantity_uncertainty
+
+    rng = np.random.default_rng(seed)
+    factor_matrix = lca_calculations.build_factor_matrix(df_database)
+    # only the activities used by the product are sampled
+    components, activity_rows = build_component_matrices(
+        dict_data_customers, factor_matrix
+    )
+    factors = factor_matrix.matrix[activity_rows]
+    list_activity_names = lca_calculations.get_activity_names(factor_matrix)
+    list_active_names = [list_activity_names[i] for i in activity_rows]
+
+    list_tables = []
+    for start in range(0, n_samples, chunk_size):
+        n_chunk = min(chunk_size, n_samples - start)
+        quantity_multipliers = draw_quantity_multipliers(
+            dict_data_customers, dict_quantity_uncertainty, n_chunk, rng
+        )
+        sampled_factors = factors * draw_factor_multipliers(
+            list_active_names,
+            len(factor_matrix.indicators),
+            dict_factor_uncertainty,
+            n_chunk,
+            rng,
+        )
+
+        # (sample, phase, activity) quantities, then (sample, phase, indicator) impacts
+        activity_matrices = np.einsum(
+            "sc,cpa->spa", quantity_multipliers, components, optimize=True
+        )
+        list_tables.append(
+            lca_calculations.compute_impact_tables(
+                activity_matrices @ sampled_factors, factor_matrix.indicators
+            )
+        )
+
+    return np.concatenate(list_tables)
+
+
+def summarize_samples(tables, list_indicators, percentiles=(2.5, 50, 97.5)):
+    """Compute the percentiles of the sampled impact tables
+
+    Args:
+        tables (numpy.ndarray): sampled impact tables (see sample_impact_tables)
+        list_indicators (list): name of the indicators
+        percentiles (tuple, optional): percentiles to compute. Defaults to (2.5, 50, 97.5).
+
+    Returns:
+        pandas.DataFrame: with a (percentile, row) multi-index and the columns of the impact table
+            of the dashboard, e.g. df.loc[97.5] is the table of the 97.5th percentiles
+    """
+    import pandas as pd
+
+    values = np.percentile(tables, percentiles, axis=0)
+
+    return pd.DataFrame(
+        values.reshape(-1, values.shape[-1]),
+        index=pd.MultiIndex.from_product(
+            [list(percentiles), lca_calculations.list_impact_table_rows],
+            names=["percentile", "row"],
+        ),
+        columns=list_indicators + lca_calculations.list_impact_table_extra_columns,
+    )
+
+
+def compute_uncertainty(
+    dict_data_customers,
+    df_database,
+    n_samples,
+    dict_factor_uncertainty=None,
+    dict_quantity_uncertainty=None,
+    percentiles=(2.5, 50, 97.5),
+    chunk_size=10000,
+    seed=None,
+):
+    """Compute the percentiles of the impact table with a Monte Carlo simulation
+
+    See sample_impact_tables and summarize_samples for the arguments.
+
+    Returns:
+        pandas.DataFrame: percentiles, with a (percentile, row) multi-index
+    """
+    factor_matrix = lca_calculations.build_factor_matrix(df_database)
+    tables = sample_impact_tables(
+        dict_data_customers,
+        factor_matrix,
+        n_samples,
+        dict_factor_uncertainty,
+        dict_quantity_uncertainty,
+        chunk_size,
+        seed,
+    )
+
+    return summarize_samples(tables, factor_matrix.indicators, percentiles)
@@ -0,0 +1,271 @@
+"""Time-resolved use phase, with an electricity mix that changes over the lifetime of the product
+
+lca_calculations multiplies the electricity of the whole use phase by the factors of the current
+electricity mix of the country. Here, each country has a trajectory of its mix over the years of use
+(one step per year, or several steps per year, e.g. 8760 for hourly data), which is integrated
+against the usage profile of the product within a year. The trajectories are compiled once into
+cumulative yearly factors, so that the use phase of any number of products is a couple of array
+lookups, whatever the resolution of the trajectories.
+
+Examples:
+    trajectories = lca_use_phase.read_electricity_trajectories("trajectories.csv")
+    compiled_trajectories = lca_use_phase.compile_trajectories(trajectories, factor_matrix)
+    df_impacts = lca_use_phase.compute_impact_tables_batch(
+        list_dict_data_customers, factor_matrix, compiled_trajectories
+    )
+"""
+
+import collections
+
+import numpy as np
+
+import lca_calculations
+
+# column of the multipliers of the current electricity mix, in the trajectory tables
+multiplier_column = "Multiplier"
+
+ElectricityTrajectories = collections.namedtuple(
+    "ElectricityTrajectories", ["trajectories", "steps_per_year", "indicators"]
+)
+
+CompiledTrajectories = collections.namedtuple(
+    "CompiledTrajectories", ["countries", "yearly_factors", "cumulative_factors"]
+)
+
+
+def read_electricity_trajectories(trajectory_file_path, start_year=None):
+    """Read the trajectories of the electricity mixes from a csv file
+
+    The table has one row per step, with the columns "Country", "Year", optionally "Step" (e.g.
+    the hour of the year, when there are several steps per year) and either:
+        - "Multiplier": multiplier of the current factors of the electricity mix of the country
+        - one column per indicator: factors of one kWh of the electricity mix
+
+    Args:
+        trajectory_file_path (str): path to the csv file
+        start_year (int, optional): first year of use of the products, the previous years are
+            dropped. Defaults to the first year of each country.
+
+    Returns:
+        ElectricityTrajectories: namedtuple with:
+            - trajectories (dict): {country: numpy.ndarray of shape (n_steps,) for multipliers, or
+              (n_steps, n_indicators) for factors}, starting with the first year of use
+            - steps_per_year (int): number of steps per year
+            - indicators (list): name of the indicators, None for multipliers
+    """
+    import pandas as pd
+
+    df_trajectories = pd.read_csv(trajectory_file_path)
+    list_index_columns = [
+        i for i in ["Country", "Year", "Step"] if i in df_trajectories.columns
+    ]
+    if start_year is not None:
+        df_trajectories = df_trajectories[df_trajectories["Year"] >= start_year]
+    df_trajectories = df_trajectories.sort_values(list_index_columns)
+
+    if multiplier_column in df_trajectories.columns:
+        list_value_columns = [multiplier_column]
+        indicators = None
+    else:
+        list_value_columns = [
+            i for i in df_trajectories.columns if i not in list_index_columns
+        ]
+        indicators = list_value_columns
+
+    steps_per_year = 1
+    if "Step" in df_trajectories.columns:
+        steps_per_year = int(df_trajectories.groupby(["Country", "Year"]).size().max())
+
+    trajectories = {}
+    for country, df_country in df_trajectories.groupby("Country", sort=False):
+        n_steps_per_year = df_country.groupby("Year").size()
+        if (n_steps_per_year != steps_per_year).any():
+            raise ValueError(
+                f"Every year of {country} must have {steps_per_year} steps in "
+                f"{trajectory_file_path}"
+            )
+        values = df_country[list_value_columns].to_numpy(dtype=float)
+        trajectories[country] = values[:, 0] if indicators is None else values
+
+    return ElectricityTrajectories(trajectories, steps_per_year, indicators)
+
+
+def read_usage_profile(usage_profile_file_path):
+    """Read the usage profile (column "Share", one row per step of a year) from a csv file"""
+    import pandas as pd
+
+    return pd.read_csv(usage_profile_file_path)["Share"].to_numpy(dtype=float)
+
+
+def compile_trajectories(electricity_trajectories, factor_matrix, usage_profile=None):
+    """Integrate the trajectories against the usage profile, into yearly and cumulative factors
+
+    Args:
+        electricity_trajectories (ElectricityTrajectories): see read_electricity_trajectories
+        factor_matrix (FactorMatrix): factor matrix built with lca_calculations.build_factor_matrix
+        usage_profile (numpy.ndarray, optional): share of the use of a year in each step, of
+            shape (steps_per_year,). Defaults to a uniform use.
+
+    Returns:
+        CompiledTrajectories: namedtuple with:
+            - countries (dict): {country: index in the arrays}
+            - yearly_factors (numpy.ndarray): factors of one kWh used during each year of use, of
+              shape (n_countries, n_years, n_indicators), the years after the end of a trajectory
+              repeating its last year
+            - cumulative_factors (numpy.ndarray): factors of one kWh per year used during the
+              first years of use, of shape (n_countries, n_years + 1, n_indicators)
+    """
+    trajectories, steps_per_year, indicators = electricity_trajectories
+    if indicators is not None and list(indicators) != list(factor_matrix.indicators):
+        raise KeyError(
+            f"The indicators of the trajectories {indicators} must be the indicators of the "
+            f"database {factor_matrix.indicators}"
+        )
+
+    if usage_profile is None:
+        usage_profile = np.ones(steps_per_year)
+    usage_profile = np.asarray(usage_profile, dtype=float)
+    if usage_profile.shape != (steps_per_year,):
+        raise ValueError(
+            f"The usage profile must have {steps_per_year} steps, not {len(usage_profile)}"
+        )
+    usage_profile = usage_profile / usage_profile.sum()
+
+    list_yearly_factors = []
+    for country, trajectory in trajectories.items():
+        n_years = len(trajectory) // steps_per_year
+        if indicators is None:
+            # weighted multiplier of each year, applied to the current mix of the country
+            electricity_alias = lca_calculations.get_electricity_alias(country)
+            if electricity_alias not in factor_matrix.activities:
+                raise KeyError(f"Missing from the databases: {electricity_alias}")
+            current_factors = factor_matrix.matrix[
+                factor_matrix.activities[electricity_alias]
+            ]
+            yearly_multipliers = (
+                trajectory.reshape(n_years, steps_per_year) @ usage_profile
+            )
+            list_yearly_factors.append(yearly_multipliers[:, None] * current_factors)
+        else:
+            list_yearly_factors.append(
+                np.einsum(
+                    "ysi,s->yi",
+                    trajectory.reshape(n_years, steps_per_year, -1),
+                    usage_profile,
+                )
+            )
+
+    n_years = max((len(i) for i in list_yearly_factors), default=1)
+    yearly_factors = np.zeros(
+        (len(list_yearly_factors), n_years, len(factor_matrix.indicators))
+    )
+    for i, country_yearly_factors in enumerate(list_yearly_factors):
+        yearly_factors[i, : len(country_yearly_factors)] = country_yearly_factors
+        yearly_factors[i, len(country_yearly_factors) :] = country_yearly_factors[-1]
+
+    cumulative_factors = np.zeros(
+        (len(list_yearly_factors), n_years + 1, len(factor_matrix.indicators))
+    )
+    np.cumsum(yearly_factors, axis=1, out=cumulative_factors[:, 1:])
+
+    return CompiledTrajectories(
+        {country: i for i, country in enumerate(trajectories.keys())},
+        yearly_factors,
+        cumulative_factors,
+    )
+
+
+def compute_use_phase_impacts(list_dict_data_customers, compiled_trajectories):
+    """Compute the impact of the use phase of many products, with the time-resolved mixes
+
+    The electricity of a year of use is the same every year (see
+    lca_calculations.compute_use_phase_electricity), and is multiplied by the factors of the mix
+    of that year. A last partial year of use counts with the factors of its year, and the years
+    after the end of the trajectory with the factors of its last year.
+
+    Args:
+        list_dict_data_customers (list): list of dicts with the data from the customers
+        compiled_trajectories (CompiledTrajectories): see compile_trajectories
+
+    Returns:
+        numpy.ndarray: impacts of shape (n_scenarios, n_indicators)
+    """
+    countries, yearly_factors, cumulative_factors = compiled_trajectories
+    list_usages = [
+        dict_data_customers["Usage"] for dict_data_customers in list_dict_data_customers
+    ]
+    list_countries = [usage["Lieu d'utilisation"] for usage in list_usages]
+    list_missing = sorted(set(list_countries).difference(countries))
+    if list_missing:
+        raise KeyError(
+            f"Missing from the electricity trajectories: {', '.join(list_missing)}"
+        )
+
+    country_ids = np.array([countries[i] for i in list_countries], dtype=int)
+    lifetimes = np.array(
+        [usage["Duree de vie (annees)"] for usage in list_usages], dtype=float
+    )
+    # electricity of a year of use (see lca_calculations.compute_use_phase_electricity)
+    yearly_electricity = (
+        np.array(
+            [
+                usage["Nombre de cycles par an"]
+                * usage["Puisance (W)"]
+                * usage["Duree de cycle (min)"]
+                for usage in list_usages
+            ],
+            dtype=float,
+        )
+        / 60  # convert minutes to hours
+        / 1000  # convert W to kW
+    )
+
+    # complete years of use within the trajectory, then the rest at the factors of its year
+    n_years = yearly_factors.shape[1]
+    full_years = np.minimum(np.floor(lifetimes), n_years).astype(int)
+    factors = (
+        cumulative_factors[country_ids, full_years]
+        + (lifetimes - full_years)[:, None]
+        * yearly_factors[country_ids, np.minimum(full_years, n_years - 1)]
+    )
+
+    return yearly_electricity[:, None] * factors
+
+
+def compute_impacts_batch(
+    data_customers, df_database, compiled_trajectories, list_scenario_names=None
+):
+    """Same as lca_calculations.compute_impacts_batch, with the time-resolved use phase"""
+    import pandas as pd
+
+    if isinstance(data_customers, pd.DataFrame):
+        if list_scenario_names is None:
+            list_scenario_names = list(data_customers.index)
+        data_customers = data_customers.to_dict("records")
+
+    df_impacts = lca_calculations.compute_impacts_batch(
+        data_customers, df_database, list_scenario_names
+    )
+    impact_matrices = df_impacts.to_numpy(copy=True).reshape(
+        len(data_customers), len(lca_calculations.list_phases), -1
+    )
+    impact_matrices[:, lca_calculations.list_phases.index("Use phase")] = (
+        compute_use_phase_impacts(data_customers, compiled_trajectories)
+    )
+
+    return pd.DataFrame(
+        impact_matrices.reshape(len(df_impacts), -1),
+        index=df_impacts.index,
+        columns=df_impacts.columns,
+    )
+
+
+def compute_impact_tables_batch(
+    data_customers, df_database, compiled_trajectories, list_scenario_names=None
+):
+    """Same as lca_calculations.compute_impact_tables_batch, with the time-resolved use phase"""
+    return lca_calculations.build_impact_tables_batch(
+        compute_impacts_batch(
+            data_customers, df_database, compiled_trajectories, list_scenario_names
+        )
+    )
@@ -1,10 +1,15 @@
 import streamlit as st
-import pandas as pd
 import json
+import os
+import time
 from pathlib import Path
-import altair as alt
 
 import lca_calculations
+import lca_database
+import lca_incremental
+import lca_instrumentation
+import lca_result_cache
+import lca_uncertainty
 
 # set the page config (here the title, the tab icon and the layout)
 st.set_page_config(
@@ -15,39 +20,62 @@ st.set_page_config(
     menu_items=None,
 )
 
+# time spent in each stage and cache hit rates, shared by all the sessions (see the debug panel)
+instrumentation = lca_instrumentation.instrumentation
+rerun_start = time.perf_counter()
+
+# fast-start mode (e.g. for serverless deployments, where the cold start dominates): the charts are
+# hidden until they are selected in the sidebar, so the first render does not import altair
+fast_start = os.environ.get("LCA_FAST_START", "") not in ("", "0")
+
 data_folder = Path("data/")
-data_file_path = data_folder / "Holis - Technical test.xlsx"
+# the factor database (excel workbook, or .csv/.parquet table of a whole LCI library) and the
+# aliases of its activities (see lca_database.read_alias_table) can be replaced without code edits
+data_file_path = os.environ.get("LCA_DATABASE", data_folder / "Holis - Technical test.xlsx")
+alias_file_path = os.environ.get("LCA_ALIASES")
 
 # ======================== Read the data ========================
 # read the data from the customer (info on material, locations and quantities)
-with open(data_folder / "dict_data_customers.json", "r") as f:
-    dict_data_customers = json.load(f)
+with instrumentation.measure("dashboard: read customer data"):
+    with open(data_folder / "dict_data_customers.json", "r") as f:
+        dict_data_customers = json.load(f)
 
 
 # read the data from the database (info on transportation, distances, etc.)
-@st.cache_data  # cache the data, so that it is not reloaded each time the user changes a parameter
-def read_database_sheet():
-    df = pd.read_excel(data_file_path, sheet_name="Database", header=3, index_col=0)
+# the factor database is memory-mapped from a snapshot of the excel file: all the worker processes
+# share the same read-only pages, and it is reloaded when the workbook changes
+@st.cache_resource
+def get_shared_database():
+    return lca_database.SharedFactorDatabase(
+        data_file_path, alias_file_path=alias_file_path
+    )
+
+
+with instrumentation.measure("dashboard: read database"):
+    factor_matrix, database_version = get_shared_database().get()
+
+
+# the calculator is shared between the sessions: when a parameter changes, only the phases
+# depending on it are recomputed
+@st.cache_resource(max_entries=2)
+def get_impact_calculator(database_version, _factor_matrix):
+    return lca_incremental.IncrementalImpactCalculator(_factor_matrix)
 
-    # remove white spaces at the end and the beginning of the index
-    df.index = df.index.str.strip()
 
-    # rename the index of the database to match the name of the material in the customer data
-    dict_link_database_to_customer_data = {
-        "Plaque de polystyrène, (PS), RER": "Plaque de PPMA",
-        "Acier inoxydable, rouleaux, laminés à froid": "Acier",
-        "Mix cuivre (99,999% issu de l'électrolyse)": "Fil de cuivre",
-        "Transport maritime par porte-conteneurs  [tkm], GLO": "boat",
-        "Transport ferroviaire , GLO défaut": "train",
-        "Transport en camion [tkm], GLO": "truck",
-        "Transport aérien moyen-courrier  [tkm], GLO": "plane",
-    }
-    df.rename(index=dict_link_database_to_customer_data, inplace=True)
+impact_calculator = get_impact_calculator(database_version, factor_matrix)
 
-    return df
+
+# the results of the whole pipeline (impact table and charts) are cached by the content of the
+# customer data and the version of the database: they are shared between the sessions, and between
+# the processes and the restarts through the disk tier
+@st.cache_resource
+def get_result_cache():
+    return lca_result_cache.ResultCache(
+        max_entries=1024, disk_folder=data_folder / ".cache" / "results"
+    )
 
 
-df_database = read_database_sheet()
+result_cache = get_result_cache()
 
 # ======================== Get the parameters from dashboard ========================
 st.sidebar.header("Product Parameters")
@@ -121,77 +149,97 @@ for i in range(len(dict_data_customers["Materiaux"])):
         ),
     )
 
-st.sidebar.caption("Made in collaboration with :link:[Holis](https://holis.earth/) 🌟")
-
-
-# ======================== Compute the impacts ========================
-# compute all the impacts
-impact_material = lca_calculations.compute_material_impact(
-    dict_data_customers, df_database
-)
-impact_processing = lca_calculations.compute_impact_processing(
-    dict_data_customers, df_database
+st.sidebar.header("Uncertainty Parameters")
+uncertainty_analysis = st.sidebar.checkbox(
+    ":game_die: Monte Carlo uncertainty",
+    value=False,
+    help="Propagate the uncertainty of the emission factors, of the masses of the materials, \
+        of the number of cycles per year and of the power, and display 95% confidence intervals.",
 )
-impact_use_phase = lca_calculations.compute_impact_use_phase(
-    dict_data_customers, df_database
+n_samples = st.sidebar.select_slider(
+    "Number of samples",
+    options=[1000, 10000, 100000],
+    value=10000,
+    disabled=not uncertainty_analysis,
 )
-impact_transportation = lca_calculations.compute_impact_transportation(
-    dict_data_customers, df_database
-)
-# sum the impact of the different materials (so that it has the same structure as the other impacts)
-impact_material_summed = {
-    i: sum([impact_material[j][i] for j in impact_material.keys()])
-    for i in impact_material["Plaque de PPMA"].keys()
-}
 
-# create a dataframe with all the impacts
-df_impact = pd.DataFrame.from_dict(
-    impact_material_summed, orient="index", columns=["Material"]
-)
-df_impact["Processing"] = impact_processing
-df_impact["Use phase"] = impact_use_phase
-df_impact["Transportation"] = impact_transportation
-df_impact = df_impact.T
-
-# add sum per category in the last row
-df_impact.loc["Total per category"] = df_impact.sum()
-
-# convert the different impacts to micropoints, to be able to compare them
-conversion_to_micropoints = {
-    "kg eq. CO2": 28.6,
-    "eq. kBq U235": 12.73,
-    "kg eq. Sb": 1395510,
-}
-# Add a row to convert the total of each category of impact to micropoints
-df_impact.loc["Total per category (micropoints)"] = [
-    df_impact.loc["Total per category", i] * conversion_to_micropoints[i]
-    for i in conversion_to_micropoints.keys()
-]
-
-# Add a column with the sum of the impacts, per phase, in micropoints
-df_impact["Total per phase (micropoints)"] = (
-    df_impact["kg eq. CO2"] * conversion_to_micropoints["kg eq. CO2"]
+st.sidebar.header("Display")
+list_charts = ["Impact per category", "Impact per phase", "What drives the impact?"]
+list_visible_charts = st.sidebar.multiselect(
+    ":bar_chart: Charts",
+    list_charts,
+    default=[] if fast_start else list_charts,
+    help="Only the selected charts are computed and built.",
 )
-df_impact["Total per phase (micropoints)"] += (
-    df_impact["eq. kBq U235"] * conversion_to_micropoints["eq. kBq U235"]
-)
-df_impact["Total per phase (micropoints)"] += (
-    df_impact["kg eq. Sb"] * conversion_to_micropoints["kg eq. Sb"]
+debug_panel = st.sidebar.checkbox(
+    ":stopwatch: Debug panel",
+    value=False,
+    help="Display the time spent in each stage of the calculations and the hit rates of the \
+        caches, since the start of the server.",
 )
 
-# Add a row with the percentage impact of each category
-df_impact.loc["Distribution per indicator (%)"] = (
-    df_impact.loc["Total per category (micropoints)", :]
-    / df_impact.loc["Total per category", "Total per phase (micropoints)"]
-    * 100
+st.sidebar.caption("Made in collaboration with :link:[Holis](https://holis.earth/) 🌟")
+
+
+# ======================== Compute the impacts ========================
+# the activities missing from the database are reported at once (the materials would count as 0)
+dict_missing_activities = lca_calculations.find_missing_activities(
+    [dict_data_customers], factor_matrix
 )
+if any(dict_missing_activities.values()):
+    st.warning(
+        "Missing from the databases (the missing materials count as 0): "
+        + "; ".join(
+            f"{kind}: {', '.join(list_missing)}"
+            for kind, list_missing in dict_missing_activities.items()
+            if list_missing
+        )
+    )
 
-# add a column with the percentage of the impact of each phase
-df_impact["Distribution per phase (%)"] = (
-    df_impact["Total per phase (micropoints)"]
-    / df_impact.loc["Total per category", "Total per phase (micropoints)"]
-    * 100
+list_unconverted_indicators = lca_calculations.find_unconverted_indicators(
+    factor_matrix.indicators
 )
+if list_unconverted_indicators:
+    st.info(
+        "No conversion to micropoints for "
+        + ", ".join(list_unconverted_indicators)
+        + ": they count as 0 micropoints."
+    )
+
+# compute all the impacts (one row per phase, one column per impact indicator), then add the totals
+# per category and per phase, in micropoints to be able to compare them, and their distribution
+# (the tornado chart is computed separately, only when it is displayed)
+cache_key = lca_result_cache.compute_cache_key(dict_data_customers, database_version)
+with instrumentation.measure("dashboard: compute results"):
+    dict_results = result_cache.get_or_compute(
+        cache_key,
+        lca_result_cache.compute_dashboard_results,
+        dict_data_customers,
+        factor_matrix,
+        impact_calculator,
+        include_tornado=False,
+    )
+df_impact = dict_results["df_impact"]
+
+
+# percentiles of the impact table, from a Monte Carlo simulation (vectorized over the samples)
+@st.cache_data(max_entries=100)
+def compute_uncertainty(dict_data_customers, n_samples, database_version):
+    # only run on a miss of st.cache_data
+    instrumentation.record_cache_miss("st.cache_data: compute_uncertainty")
+    return lca_uncertainty.compute_uncertainty(
+        dict_data_customers, factor_matrix, n_samples, seed=0
+    )
+
+
+if uncertainty_analysis:
+    instrumentation.record_cache_call("st.cache_data: compute_uncertainty")
+    with instrumentation.measure("dashboard: uncertainty"):
+        df_uncertainty = compute_uncertainty(
+            dict_data_customers, n_samples, database_version
+        )
+    df_impact_low = df_uncertainty.loc[2.5]
+    df_impact_high = df_uncertainty.loc[97.5]
 
 # ======================== Display the results ========================
 # Display a first section with information about the app
@@ -222,88 +270,156 @@ st.markdown(f"The total impact of this product is :orange[{total_micropoints} µ
 st.markdown(
     f":factory: This corresponds to :orange[{(total_micropoints / 1000000 * 100).round(1)} %] of the impact of an average European citizen per year."
 )
+if uncertainty_analysis:
+    st.markdown(
+        f":game_die: With 95% confidence, the total impact is between \
+            :orange[{int(df_impact_low.loc['Total per category', 'Total per phase (micropoints)'])} µPt] \
+            and :orange[{int(df_impact_high.loc['Total per category', 'Total per phase (micropoints)'])} µPt] \
+            ({n_samples} Monte Carlo samples)."
+    )
+
+# altair is only imported when a chart is displayed (its import is a large part of the start)
+if list_visible_charts:
+    import lca_charts
 
 # create columns to display the pie charts
 col1, col2, col3 = st.columns([9, 1, 10])
 
 # display a pie chart for the percentage of the impact of each category (using altair)
-chart_width = 500
-chart_height = 400
-with col1:
-    st.subheader(
-        "Impact per category",
-        help="More info on the different impacts can be found :link:[here](https://ecochain.com/blog/impact-categories-lca/). \
-                 The impacts are expressed in micropoints (µPt) to be able to compare them.",
-    )
-    st.markdown(
-        "Impact of the product divided into 3 categories: \
-                \n - :cloud: **Climate change impact** (indicator of potential global warming due \
-                    to emissions of greenhouse gases to the air), expressed in kg CO~2 equivalent. \
-                \n - :radioactive_sign: **Ionising radiations impact** (damage to human health and ecosystems), \
-                    expressed in kBq U235 equivalent. \
-                \n - :rock: **Depletion of abiotic resources** (indicator of the depletion of natural ressources), \
-                expressed in kg Sb equivalent."
-    )
-
-    distribution_per_indicator = (
-        df_impact.loc[["Total per category", "Distribution per indicator (%)"]][
-            [
-                i
-                for i in conversion_to_micropoints.keys()
-                if i
-                not in ["Total per phase (micropoints)", "Distribution per phase (%)"]
+if "Impact per category" in list_visible_charts:
+    with col1:
+        st.subheader(
+            "Impact per category",
+            help="More info on the different impacts can be found :link:[here](https://ecochain.com/blog/impact-categories-lca/). \
+                     The impacts are expressed in micropoints (µPt) to be able to compare them.",
+        )
+        st.markdown(
+            "Impact of the product divided into 3 categories: \
+                    \n - :cloud: **Climate change impact** (indicator of potential global warming due \
+                        to emissions of greenhouse gases to the air), expressed in kg CO~2 equivalent. \
+                    \n - :radioactive_sign: **Ionising radiations impact** (damage to human health and ecosystems), \
+                        expressed in kBq U235 equivalent. \
+                    \n - :rock: **Depletion of abiotic resources** (indicator of the depletion of natural ressources), \
+                    expressed in kg Sb equivalent."
+        )
+
+        # copy, as the cached results are shared between the sessions
+        distribution_per_indicator = dict_results["distribution_per_indicator"].copy()
+        interval_column = None
+        if uncertainty_analysis:
+            # 95% confidence interval of the distribution, displayed under the labels
+            interval_column = "95% interval (%)"
+            distribution_per_indicator[interval_column] = [
+                f"{df_impact_low.loc['Distribution per indicator (%)', i]:.1f} - "
+                f"{df_impact_high.loc['Distribution per indicator (%)', i]:.1f}"
+                for i in distribution_per_indicator.index
             ]
-        ]
-        .round(1)
-        .T
-    )
 
-    base = alt.Chart(distribution_per_indicator.reset_index()).encode(
-        alt.Theta("Distribution per indicator (%):Q").stack(True),
-        alt.Color("index:N").legend(None),
-        alt.Tooltip(
-            ["index:N", "Distribution per indicator (%):Q", "Total per category:Q"]
-        ),
-    )
+        with instrumentation.measure("chart: impact per category"):
+            st.altair_chart(
+                lca_charts.build_pie_chart_per_category(
+                    distribution_per_indicator, interval_column
+                ),
+                use_container_width=True,
+            )
+        st.caption(
+            "Hover over the chart to see the details. The line 'Total per category' \
+                   corresponds to the total impact of the product in each category and is \
+                   expressed in the unit under 'index'."
+        )
 
-    pie = base.mark_arc(outerRadius=100).properties(
-        width=chart_width, height=chart_height
-    )
-    text = base.mark_text(radius=160, size=20).encode(text="index:N")
+# display a pie chart for the percentage of the impact of each phase (using altair)
+if "Impact per phase" in list_visible_charts:
+    with col3:
+        st.subheader("Impact per phase")
+        st.markdown(
+            "Impact of the products during 4 phases: \
+                    \n - :hammer_and_wrench: **Material** impact, impact of the production of the different materials. \
+                    \n - :factory: **Processing** impact, impact of the assembly of the different materials \
+                        to make the final product. \
+                    \n - :house: **Use phase** impact, impact of the use of the product (electicity consumption here). \
+                    \n - :truck: **Transportation** impact, impact of the transportation of the materials to the \
+                        assembly site and of the final product to the customer."
+        )
+
+        distribution_per_phase = dict_results["distribution_per_phase"].copy()
+        interval_column = None
+        if uncertainty_analysis:
+            # 95% confidence interval of the distribution, displayed under the labels
+            interval_column = "95% interval (%)"
+            distribution_per_phase[interval_column] = [
+                f"{df_impact_low.loc[i, 'Distribution per phase (%)']:.1f} - "
+                f"{df_impact_high.loc[i, 'Distribution per phase (%)']:.1f}"
+                for i in distribution_per_phase["index"]
+            ]
 
-    st.altair_chart(pie + text, use_container_width=True)
-    st.caption(
-        "Hover over the chart to see the details. The line 'Total per category' \
-               corresponds to the total impact of the product in each category and is \
-               expressed in the unit under 'index'."
-    )
+        with instrumentation.measure("chart: impact per phase"):
+            st.altair_chart(
+                lca_charts.build_pie_chart_per_phase(
+                    distribution_per_phase, interval_column
+                ),
+                use_container_width=True,
+            )
 
-# display a pie chart for the percentage of the impact of each phase (using altair)
-with col3:
-    st.subheader("Impact per phase")
-    st.markdown(
-        "Impact of the products during 4 phases: \
-                \n - :hammer_and_wrench: **Material** impact, impact of the production of the different materials. \
-                \n - :factory: **Processing** impact, impact of the assembly of the different materials \
-                    to make the final product. \
-                \n - :house: **Use phase** impact, impact of the use of the product (electicity consumption here). \
-                \n - :truck: **Transportation** impact, impact of the transportation of the materials to the \
-                    assembly site and of the final product to the customer."
-    )
+        st.caption(
+            "Note: End of life is a very important phase, that is however not included in this demo analysis."
+        )
 
-    distribution_per_phase = df_impact.iloc[:4]["Distribution per phase (%)"].round(1)
-    base = alt.Chart(distribution_per_phase.reset_index()).encode(
-        alt.Theta("Distribution per phase (%):Q").stack(True),
-        alt.Color("index:N").legend(None),
+# display a tornado chart with the effect of each input on the total impact (using altair)
+if "What drives the impact?" in list_visible_charts:
+    st.subheader(
+        "What drives the impact?",
+        help="All the phases are linear in their inputs, so the effect of each input is computed \
+            exactly (no rerun of the calculations).",
     )
-
-    pie = base.mark_arc(outerRadius=100).properties(
-        width=chart_width, height=chart_height
+    st.markdown(
+        "Change of the total impact (in micropoints) when each input of the calculation varies by \
+            :blue[+/- 10%]: the mass of each material, the electricity of the processing and of the use \
+            phase, and the distance done with each transportation mean (in tkm)."
     )
-    text = base.mark_text(radius=160, size=20).encode(text="index:N")
-
-    st.altair_chart(pie + text, use_container_width=True)
-
-    st.caption(
-        "Note: End of life is a very important phase, that is however not included in this demo analysis."
+    with instrumentation.measure("dashboard: compute tornado"):
+        df_tornado = result_cache.get_or_compute(
+            f"{cache_key}-tornado",
+            lca_result_cache.build_tornado,
+            dict_data_customers,
+            factor_matrix,
+        )
+
+    with instrumentation.measure("chart: tornado"):
+        st.altair_chart(
+            lca_charts.build_tornado_chart(df_tornado), use_container_width=True
+        )
+
+instrumentation.record_time("dashboard: rerun", time.perf_counter() - rerun_start)
+
+# machine-readable export of the measures recorded since the previous export, appended after
+# each rerun (e.g. to be collected from the production servers)
+if os.environ.get("LCA_INSTRUMENTATION_FILE"):
+    instrumentation.write_json_lines(os.environ["LCA_INSTRUMENTATION_FILE"])
+
+# ======================== Debug panel ========================
+if debug_panel:
+    st.header("Debug")
+    st.markdown(
+        "Time spent in each stage and hit rates of the caches, for all the sessions since the \
+            start of the server (the stages served from a cache are not timed)."
     )
+    df_stages, df_caches = instrumentation.to_dataframes()
+    st.dataframe(df_stages, use_container_width=True)
+    st.dataframe(df_caches, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "Download (JSON lines)",
+            instrumentation.to_json_lines(),
+            file_name="lca_instrumentation.jsonl",
+            mime="application/jsonl",
+        )
+    with col2:
+        st.download_button(
+            "Download (Prometheus)",
+            instrumentation.to_prometheus(),
+            file_name="lca_instrumentation.prom",
+            mime="text/plain",
+        )
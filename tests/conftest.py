@@ -0,0 +1,22 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import lca_database
+
+
+@pytest.fixture(scope="session")
+def data_folder():
+    return Path(__file__).parent.parent / "data"
+
+
+@pytest.fixture(scope="session")
+def df_database(data_folder):
+    return lca_database.read_database(data_folder / "Holis - Technical test.xlsx")
+
+
+@pytest.fixture
+def dict_data_customers(data_folder):
+    with open(data_folder / "dict_data_customers.json", "r") as f:
+        return json.load(f)
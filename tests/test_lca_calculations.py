@@ -0,0 +1,264 @@
+"""Regression tests pinning the impacts of the customer data of the repository to their baseline values
+
+The baseline values were computed with the first version of the dashboard (the per-phase functions of
+lca_calculations and the impact table built in main.py), from data/dict_data_customers.json and the
+bundled database.
+"""
+
+import copy
+
+import numpy as np
+import pytest
+
+import lca_calculations
+
+list_indicators = ["kg eq. CO2", "eq. kBq U235", "kg eq. Sb"]
+
+baseline_material_impact = {
+    "Plaque de PPMA": {
+        "kg eq. CO2": 12.804999999999998,
+        "eq. kBq U235": 0.0,
+        "kg eq. Sb": 1.2761666666666665e-06,
+    },
+    "Acier": {
+        "kg eq. CO2": 41.67455555555556,
+        "eq. kBq U235": -0.8672422222222222,
+        "kg eq. Sb": 0.0012707999999999999,
+    },
+    "Fil de cuivre": {
+        "kg eq. CO2": 4.435188888888889,
+        "eq. kBq U235": 3.0445444444444445,
+        "kg eq. Sb": 0.003673877777777778,
+    },
+    "PCB (circuits imprimes)": {"kg eq. CO2": 0, "eq. kBq U235": 0, "kg eq. Sb": 0},
+}
+
+baseline_tkm_transportation = {
+    "train": 0.0,
+    "truck": 26.37111111111111,
+    "plane": 0.0,
+    "boat": 85.45277777777778,
+}
+
+# rows lca_calculations.list_impact_table_rows, columns the indicators and
+# lca_calculations.list_impact_table_extra_columns
+baseline_impact_table = [
+    [
+        58.914744444444445,
+        2.177302222222222,
+        0.004945953944444444,
+        8614.806937411666,
+        33.12929409830757,
+    ],
+    [0.0813225, 3.23443, 4.85798e-08, 43.567910996698004, 0.16754573226595848],
+    [
+        31.22784,
+        1242.02112,
+        1.86546432e-05,
+        16730.077822732033,
+        64.33756119012806,
+    ],
+    [
+        20.72264421611111,
+        0.41788737945,
+        1.2291857028111112e-05,
+        615.1407403224756,
+        2.365598979298415,
+    ],
+    [
+        110.94655116055556,
+        1247.8507396016723,
+        0.004976949024472555,
+        26003.593411462873,
+        100.0,
+    ],
+    [
+        3173.0713631918893,
+        15885.13991512929,
+        6945.382133141695,
+        9692643188.292675,
+        37274245.274193436,
+    ],
+    [
+        12.20243415201662,
+        61.0882490884003,
+        26.70931675958308,
+        37274245.274193436,
+        143342.67070089726,
+    ],
+]
+
+
+def test_phase_functions_match_baseline(dict_data_customers, df_database):
+    dict_impact_material = lca_calculations.compute_material_impact(
+        dict_data_customers, df_database
+    )
+    assert list(dict_impact_material) == list(baseline_material_impact)
+    for material_name, dict_impacts in baseline_material_impact.items():
+        assert dict_impact_material[material_name] == pytest.approx(
+            dict_impacts, rel=1e-12
+        )
+
+    assert lca_calculations.compute_impact_processing(
+        dict_data_customers, df_database
+    ) == pytest.approx(
+        dict(zip(list_indicators, baseline_impact_table[1][:3])), rel=1e-12
+    )
+    assert lca_calculations.compute_impact_use_phase(
+        dict_data_customers, df_database
+    ) == pytest.approx(
+        dict(zip(list_indicators, baseline_impact_table[2][:3])), rel=1e-12
+    )
+    assert lca_calculations.compute_impact_transportation(
+        dict_data_customers, df_database
+    ) == pytest.approx(
+        dict(zip(list_indicators, baseline_impact_table[3][:3])), rel=1e-12
+    )
+    assert lca_calculations.compute_tkm_transportation(
+        dict_data_customers
+    ) == pytest.approx(baseline_tkm_transportation, rel=1e-12)
+
+
+def test_impact_table_matches_baseline(dict_data_customers, df_database):
+    df_impact = lca_calculations.build_impact_table(
+        lca_calculations.compute_phase_impacts(dict_data_customers, df_database)
+    )
+
+    assert list(df_impact.index) == lca_calculations.list_impact_table_rows
+    assert (
+        list(df_impact.columns)
+        == list_indicators + lca_calculations.list_impact_table_extra_columns
+    )
+    np.testing.assert_allclose(df_impact.to_numpy(), baseline_impact_table, rtol=1e-12)
+
+
+def test_impact_tables_batch_match_single_products(dict_data_customers, df_database):
+    dict_variant = copy.deepcopy(dict_data_customers)
+    dict_variant["Usage"]["Duree de vie (annees)"] = 1
+    dict_variant["Processing"]["Lieu d'assemblage"] = "Chine"
+    for trip in dict_variant["Moyen de transport"]:
+        dict_variant["Moyen de transport"][trip] = "plane"
+    dict_variant["Materiaux"] = lca_calculations.build_bill_of_materials(
+        dict_variant["Materiaux"]
+    )
+
+    df_tables = lca_calculations.compute_impact_tables_batch(
+        [dict_data_customers, dict_variant], df_database, ["baseline", "variant"]
+    )
+
+    np.testing.assert_allclose(
+        df_tables.loc["baseline"].to_numpy(), baseline_impact_table, rtol=1e-12
+    )
+    df_variant = lca_calculations.build_impact_table(
+        lca_calculations.compute_phase_impacts(dict_variant, df_database)
+    )
+    np.testing.assert_allclose(
+        df_tables.loc["variant"].to_numpy(), df_variant.to_numpy(), rtol=1e-12
+    )
+
+
+def test_indicators_without_conversion_count_as_zero_micropoints():
+    impact_matrices = np.arange(12, dtype=float).reshape(1, 4, 3)
+
+    tables = lca_calculations.compute_impact_tables(
+        impact_matrices, ["kg eq. CO2", "Water (m3)", "kg eq. Sb"]
+    )
+
+    np.testing.assert_allclose(tables[0, 4, :3], impact_matrices[0].sum(axis=0))
+    assert tables[0, 5, 1] == 0
+    np.testing.assert_allclose(
+        tables[0, 4, 3],
+        18 * 28.6 + 26 * lca_calculations.conversion_to_micropoints["kg eq. Sb"],
+    )
+
+
+def test_concatenated_bills_of_materials_match_the_chained_records(
+    dict_data_customers,
+):
+    dict_other = copy.deepcopy(dict_data_customers)
+    dict_other["Materiaux"] = [
+        {
+            "Nom": "Aluminium",
+            "Masse produit fini (kg)": 2,
+            "Lieu de production": "Taiwan",
+            "Masse utile (kg)": 2.5,
+        },
+        *dict_data_customers["Materiaux"][1:3],
+    ]
+    dict_other["Materiaux"] = lca_calculations.build_bill_of_materials(
+        dict_other["Materiaux"]
+    )
+    dict_empty = {**dict_data_customers, "Materiaux": []}
+    list_dict_data = [dict_data_customers, dict_empty, dict_other]
+
+    bill_of_materials, scenario_ids = lca_calculations.concatenate_bills_of_materials(
+        list_dict_data
+    )
+
+    list_records = dict_data_customers["Materiaux"] + (
+        lca_calculations.bill_of_materials_to_records(dict_other["Materiaux"])
+    )
+    assert lca_calculations.bill_of_materials_to_records(
+        bill_of_materials
+    ) == pytest.approx(list_records)
+    assert bill_of_materials.names == [
+        "Plaque de PPMA",
+        "Acier",
+        "Fil de cuivre",
+        "PCB (circuits imprimes)",
+        "Aluminium",
+    ]
+    assert bill_of_materials.countries == ["Chine", "France", "Taiwan"]
+    np.testing.assert_array_equal(scenario_ids, [0, 0, 0, 0, 2, 2, 2])
+
+
+def test_chained_aliases_are_resolved_to_their_activity():
+    dict_index = lca_calculations.build_activity_index(
+        ["Acier", "truck"], {"Steel": "Stahl", "Stahl": "Acier", "Lorry": "truck"}
+    )
+
+    assert dict_index == {"Acier": 0, "truck": 1, "Steel": 0, "Stahl": 0, "Lorry": 1}
+
+
+@pytest.mark.parametrize(
+    "dict_aliases, message",
+    [
+        (
+            {"A": "B", "B": "A"},
+            "A -> B \\(cyclic aliases\\); B -> A \\(cyclic aliases\\)",
+        ),
+        ({"Steel": "Iron"}, "Steel -> Iron \\(unknown activity\\)"),
+        ({"truck": "Acier"}, "truck -> Acier \\(already another activity\\)"),
+    ],
+)
+def test_invalid_aliases_are_all_reported(dict_aliases, message):
+    with pytest.raises(KeyError, match=message):
+        lca_calculations.build_activity_index(["Acier", "truck"], dict_aliases)
+
+
+def test_duplicated_activities_are_rejected():
+    with pytest.raises(KeyError, match="Duplicated activities .*: Acier, truck"):
+        lca_calculations.build_activity_index(
+            ["Acier", "truck", "boat", "truck", "Acier"]
+        )
+
+
+def test_unconverted_indicators_are_not_missing_activities(
+    dict_data_customers, df_database
+):
+    df_library = df_database.assign(**{"Water (m3)": 1.0})
+    factor_matrix = lca_calculations.build_factor_matrix(df_library)
+
+    dict_missing = lca_calculations.find_missing_activities(
+        [dict_data_customers], factor_matrix
+    )
+
+    assert dict_missing == {
+        "Material": ["PCB (circuits imprimes)"],
+        "Electricity": [],
+        "Transportation": [],
+        "Distance": [],
+    }
+    assert lca_calculations.find_unconverted_indicators(factor_matrix.indicators) == [
+        "Water (m3)"
+    ]
@@ -0,0 +1,95 @@
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import lca_calculations
+import lca_cli
+
+
+def test_the_results_match_the_dashboard(dict_data_customers, df_database, tmp_path):
+    input_path = tmp_path / "products.jsonl"
+    dict_variant = {**dict_data_customers, "Usage": {**dict_data_customers["Usage"]}}
+    dict_variant["Usage"]["Puisance (W)"] = 400
+    input_path.write_text(
+        "\n".join(json.dumps(i) for i in [dict_data_customers, dict_variant])
+    )
+    output_path = tmp_path / "results.csv"
+
+    lca_cli.main([str(input_path), "-o", str(output_path)])
+
+    df_results = pd.read_csv(output_path, index_col=[0, 1])
+    assert list(df_results.index.get_level_values(0).unique()) == [
+        "products:0",
+        "products:1",
+    ]
+    df_impact = lca_calculations.build_impact_table(
+        lca_calculations.compute_phase_impacts(dict_variant, df_database)
+    )
+    np.testing.assert_allclose(
+        df_results.loc["products:1"].to_numpy(), df_impact.to_numpy(), rtol=1e-9
+    )
+
+
+def test_an_invalid_product_exits_with_its_message(dict_data_customers, tmp_path):
+    dict_data_customers["Usage"]["Lieu d'utilisation"] = "Mars"
+    input_path = tmp_path / "product.json"
+    input_path.write_text(json.dumps(dict_data_customers))
+
+    with pytest.raises(SystemExit, match="^Error: Missing from the databases"):
+        lca_cli.main([str(input_path), "-o", str(tmp_path / "results.csv"), "--strict"])
+
+
+@pytest.mark.parametrize(
+    "error, message",
+    [(KeyError("missing"), "missing"), (KeyError(), ""), (ValueError(), "")],
+)
+def test_format_error(error, message):
+    assert lca_cli.format_error(error) == message
+
+
+def test_json_inputs_do_not_import_the_table_readers(data_folder, tmp_path):
+    code = (
+        "import sys, lca_cli\n"
+        f"list(lca_cli.read_customer_records([{str(data_folder / 'dict_data_customers.json')!r}]))\n"
+        "print('openpyxl' in sys.modules, 'lca_ingestion' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=data_folder.parent,
+    )
+
+    assert result.stdout.split() == ["False", "False"]
+
+
+def test_strict_accepts_indicators_without_conversion(
+    dict_data_customers, df_database, tmp_path, capsys
+):
+    # a library with an extra indicator, and all the materials of the product
+    database_path = tmp_path / "library.csv"
+    df_library = df_database.drop(columns="Unit").assign(**{"Water (m3)": 1.0})
+    df_library.loc["PCB (circuits imprimes)"] = 0.0
+    df_library.rename_axis("Activity").to_csv(database_path)
+    input_path = tmp_path / "product.json"
+    input_path.write_text(json.dumps(dict_data_customers))
+
+    lca_cli.main(
+        [
+            str(input_path),
+            "-o",
+            str(tmp_path / "results.csv"),
+            "--database",
+            str(database_path),
+            "--strict",
+            "--jobs",
+            "1",
+        ]
+    )
+
+    assert "Note: no conversion to micropoints" in capsys.readouterr().err
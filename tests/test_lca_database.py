@@ -0,0 +1,156 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import lca_database
+
+
+def fail_reading(data_file_path):
+    raise AssertionError(f"{data_file_path} should not be read")
+
+
+@pytest.fixture
+def workbook_path(data_folder, tmp_path):
+    workbook_path = tmp_path / "database.xlsx"
+    shutil.copy(data_folder / "Holis - Technical test.xlsx", workbook_path)
+    return workbook_path
+
+
+@pytest.fixture
+def table_path(tmp_path):
+    table_path = tmp_path / "library.csv"
+    pd.DataFrame(
+        {"kg eq. CO2": [1.0, 2.0], "eq. kBq U235": [3.0, 4.0]},
+        index=pd.Index(["Acier", "truck"], name="Activity"),
+    ).to_csv(table_path)
+    return table_path
+
+
+def test_the_snapshot_matches_the_workbook(workbook_path, df_database):
+    df = lca_database.load_database(workbook_path)
+
+    pd.testing.assert_frame_equal(df, df_database)
+    assert lca_database.get_metadata_path(workbook_path).exists()
+
+
+def test_the_snapshot_is_used_until_the_workbook_changes(workbook_path, monkeypatch):
+    dict_metadata = lca_database.publish_database(workbook_path)
+    monkeypatch.setitem(lca_database.dict_database_readers, ".xlsx", fail_reading)
+
+    # same workbook: the snapshot is used as is
+    assert lca_database.publish_database(workbook_path) == dict_metadata
+
+    # touched but identical workbook: only the metadata is updated
+    stat = os.stat(workbook_path)
+    os.utime(workbook_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    dict_new_metadata = lca_database.publish_database(workbook_path)
+    assert dict_new_metadata["sha256"] == dict_metadata["sha256"]
+    assert dict_new_metadata["mtime_ns"] == stat.st_mtime_ns + 10**9
+
+
+def test_a_new_snapshot_is_written_when_the_content_changes(table_path):
+    df = lca_database.load_database(table_path)
+    dict_metadata = lca_database.publish_database(table_path)
+    assert df.loc["Acier", "kg eq. CO2"] == 1
+
+    df_changed = pd.read_csv(table_path, index_col=0)
+    df_changed.loc["Acier", "kg eq. CO2"] = 10
+    df_changed.to_csv(table_path)
+    df = lca_database.load_database(table_path)
+
+    assert df.loc["Acier", "kg eq. CO2"] == 10
+    dict_new_metadata = lca_database.publish_database(table_path)
+    assert dict_new_metadata["sha256"] != dict_metadata["sha256"]
+    assert dict_new_metadata["values_file"] != dict_metadata["values_file"]
+
+
+def test_an_outdated_snapshot_format_is_rewritten(table_path, monkeypatch):
+    lca_database.publish_database(table_path)
+    monkeypatch.setattr(
+        lca_database, "snapshot_version", lca_database.snapshot_version + 1
+    )
+
+    dict_metadata = lca_database.publish_database(table_path)
+
+    assert dict_metadata["snapshot_version"] == lca_database.snapshot_version
+    np.testing.assert_array_equal(
+        lca_database.read_database_snapshot(
+            lca_database.get_metadata_path(table_path), dict_metadata
+        ).to_numpy(),
+        [[1.0, 3.0], [2.0, 4.0]],
+    )
+
+
+def change_table(table_path, value):
+    df = pd.read_csv(table_path, index_col=0)
+    df.loc["Acier", "kg eq. CO2"] = value
+    df.to_csv(table_path)
+
+
+def test_the_values_of_the_previous_version_are_kept(table_path):
+    list_values_files = []
+    for value in [10, 20, 30]:
+        change_table(table_path, value)
+        list_values_files.append(
+            lca_database.publish_database(table_path)["values_file"]
+        )
+
+    snapshot_folder = lca_database.get_snapshot_folder(table_path)
+    assert sorted(i.name for i in snapshot_folder.glob("*.npy")) == sorted(
+        list_values_files[1:]
+    )
+
+
+def test_a_reader_with_an_outdated_metadata_reads_it_again(table_path, monkeypatch):
+    dict_outdated_metadata = lca_database.publish_database(table_path)
+    change_table(table_path, 10)
+    lca_database.publish_database(table_path)
+    change_table(table_path, 20)
+    lca_database.publish_database(table_path)
+
+    # the first publication returns the metadata read before the two new versions
+    publish_database = lca_database.publish_database
+    list_results = [dict_outdated_metadata]
+    monkeypatch.setattr(
+        lca_database,
+        "publish_database",
+        lambda *args: list_results.pop() if list_results else publish_database(*args),
+    )
+    factor_matrix, _ = lca_database.SharedFactorDatabase(table_path).get()
+
+    assert factor_matrix.matrix[factor_matrix.activities["Acier"], 0] == 20
+
+
+def test_the_factor_matrix_is_built_in_memory_without_a_writable_snapshot(
+    table_path, tmp_path
+):
+    (tmp_path / "file").write_text("")
+    shared_database = lca_database.SharedFactorDatabase(
+        table_path, snapshot_folder=tmp_path / "file" / "snapshot"
+    )
+
+    with pytest.warns(UserWarning, match="could not use the snapshot"):
+        factor_matrix, version = shared_database.get()
+
+    np.testing.assert_array_equal(factor_matrix.matrix, [[1.0, 3.0], [2.0, 4.0]])
+    assert version == lca_database.hash_file(table_path)
+
+
+def test_the_aliases_are_reloaded_when_their_file_changes(table_path, tmp_path):
+    alias_file_path = tmp_path / "aliases.csv"
+    alias_file_path.write_text("Alias,Activity\nSteel,Acier\n")
+    shared_database = lca_database.SharedFactorDatabase(
+        table_path, alias_file_path=alias_file_path
+    )
+    factor_matrix, version = shared_database.get()
+    assert factor_matrix.activities["Steel"] == factor_matrix.activities["Acier"]
+
+    alias_file_path.write_text("Alias,Activity\nSteel,Acier\nLorry,truck\n")
+    new_factor_matrix, new_version = shared_database.get()
+
+    assert new_factor_matrix.activities["Lorry"] == factor_matrix.activities["truck"]
+    assert new_factor_matrix.matrix is factor_matrix.matrix
+    assert new_version != version
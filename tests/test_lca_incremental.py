@@ -0,0 +1,74 @@
+import numpy as np
+
+import lca_calculations
+import lca_incremental
+
+
+def test_results_match_the_full_computation(dict_data_customers, df_database):
+    calculator = lca_incremental.IncrementalImpactCalculator(df_database)
+
+    df_impacts = calculator.compute_phase_impacts(dict_data_customers)
+
+    df_reference = lca_calculations.compute_phase_impacts(
+        dict_data_customers, df_database
+    )
+    np.testing.assert_allclose(
+        df_impacts.to_numpy(), df_reference.to_numpy(), rtol=1e-12
+    )
+    assert list(df_impacts.index) == list(df_reference.index)
+
+
+def test_only_the_phases_reading_a_changed_field_are_recomputed(
+    dict_data_customers, df_database
+):
+    calculator = lca_incremental.IncrementalImpactCalculator(df_database)
+    calculator.compute_phase_impacts(dict_data_customers)
+    assert calculator.dict_n_computations == {
+        "Material": 1,
+        "Processing": 1,
+        "Use phase": 1,
+        "Transportation": 1,
+    }
+
+    # same inputs: everything is served from the caches
+    calculator.compute_phase_impacts(dict_data_customers)
+    assert sum(calculator.dict_n_computations.values()) == 4
+
+    dict_data_customers["Usage"]["Puisance (W)"] = 400
+    df_impacts = calculator.compute_phase_impacts(dict_data_customers)
+    assert calculator.dict_n_computations["Use phase"] == 2
+    assert sum(calculator.dict_n_computations.values()) == 5
+
+    # the assembly location is read by the processing and the transportation
+    dict_data_customers["Processing"]["Lieu d'assemblage"] = "Chine"
+    df_impacts = calculator.compute_phase_impacts(dict_data_customers)
+    assert calculator.dict_n_computations == {
+        "Material": 1,
+        "Processing": 2,
+        "Use phase": 2,
+        "Transportation": 2,
+    }
+    np.testing.assert_allclose(
+        df_impacts.to_numpy(),
+        lca_calculations.compute_phase_impacts(
+            dict_data_customers, df_database
+        ).to_numpy(),
+        rtol=1e-12,
+    )
+
+    # back to a previous use phase: served from the cache
+    dict_data_customers["Usage"]["Puisance (W)"] = 800
+    calculator.compute_phase_impacts(dict_data_customers)
+    assert calculator.dict_n_computations["Use phase"] == 2
+
+
+def test_the_least_recently_used_results_are_evicted(dict_data_customers, df_database):
+    calculator = lca_incremental.IncrementalImpactCalculator(
+        df_database, max_entries_per_phase=2
+    )
+    for power in [100, 200, 300, 100]:
+        dict_data_customers["Usage"]["Puisance (W)"] = power
+        calculator.compute_phase_impact(dict_data_customers, "Use phase")
+
+    assert calculator.dict_n_computations["Use phase"] == 4
+    assert len(calculator.dict_caches["Use phase"]) == 2
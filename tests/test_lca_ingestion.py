@@ -0,0 +1,110 @@
+import pandas as pd
+import pytest
+
+import lca_ingestion
+
+
+def build_row(product_id, material_name, **dict_values):
+    return {
+        "Produit": product_id,
+        "Duree de vie (annees)": 8,
+        "Nombre de cycles par an": 1200,
+        "Duree de cycle (min)": 3,
+        "Puisance (W)": 800,
+        "Lieu d'utilisation": "France",
+        "Lieu d'assemblage": "France",
+        "Pertes (%)": 10,
+        "Consommation d'energie (kWh)": 1,
+        "Moyen de transport": "boat",
+        "Nom": material_name,
+        "Masse produit fini (kg)": 9,
+        "Lieu de production": "Chine",
+        "Masse utile (kg)": 10,
+        **dict_values,
+    }
+
+
+def write_csv(tmp_path, list_rows):
+    input_path = tmp_path / "products.csv"
+    pd.DataFrame(list_rows).to_csv(input_path, index=False)
+    return input_path
+
+
+def test_the_consecutive_rows_of_a_product_are_grouped(tmp_path):
+    input_path = write_csv(
+        tmp_path,
+        [
+            build_row("A", "Acier"),
+            build_row("A", "Fil de cuivre", **{"Masse utile (kg)": None}),
+            build_row(
+                "B", "Acier", **{"Moyen de transport": '{"France - Chine": "plane"}'}
+            ),
+        ],
+    )
+
+    list_products = list(lca_ingestion.read_table_records(input_path, chunk_size=1))
+
+    assert [product_id for product_id, _ in list_products] == ["A", "B"]
+    dict_a, dict_b = (dict_data for _, dict_data in list_products)
+    assert [i["Nom"] for i in dict_a["Materiaux"]] == ["Acier", "Fil de cuivre"]
+    assert dict_a["Usage"]["Lieu d'utilisation"] == "France"
+    assert dict_a["Processing"]["Pertes (%)"] == 10
+    # the useful mass defaults to the finished mass increased by the processing losses
+    assert dict_a["Materiaux"][1]["Masse utile (kg)"] == pytest.approx(10)
+    assert set(dict_a["Moyen de transport"].values()) == {"boat"}
+    assert "France - Chine" in dict_a["Moyen de transport"]
+    assert dict_b["Moyen de transport"] == {"France - Chine": "plane"}
+
+
+def test_the_rows_of_a_product_must_be_consecutive(tmp_path):
+    input_path = write_csv(
+        tmp_path,
+        [build_row("A", "Acier"), build_row("B", "Acier"), build_row("A", "Acier")],
+    )
+
+    with pytest.raises(ValueError, match="not consecutive.*row 3"):
+        list(lca_ingestion.read_table_records(input_path))
+
+
+@pytest.mark.parametrize(
+    "list_rows, message",
+    [
+        (
+            [build_row("A", "Acier", **{"Moyen de transport": None})],
+            "Invalid .* for the product A \\(row 1\\)",
+        ),
+        (
+            [
+                build_row("A", "Acier"),
+                build_row("A", "Fil de cuivre", **{"Moyen de transport": None}),
+            ],
+            "Invalid .* for the product A \\(row 2\\)",
+        ),
+        (
+            [
+                build_row("A", "Acier"),
+                build_row("A", "Fil de cuivre", **{"Moyen de transport": "plane"}),
+            ],
+            "'plane' of the product A \\(row 2\\) differs",
+        ),
+        (
+            [build_row("A", "Acier"), build_row(None, "Fil de cuivre")],
+            'Missing "Produit" \\(row 2\\)',
+        ),
+    ],
+)
+def test_invalid_rows_are_reported_with_their_number(tmp_path, list_rows, message):
+    input_path = write_csv(tmp_path, list_rows)
+
+    with pytest.raises(ValueError, match=message):
+        list(lca_ingestion.read_table_records(input_path))
+
+
+def test_the_xlsx_rows_are_read_like_the_csv_rows(tmp_path):
+    list_rows = [build_row("A", "Acier"), build_row("B", "Fil de cuivre")]
+    input_path = tmp_path / "products.xlsx"
+    pd.DataFrame(list_rows).to_excel(input_path, index=False)
+
+    assert list(lca_ingestion.read_table_records(input_path)) == list(
+        lca_ingestion.read_table_records(write_csv(tmp_path, list_rows))
+    )
@@ -0,0 +1,43 @@
+import json
+
+import lca_instrumentation
+
+
+def read_json_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_each_write_appends_only_the_new_measures(tmp_path):
+    instrumentation = lca_instrumentation.Instrumentation()
+    output_path = tmp_path / "measures.jsonl"
+    instrumentation.record_time("stage", 2.0)
+    instrumentation.record_time("stage", 1.0)
+    instrumentation.record_cache_call("cache", hit=False)
+
+    instrumentation.write_json_lines(output_path)
+    instrumentation.write_json_lines(output_path)
+    instrumentation.record_time("stage", 0.5)
+    instrumentation.record_cache_call("cache")
+    instrumentation.write_json_lines(output_path)
+
+    list_lines = read_json_lines(output_path)
+    assert [(i["type"], i["name"]) for i in list_lines] == [
+        ("stage", "stage"),
+        ("cache", "cache"),
+        ("stage", "stage"),
+        ("cache", "cache"),
+    ]
+    first_stage, first_cache, second_stage, second_cache = list_lines
+    assert (first_stage["calls"], first_stage["total_seconds"]) == (2, 3.0)
+    assert first_stage["max_seconds"] == 2.0
+    assert (first_cache["calls"], first_cache["misses"]) == (1, 1)
+    assert (second_stage["calls"], second_stage["total_seconds"]) == (1, 0.5)
+    assert second_stage["max_seconds"] == 0.5
+    assert (second_cache["calls"], second_cache["hits"]) == (1, 1)
+    assert second_stage["start_time"] == first_stage["timestamp"]
+
+    # the cumulative measures are unchanged
+    dict_snapshot = instrumentation.snapshot()
+    assert dict_snapshot["stages"]["stage"]["calls"] == 3
+    assert dict_snapshot["caches"]["cache"] == {"calls": 2, "misses": 1, "hits": 1}
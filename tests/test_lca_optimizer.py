@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import lca_calculations
+import lca_contributions
+import lca_optimizer
+import lca_sweep
+
+
+@pytest.fixture
+def df_brute_force(dict_data_customers, df_database):
+    """Impacts of every configuration of the default search space, computed with the sweep"""
+    df_sweep = pd.concat(
+        lca_sweep.sweep_parameters(
+            dict_data_customers,
+            df_database,
+            lca_optimizer.build_default_search_space(dict_data_customers),
+        )
+    )
+    list_indicators = [i for i in df_database.columns if i != "Unit"]
+    df_impacts = pd.DataFrame(
+        {
+            indicator: sum(
+                df_sweep[f"{phase} - {indicator}"]
+                for phase in lca_calculations.list_phases
+            )
+            for indicator in list_indicators
+        }
+    )
+    df_impacts[lca_contributions.total_micropoints_column] = df_impacts[
+        list_indicators
+    ].to_numpy() @ lca_calculations.get_micropoint_weights(list_indicators)
+
+    return df_impacts
+
+
+@pytest.mark.parametrize(
+    "objective", [lca_contributions.total_micropoints_column, "kg eq. CO2"]
+)
+def test_the_best_configuration_matches_the_brute_force(
+    dict_data_customers, df_database, df_brute_force, objective
+):
+    df_best = lca_optimizer.optimize_configuration(
+        dict_data_customers, df_database, objective=objective, n_best=3
+    )
+
+    assert df_best[objective].iloc[0] == pytest.approx(
+        df_brute_force[objective].min(), rel=1e-12
+    )
+    assert df_best[objective].is_monotonic_increasing
+    # the impacts of the configurations are the ones of the dashboard
+    dict_best = df_best.iloc[0].to_dict()
+    dict_data = lca_sweep.apply_sweep_parameters(
+        dict_data_customers,
+        {
+            name: value
+            for name, value in dict_best.items()
+            if name in lca_sweep.get_sweep_parameters(dict_data_customers)
+        },
+    )
+    df_phase_impacts = lca_calculations.compute_phase_impacts(dict_data, df_database)
+    np.testing.assert_allclose(
+        df_best.iloc[0][list(df_phase_impacts.columns)].to_numpy(dtype=float),
+        df_phase_impacts.sum().to_numpy(),
+        rtol=1e-12,
+    )
+
+
+def test_the_pareto_front_matches_the_brute_force(
+    dict_data_customers, df_database, df_brute_force
+):
+    list_objectives = ["kg eq. CO2", "eq. kBq U235"]
+
+    df_front = lca_optimizer.compute_pareto_front(
+        dict_data_customers,
+        df_database,
+        list_objectives=list_objectives,
+        max_front_size=None,
+    )
+
+    points = df_brute_force[list_objectives].to_numpy()
+    dominated = lca_optimizer.is_dominated(points, points)
+    expected_front = np.unique(points[~dominated].round(9), axis=0)
+    np.testing.assert_allclose(
+        np.unique(df_front[list_objectives].to_numpy().round(9), axis=0),
+        expected_front,
+        rtol=1e-12,
+    )
+
+
+def test_find_pareto_front_matches_the_pairwise_comparison():
+    points = np.random.default_rng(0).integers(0, 20, size=(3000, 3)).astype(float)
+
+    front_indices = lca_optimizer.find_pareto_front(points, chunk_size=128)
+
+    dominated = np.array(
+        [((points <= p).all(axis=1) & (points < p).any(axis=1)).any() for p in points]
+    )
+    np.testing.assert_array_equal(
+        np.unique(points[front_indices], axis=0),
+        np.unique(points[~dominated], axis=0),
+    )
+    # a single index per duplicated point
+    assert len(np.unique(points[front_indices], axis=0)) == len(front_indices)
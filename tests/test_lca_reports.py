@@ -0,0 +1,66 @@
+import pytest
+
+import lca_calculations
+import lca_reports
+
+
+@pytest.fixture
+def factor_matrix(df_database):
+    return lca_calculations.build_factor_matrix(df_database)
+
+
+def test_unchanged_reports_are_skipped_and_stale_ones_removed(
+    dict_data_customers, factor_matrix, tmp_path
+):
+    def build(list_powers):
+        return lca_reports.build_reports(
+            dict_data_customers,
+            factor_matrix,
+            tmp_path,
+            {"Puisance (W)": list_powers},
+        )
+
+    assert build([400, 800]) == {"written": 2, "unchanged": 0, "removed": 0}
+    assert build([400, 800]) == {"written": 0, "unchanged": 2, "removed": 0}
+    assert build([800, 1000]) == {"written": 1, "unchanged": 1, "removed": 1}
+
+    dict_manifest = lca_reports.read_manifest(tmp_path)
+    assert sorted(dict_manifest) == sorted(
+        path.name for path in tmp_path.glob("*.html")
+    )
+    assert len(dict_manifest) == 2
+    # a report removed by hand is written again
+    (tmp_path / next(iter(dict_manifest))).unlink()
+    assert build([800, 1000]) == {"written": 1, "unchanged": 1, "removed": 0}
+
+
+def test_html_reports_do_not_load_scripts(dict_data_customers, factor_matrix, tmp_path):
+    lca_reports.build_reports(
+        dict_data_customers, factor_matrix, tmp_path, {"Puisance (W)": [800]}
+    )
+
+    (report_path,) = tmp_path.glob("*.html")
+    report = report_path.read_text()
+    assert report.count("<svg") == 2
+    assert "<script" not in report
+    assert "src=" not in report
+
+
+@pytest.mark.parametrize(
+    "values, message",
+    [
+        ("Puisance (W)", "^Error: Invalid values 'Puisance \\(W\\)'"),
+        ("=800", "^Error: Invalid values"),
+        ("Puisance (W)=", "^Error: Invalid values"),
+        ("Couleur=rouge", "^Error: Parameter Couleur can not be swept"),
+    ],
+)
+def test_invalid_values_exit_with_a_message(tmp_path, values, message):
+    with pytest.raises(SystemExit, match=message):
+        lca_reports.main(["-o", str(tmp_path), "--values", values, "--jobs", "1"])
+
+
+def test_parse_sweep_values():
+    assert lca_reports.parse_sweep_values(
+        ["Puisance (W)=400,800.5", "Lieu d'utilisation=France,Chine"]
+    ) == {"Puisance (W)": [400, 800.5], "Lieu d'utilisation": ["France", "Chine"]}
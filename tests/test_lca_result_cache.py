@@ -0,0 +1,106 @@
+import copy
+
+import numpy as np
+
+import lca_calculations
+import lca_result_cache
+
+
+def test_the_type_of_the_numbers_does_not_change_the_key(dict_data_customers):
+    dict_float = copy.deepcopy(dict_data_customers)
+    dict_float["Usage"]["Duree de vie (annees)"] = 8.0
+    dict_numpy = copy.deepcopy(dict_data_customers)
+    dict_numpy["Usage"]["Nombre de cycles par an"] = np.int64(1200)
+    dict_numpy["Materiaux"][0]["Masse produit fini (kg)"] = np.float32(3)
+
+    key = lca_result_cache.compute_cache_key(dict_data_customers, "v1")
+
+    assert lca_result_cache.compute_cache_key(dict_float, "v1") == key
+    assert lca_result_cache.compute_cache_key(dict_numpy, "v1") == key
+
+
+def test_the_order_of_the_keys_does_not_change_the_key(dict_data_customers):
+    dict_reordered = {
+        key: (dict(reversed(list(value.items()))) if isinstance(value, dict) else value)
+        for key, value in reversed(list(dict_data_customers.items()))
+    }
+
+    assert lca_result_cache.compute_cache_key(
+        dict_reordered, "v1"
+    ) == lca_result_cache.compute_cache_key(dict_data_customers, "v1")
+
+
+def test_a_bill_of_materials_has_the_key_of_its_records(dict_data_customers):
+    dict_bill = copy.deepcopy(dict_data_customers)
+    dict_bill["Materiaux"] = lca_calculations.build_bill_of_materials(
+        dict_bill["Materiaux"]
+    )
+
+    assert lca_result_cache.compute_cache_key(
+        dict_bill, "v1"
+    ) == lca_result_cache.compute_cache_key(dict_data_customers, "v1")
+
+
+def test_the_key_changes_with_the_inputs_and_the_versions(
+    dict_data_customers, monkeypatch
+):
+    key = lca_result_cache.compute_cache_key(dict_data_customers, "v1")
+    dict_longer = copy.deepcopy(dict_data_customers)
+    dict_longer["Usage"]["Duree de vie (annees)"] = 9
+    dict_string = copy.deepcopy(dict_data_customers)
+    dict_string["Usage"]["Duree de vie (annees)"] = "8"
+    dict_reordered_materials = copy.deepcopy(dict_data_customers)
+    dict_reordered_materials["Materiaux"].reverse()
+
+    assert lca_result_cache.compute_cache_key(dict_longer, "v1") != key
+    assert lca_result_cache.compute_cache_key(dict_string, "v1") != key
+    # the materials are listed in the impact table in their order
+    assert lca_result_cache.compute_cache_key(dict_reordered_materials, "v1") != key
+    assert lca_result_cache.compute_cache_key(dict_data_customers, "v2") != key
+    assert lca_result_cache.compute_cache_key(dict_data_customers, None) != key
+    monkeypatch.setattr(
+        lca_result_cache,
+        "result_cache_version",
+        lca_result_cache.result_cache_version + 1,
+    )
+    assert lca_result_cache.compute_cache_key(dict_data_customers, "v1") != key
+
+
+def test_the_least_recently_used_results_are_evicted():
+    cache = lca_result_cache.ResultCache(max_entries=2)
+    list_calls = []
+
+    def compute(value):
+        list_calls.append(value)
+        return value * 10
+
+    assert cache.get_or_compute("a", compute, 1) == 10
+    assert cache.get_or_compute("b", compute, 2) == 20
+    assert cache.get_or_compute("a", compute, 1) == 10
+    assert cache.get_or_compute("c", compute, 3) == 30
+    # "b" was the least recently used
+    assert cache.get_or_compute("b", compute, 2) == 20
+
+    assert list_calls == [1, 2, 3, 2]
+    assert list(cache.dict_entries) == ["c", "b"]
+    assert cache.dict_stats == {"memory_hits": 1, "disk_hits": 0, "misses": 4}
+
+
+def test_the_disk_tier_is_shared_and_bounded(tmp_path):
+    cache = lca_result_cache.ResultCache(
+        max_entries=1, disk_folder=tmp_path, max_disk_entries=2
+    )
+    for key in ["a", "b", "c"]:
+        cache.get_or_compute(key, str.upper, key)
+
+    assert sorted(path.name for path in tmp_path.glob("*.pkl")) == ["b.pkl", "c.pkl"]
+
+    # another cache (e.g. after a restart) reads the results from the disk
+    other_cache = lca_result_cache.ResultCache(disk_folder=tmp_path)
+    assert other_cache.get_or_compute("b", str.upper, "unused") == "B"
+    assert other_cache.dict_stats["disk_hits"] == 1
+
+    # an unreadable file is recomputed
+    (tmp_path / "c.pkl").write_bytes(b"truncated")
+    assert other_cache.get_or_compute("c", str.upper, "c") == "C"
+    assert other_cache.dict_stats["misses"] == 1
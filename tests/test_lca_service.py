@@ -0,0 +1,168 @@
+import asyncio
+import copy
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import lca_calculations
+import lca_database
+import lca_service
+
+
+@pytest.fixture
+def shared_database(data_folder, tmp_path):
+    return lca_database.SharedFactorDatabase(
+        data_folder / "Holis - Technical test.xlsx", snapshot_folder=tmp_path
+    )
+
+
+def build_variants(dict_data_customers, n_variants):
+    list_variants = []
+    for i in range(n_variants):
+        dict_variant = copy.deepcopy(dict_data_customers)
+        dict_variant["Usage"]["Duree de vie (annees)"] = 1 + i
+        list_variants.append(dict_variant)
+    return list_variants
+
+
+def test_concurrent_requests_are_computed_in_batches(
+    shared_database, dict_data_customers, df_database
+):
+    service = lca_service.ImpactService(
+        shared_database, max_batch_size=8, max_wait_ms=50
+    )
+    list_variants = build_variants(dict_data_customers, 20)
+
+    async def run():
+        return await asyncio.gather(
+            *[service.compute_impact_table(dict_data) for dict_data in list_variants]
+        )
+
+    list_results = asyncio.run(run())
+
+    assert service.metrics.n_batches == 3
+    assert service.metrics.n_batched_products == 20
+    for dict_data, (table, cache_hit) in zip(list_variants, list_results):
+        assert not cache_hit
+        df_reference = lca_calculations.build_impact_table(
+            lca_calculations.compute_phase_impacts(dict_data, df_database)
+        )
+        np.testing.assert_allclose(
+            pd.DataFrame(**table).to_numpy(), df_reference.to_numpy(), rtol=1e-12
+        )
+
+
+def test_identical_products_are_computed_once(shared_database, dict_data_customers):
+    service = lca_service.ImpactService(shared_database, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(
+            *[service.compute_impact_table(dict_data_customers) for _ in range(5)]
+        )
+
+    list_results = asyncio.run(run())
+
+    assert service.metrics.n_batched_products == 1
+    assert all(table == list_results[0][0] for table, _ in list_results)
+
+
+def test_equivalent_payloads_are_served_from_the_cache(
+    shared_database, dict_data_customers
+):
+    service = lca_service.ImpactService(shared_database)
+    # same product, with the keys in another order and the integers written as floats
+    dict_equivalent = {
+        key: dict_data_customers[key] for key in reversed(dict_data_customers)
+    }
+    dict_equivalent["Usage"] = {
+        key: float(value) if isinstance(value, int) else value
+        for key, value in dict_data_customers["Usage"].items()
+    }
+
+    async def run():
+        first = await service.compute_impact_table(dict_data_customers)
+        second = await service.compute_impact_table(dict_equivalent)
+        return first, second
+
+    (table, cache_hit), (cached_table, cached_hit) = asyncio.run(run())
+
+    assert not cache_hit
+    assert cached_hit
+    assert cached_table == table
+    assert service.metrics.n_batches == 1
+
+
+def test_invalid_product_does_not_fail_its_batch(shared_database, dict_data_customers):
+    service = lca_service.ImpactService(shared_database, max_wait_ms=50)
+    dict_invalid = copy.deepcopy(dict_data_customers)
+    dict_invalid["Usage"]["Lieu d'utilisation"] = "Mars"
+
+    async def run():
+        return await asyncio.gather(
+            service.handle_request(
+                "POST", "/impact", json.dumps(dict_data_customers).encode()
+            ),
+            service.handle_request(
+                "POST", "/impact", json.dumps(dict_invalid).encode()
+            ),
+            service.handle_request("POST", "/impact", b"{not json"),
+        )
+
+    (status, _), (invalid_status, dict_error), (json_status, _) = asyncio.run(run())
+
+    assert status == 200
+    assert invalid_status == 400
+    assert "Mars" in dict_error["error"]
+    assert json_status == 400
+    assert service.metrics.n_errors == 2
+
+
+async def send_raw_request(service, request):
+    """Send raw bytes to a server of the service, and read the whole response"""
+    server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+@pytest.mark.parametrize(
+    "request_bytes",
+    [
+        b"GARBAGE\r\n\r\n",
+        b"GET /health\r\n\r\n",
+        b"GET /health FTP/1.0\r\n\r\n",
+        b"GET /health HTTP/1.1\r\nno separator\r\n\r\n",
+        b"POST /impact HTTP/1.1\r\nContent-Length: ten\r\n\r\n",
+        b"POST /impact HTTP/1.1\r\nContent-Length: -1\r\n\r\n",
+    ],
+)
+def test_malformed_requests_are_answered_with_a_400(shared_database, request_bytes):
+    service = lca_service.ImpactService(shared_database)
+
+    status, dict_response = asyncio.run(send_raw_request(service, request_bytes))
+
+    assert status == 400
+    assert dict_response["error"].startswith("Malformed request")
+
+
+def test_well_formed_request_over_a_connection(shared_database, dict_data_customers):
+    service = lca_service.ImpactService(shared_database)
+    body = json.dumps(dict_data_customers).encode()
+    request_bytes = (
+        b"POST /impact HTTP/1.1\r\nConnection: close\r\n"
+        + f"Content-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+
+    status, dict_response = asyncio.run(send_raw_request(service, request_bytes))
+
+    assert status == 200
+    assert dict_response["index"] == lca_calculations.list_impact_table_rows
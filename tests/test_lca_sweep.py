@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import lca_calculations
+import lca_sweep
+
+dict_sweep_space = {
+    "Duree de vie (annees)": [1, 8],
+    "Puisance (W)": [400, 1000],
+    "Lieu d'utilisation": ["France", "Chine"],
+    "Lieu d'assemblage": ["Chine"],
+    "Moyen de transport": ["boat", "plane"],
+    "Lieu de production (Acier)": ["France", "Taiwan"],
+}
+
+
+def check_sweep_against_direct_computation(dict_data_customers, df_database):
+    df_sweep = pd.concat(
+        lca_sweep.sweep_parameters(
+            dict_data_customers, df_database, dict_sweep_space, chunk_size=7
+        )
+    )
+
+    assert len(df_sweep) == lca_sweep.count_sweep_points(
+        dict_data_customers, dict_sweep_space
+    )
+    list_parameters = list(lca_sweep.get_sweep_parameters(dict_data_customers))
+    for _, row in df_sweep.iterrows():
+        dict_data = lca_sweep.apply_sweep_parameters(
+            dict_data_customers, row[list_parameters].to_dict()
+        )
+        df_phase_impacts = lca_calculations.compute_phase_impacts(
+            dict_data, df_database
+        )
+        np.testing.assert_allclose(
+            row.drop(list_parameters).to_numpy(dtype=float),
+            df_phase_impacts.to_numpy().ravel(),
+            rtol=1e-12,
+        )
+
+
+def test_the_sweep_matches_the_direct_computation(dict_data_customers, df_database):
+    check_sweep_against_direct_computation(dict_data_customers, df_database)
+
+
+def test_the_sweep_of_a_bill_of_materials_with_repeated_names(
+    dict_data_customers, df_database
+):
+    # the same material produced twice, in two locations
+    dict_data_customers["Materiaux"].append(
+        {**dict_data_customers["Materiaux"][1], "Lieu de production": "Chine"}
+    )
+    dict_data_customers["Materiaux"] = lca_calculations.build_bill_of_materials(
+        dict_data_customers["Materiaux"]
+    )
+
+    check_sweep_against_direct_computation(dict_data_customers, df_database)
+
+
+def test_an_unknown_parameter_can_not_be_swept(dict_data_customers, df_database):
+    with pytest.raises(KeyError, match="can not be swept"):
+        next(
+            lca_sweep.sweep_parameters(
+                dict_data_customers, df_database, {"Couleur": ["rouge"]}
+            )
+        )
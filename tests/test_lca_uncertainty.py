@@ -0,0 +1,72 @@
+import numpy as np
+
+import lca_calculations
+import lca_uncertainty
+
+
+def test_the_components_sum_to_the_activity_matrix(dict_data_customers, df_database):
+    factor_matrix = lca_calculations.build_factor_matrix(df_database)
+
+    components, activity_rows = lca_uncertainty.build_component_matrices(
+        dict_data_customers, factor_matrix
+    )
+
+    activity_matrix = lca_calculations.build_activity_matrix(
+        dict_data_customers, factor_matrix
+    )
+    np.testing.assert_allclose(
+        components.sum(axis=0), activity_matrix[:, activity_rows], rtol=1e-12
+    )
+    assert not np.delete(activity_matrix, activity_rows, axis=1).any()
+    # one component per material, then the processing and the use phase
+    assert len(components) == len(dict_data_customers["Materiaux"]) + 2
+
+
+def test_without_uncertainty_every_sample_is_the_impact_table(
+    dict_data_customers, df_database
+):
+    tables = lca_uncertainty.sample_impact_tables(
+        dict_data_customers, df_database, 5, {}, {}, seed=0
+    )
+
+    df_impact = lca_calculations.build_impact_table(
+        lca_calculations.compute_phase_impacts(dict_data_customers, df_database)
+    )
+    np.testing.assert_allclose(
+        tables, np.broadcast_to(df_impact.to_numpy(), tables.shape), rtol=1e-12
+    )
+
+
+def test_the_masses_scale_the_transportation_of_the_end_product(
+    dict_data_customers, df_database
+):
+    # with a single material, its multiplier scales the material and all the transportation
+    dict_data_customers["Materiaux"] = dict_data_customers["Materiaux"][1:2]
+    tables = lca_uncertainty.sample_impact_tables(
+        dict_data_customers,
+        df_database,
+        10,
+        {},
+        {"Masse utile (kg)": {"distribution": "uniform", "relative_range": 0.5}},
+        seed=0,
+    )
+
+    df_phase_impacts = lca_calculations.compute_phase_impacts(
+        dict_data_customers, df_database
+    )
+    multipliers = tables[:, 0, 0] / df_phase_impacts.loc["Material"].iloc[0]
+    assert np.ptp(multipliers) > 0.1
+    np.testing.assert_allclose(
+        tables[:, 3, :3],
+        multipliers[:, None] * df_phase_impacts.loc["Transportation"].to_numpy(),
+        rtol=1e-12,
+    )
+
+
+def test_the_normal_multipliers_are_not_negative():
+    multipliers = lca_uncertainty.draw_multipliers(
+        {"distribution": "normal", "relative_std": 2}, 10000, np.random.default_rng(0)
+    )
+
+    assert multipliers.min() == 0
+    assert (multipliers > 0).mean() > 0.5
@@ -0,0 +1,109 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import lca_calculations
+import lca_use_phase
+
+use_phase = lca_calculations.list_phases.index("Use phase")
+
+
+def write_trajectories(tmp_path, dict_values, steps_per_year=1):
+    """Write a trajectory file with a multiplier per year (repeated over its steps)"""
+    trajectory_path = tmp_path / "trajectories.csv"
+    pd.DataFrame(
+        [
+            {"Country": country, "Year": 2025 + year, "Step": step, "Multiplier": value}
+            for country, list_values in dict_values.items()
+            for year, value in enumerate(list_values)
+            for step in range(steps_per_year)
+        ]
+    ).to_csv(trajectory_path, index=False)
+    return trajectory_path
+
+
+@pytest.fixture
+def list_dict_data(dict_data_customers):
+    list_dict_data = []
+    for lifetime, country in [(8, "France"), (2.5, "France"), (1, "Chine")]:
+        dict_variant = copy.deepcopy(dict_data_customers)
+        dict_variant["Usage"]["Duree de vie (annees)"] = lifetime
+        dict_variant["Usage"]["Lieu d'utilisation"] = country
+        list_dict_data.append(dict_variant)
+    return list_dict_data
+
+
+def compute_impact_matrices(list_dict_data, df_database, trajectory_path, **kwargs):
+    factor_matrix = lca_calculations.build_factor_matrix(df_database)
+    compiled_trajectories = lca_use_phase.compile_trajectories(
+        lca_use_phase.read_electricity_trajectories(trajectory_path),
+        factor_matrix,
+        **kwargs
+    )
+    df_impacts = lca_use_phase.compute_impacts_batch(
+        list_dict_data, factor_matrix, compiled_trajectories
+    )
+    return df_impacts.to_numpy().reshape(
+        len(list_dict_data), -1, len(df_impacts.columns)
+    )
+
+
+@pytest.mark.parametrize("steps_per_year", [1, 24])
+def test_a_constant_multiplier_of_one_is_the_static_use_phase(
+    list_dict_data, df_database, tmp_path, steps_per_year
+):
+    trajectory_path = write_trajectories(
+        tmp_path, {"France": [1, 1, 1], "Chine": [1]}, steps_per_year
+    )
+    usage_profile = np.arange(1, steps_per_year + 1)
+
+    impact_matrices = compute_impact_matrices(
+        list_dict_data, df_database, trajectory_path, usage_profile=usage_profile
+    )
+
+    df_static = lca_calculations.compute_impacts_batch(list_dict_data, df_database)
+    np.testing.assert_allclose(
+        impact_matrices.reshape(len(df_static), -1), df_static.to_numpy(), rtol=1e-12
+    )
+
+
+def test_the_multipliers_scale_the_use_phase_of_their_years(
+    list_dict_data, df_database, tmp_path
+):
+    trajectory_path = write_trajectories(tmp_path, {"France": [1, 2, 3], "Chine": [2]})
+
+    impact_matrices = compute_impact_matrices(
+        list_dict_data, df_database, trajectory_path
+    )
+
+    static_matrices = (
+        lca_calculations.compute_impacts_batch(list_dict_data, df_database)
+        .to_numpy()
+        .reshape(impact_matrices.shape)
+    )
+    # the other phases do not change
+    other_phases = [i for i in range(impact_matrices.shape[1]) if i != use_phase]
+    np.testing.assert_allclose(
+        impact_matrices[:, other_phases], static_matrices[:, other_phases], rtol=1e-12
+    )
+    # the yearly impact of the static use phase, times the multiplier of each year of use (the
+    # years after the trajectory repeating its last year)
+    static_yearly = static_matrices[:, use_phase] / np.array([8, 2.5, 1])[:, None]
+    np.testing.assert_allclose(
+        impact_matrices[:, use_phase],
+        static_yearly * np.array([1 + 2 + 3 * 6, 1 + 2 + 0.5 * 3, 2])[:, None],
+        rtol=1e-12,
+    )
+
+
+def test_a_country_without_trajectory_is_reported(
+    list_dict_data, df_database, tmp_path
+):
+    trajectory_path = write_trajectories(tmp_path, {"France": [1]})
+
+    with pytest.raises(
+        KeyError, match="Missing from the electricity trajectories: Chine"
+    ):
+        compute_impact_matrices(list_dict_data, df_database, trajectory_path)